@@ -12,7 +12,30 @@ S3_PREFIX="default"
 S3_TYPE="" # aliyun或留空表示S3兼容存储
 SKIP_BACKUP=0 # 设置为1跳过备份，仅测试上传
 S3_KEEP_DAYS=7 # 保留天数
+S3_KEEP_DAILY=0 # 此外保留最近几天每天最新的备份
+S3_KEEP_WEEKLY=0 # 此外保留最近几周每周最新的备份
+S3_KEEP_MONTHLY=0 # 此外保留最近几个月每月最新的备份
 CALLBACK_URL=""
+BACKUP_MODE="staged" # staged: 本地备份并压缩后上传；streaming: 流式上传，不落盘；dedup: 流式分块去重上传
+COMPRESSION_CODEC="gzip" # gzip、pigz、zstd 或 none
+COMPRESSION_LEVEL="" # 压缩级别，留空使用压缩工具默认值
+COMPRESSION_THREADS="" # zstd/pigz 的压缩线程数，留空使用所有CPU核心
+XTRABACKUP_PARALLEL="" # xtrabackup 复制数据文件的线程数，留空使用 xtrabackup 默认值（1）
+XTRABACKUP_THROTTLE="" # xtrabackup 复制数据文件时每秒的 IO 操作数（--throttle），留空不限制
+XTRABACKUP_USE_MEMORY="" # xtrabackup --prepare 使用的内存（如 1G），留空使用容器内存上限的一半（没有上限时使用 xtrabackup 默认值）
+PREPARE_AT="backup" # backup: 在备份作业中 prepare；restore: 上传未 prepare 的备份，恢复时 prepare；job: 上传未 prepare 的备份，由单独的作业离线 prepare
+INCREMENTAL_ENABLED="false" # 设置为true在最近的备份基础上执行增量备份
+FULL_EVERY_DAYS=7 # 增量模式下全量备份的间隔天数
+BACKUP_ID="" # 备份ID（时间戳），留空使用当前时间
+S3_PART_SIZE_MB=16 # 分段上传的分段大小（MiB）
+S3_CONCURRENCY=4 # 同时上传的分段数
+S3_MAX_RETRIES=5 # 单个分段失败后的重试次数
+S3_MAX_BANDWIDTH_MB="" # 上传带宽上限（MiB/s），所有上传线程共享，留空不限速
+IO_CLASS="" # 备份进程的 IO 调度类：idle（磁盘空闲时才读写）或 best-effort，留空不调整
+IO_PRIORITY="" # best-effort 类中的优先级（0 最高，7 最低）
+BACKUP_ACTION="backup" # backup: 执行备份；verify: 校验已上传的备份；prepare: 离线 prepare 已上传的备份
+VERIFY_BACKUP_ID="" # 要校验的备份ID，留空校验最新的备份
+PREPARE_BACKUP_ID="" # 要离线 prepare 的备份ID，留空使用最新的备份
 
 MYSQL_HOST="host.docker.internal"
 MYSQL_PORT="3306"
@@ -23,10 +46,16 @@ MYSQL_PASSWORD="********"
 BACKUP_DIR="/app/backup"
 # 源目录
 SOURCE_DIR="/var/lib/mysql"
-
-# 备份文件名
-DATE=$(date +%Y%m%d%H%M%S)
-BACKUP_NAME="backup_${DATE}"
+# xtrabackup_checkpoints 输出目录，用于获取备份的LSN
+LSN_DIR="$BACKUP_DIR/.lsn"
+# 分段上传检查点目录
+CHECKPOINT_DIR="$BACKUP_DIR/.checkpoint"
+# 待上传备份的状态文件，容器重启后据此继续上传，无需重新备份
+PENDING_FILE="$BACKUP_DIR/.pending"
+# 流式上传时 s3tool 写入的数据流 SHA-256 和字节数
+DIGEST_FILE="$BACKUP_DIR/.digest"
+# 校验备份时计算摘要用的命名管道目录
+VERIFY_DIR="$BACKUP_DIR/.verify"
 
 # 加载环境变量配置
 if [ -f /app/env ]; then
@@ -41,19 +70,83 @@ fi
 [ -n "$S3_PREFIX" ] && S3_PREFIX="$S3_PREFIX"
 [ -n "$SKIP_BACKUP" ] && SKIP_BACKUP="$SKIP_BACKUP"
 [ -n "$S3_KEEP_DAYS" ] && S3_KEEP_DAYS="$S3_KEEP_DAYS"
+[ -n "$S3_KEEP_DAILY" ] && S3_KEEP_DAILY="$S3_KEEP_DAILY"
+[ -n "$S3_KEEP_WEEKLY" ] && S3_KEEP_WEEKLY="$S3_KEEP_WEEKLY"
+[ -n "$S3_KEEP_MONTHLY" ] && S3_KEEP_MONTHLY="$S3_KEEP_MONTHLY"
+[ -n "$BACKUP_MODE" ] && BACKUP_MODE="$BACKUP_MODE"
+[ -n "$COMPRESSION_CODEC" ] && COMPRESSION_CODEC="$COMPRESSION_CODEC"
+[ -n "$COMPRESSION_LEVEL" ] && COMPRESSION_LEVEL="$COMPRESSION_LEVEL"
+[ -n "$COMPRESSION_THREADS" ] && COMPRESSION_THREADS="$COMPRESSION_THREADS"
+[ -n "$XTRABACKUP_PARALLEL" ] && XTRABACKUP_PARALLEL="$XTRABACKUP_PARALLEL"
+[ -n "$XTRABACKUP_THROTTLE" ] && XTRABACKUP_THROTTLE="$XTRABACKUP_THROTTLE"
+[ -n "$XTRABACKUP_USE_MEMORY" ] && XTRABACKUP_USE_MEMORY="$XTRABACKUP_USE_MEMORY"
+[ -n "$PREPARE_AT" ] && PREPARE_AT="$PREPARE_AT"
+[ -n "$INCREMENTAL_ENABLED" ] && INCREMENTAL_ENABLED="$INCREMENTAL_ENABLED"
+[ -n "$FULL_EVERY_DAYS" ] && FULL_EVERY_DAYS="$FULL_EVERY_DAYS"
+[ -n "$S3_PART_SIZE_MB" ] && S3_PART_SIZE_MB="$S3_PART_SIZE_MB"
+[ -n "$S3_CONCURRENCY" ] && S3_CONCURRENCY="$S3_CONCURRENCY"
+[ -n "$S3_MAX_RETRIES" ] && S3_MAX_RETRIES="$S3_MAX_RETRIES"
+[ -n "$S3_MAX_BANDWIDTH_MB" ] && S3_MAX_BANDWIDTH_MB="$S3_MAX_BANDWIDTH_MB"
+[ -n "$IO_CLASS" ] && IO_CLASS="$IO_CLASS"
+[ -n "$IO_PRIORITY" ] && IO_PRIORITY="$IO_PRIORITY"
+[ -n "$BACKUP_ACTION" ] && BACKUP_ACTION="$BACKUP_ACTION"
+[ -n "$VERIFY_BACKUP_ID" ] && VERIFY_BACKUP_ID="$VERIFY_BACKUP_ID"
+[ -n "$PREPARE_BACKUP_ID" ] && PREPARE_BACKUP_ID="$PREPARE_BACKUP_ID"
 
 [ -n "$MYSQL_HOST" ] && MYSQL_HOST="$MYSQL_HOST"
 [ -n "$MYSQL_PORT" ] && MYSQL_PORT="$MYSQL_PORT"
 [ -n "$MYSQL_USER" ] && MYSQL_USER="$MYSQL_USER"
 [ -n "$MYSQL_PASSWORD" ] && MYSQL_PASSWORD="$MYSQL_PASSWORD"
 
-
+# 备份文件名（由操作器创建的备份使用操作器分配的ID）
+DATE="${BACKUP_ID:-$(date +%Y%m%d%H%M%S)}"
+BACKUP_NAME="backup_${DATE}"
 
 # 判断是否为阿里云OSS
 if [[ "$S3_ENDPOINT" == *"aliyuncs"* ]]; then
   S3_TYPE="aliyun"
 fi
 
+# ossutil 不支持从标准输入上传，阿里云OSS使用本地备份模式
+if [[ "$BACKUP_MODE" == "streaming" || "$BACKUP_MODE" == "dedup" ]] && [[ "$S3_TYPE" == "aliyun" ]]; then
+  echo "警告: 阿里云OSS不支持${BACKUP_MODE}备份，改用本地备份模式" >&2
+  BACKUP_MODE="staged"
+fi
+
+# 增量备份链在恢复时统一 prepare（已 prepare 的备份不能再应用增量）；流式备份没有本地副本，无法在备份作业中 prepare
+if [ "$INCREMENTAL_ENABLED" == "true" ]; then
+  PREPARE_AT="restore"
+elif [ "$PREPARE_AT" == "backup" ] && [ "$BACKUP_MODE" != "staged" ]; then
+  PREPARE_AT="restore"
+fi
+
+# 备份文件扩展名：格式（tar 或 xbstream）加压缩后缀，恢复时据此判断格式和压缩方式
+case "$COMPRESSION_CODEC" in
+  zstd) COMPRESSION_EXT=".zst" ;;
+  none) COMPRESSION_EXT="" ;;
+  *) COMPRESSION_EXT=".gz" ;;
+esac
+
+if [[ "$BACKUP_MODE" == "streaming" ]]; then
+  BACKUP_FILE="$BACKUP_NAME.xbstream$COMPRESSION_EXT"
+elif [[ "$BACKUP_MODE" == "dedup" ]]; then
+  # 去重备份的对象是分块索引，分块保存在 $S3_PREFIX/chunks/ 下，由多个备份共享
+  BACKUP_FILE="$BACKUP_NAME.xbstream.idx"
+else
+  BACKUP_FILE="$BACKUP_NAME.tar$COMPRESSION_EXT"
+fi
+
+# 匹配所有格式的备份文件名
+# 离线 prepare 后的备份为 backup_<ID>.prepared.tar*，与原备份不同名，替换期间正在下载原备份的恢复不受影响
+BACKUP_FILE_PATTERN="backup_[0-9]+(\.prepared)?\.(tar|xbstream)(\.gz|\.zst|\.idx)?"
+
+# 备份目录：前缀下的 catalog 对象，每行一个备份（按备份ID排序），字段以空格分隔，空值记为 -
+# 查找增量基础和过期备份只需读取这一个对象，不再列出整个前缀
+CATALOG_OBJECT="catalog"
+# 备份目录写入冲突（被其他作业同时修改）时的最大重试次数
+CATALOG_MAX_RETRIES=5
+CATALOG_FIELDS=(backup_id type file base_id full_id from_lsn to_lsn prepared size sha256 codec start_time end_time)
+
 
 # 检查必需变量
 check_requirements() {
@@ -62,45 +155,396 @@ check_requirements() {
     exit 1
   fi
   # 创建备份目录
-  mkdir -p "$BACKUP_DIR"
+  mkdir -p "$BACKUP_DIR" "$LSN_DIR"
+}
+
+# 使用 s3tool 分段并发上传到S3兼容存储，对象名相对于存储桶（上传受 S3_MAX_BANDWIDTH_MB 限速）
+s3tool() {
+  S3_ENDPOINT="$S3_ENDPOINT" S3_ACCESS_KEY="$S3_ACCESS_KEY" S3_SECRET_KEY="$S3_SECRET_KEY" S3_BUCKET="$S3_BUCKET" \
+    S3_MAX_BANDWIDTH_MB="$S3_MAX_BANDWIDTH_MB" s3tool.py "$@" --part-size-mb "$S3_PART_SIZE_MB" --concurrency "$S3_CONCURRENCY" --retries "$S3_MAX_RETRIES"
+}
+
+# 读取存储中前缀下的对象内容
+storage_cat() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" cat "oss://$S3_BUCKET/$S3_PREFIX/$1"
+  else
+    mc --config-dir "/tmp/.mc" cat "s3/$S3_BUCKET/$S3_PREFIX/$1"
+  fi
+}
+
+# 将标准输入写入存储中前缀下的对象
+storage_put() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    local tmp_file=$(mktemp)
+    cat > "$tmp_file"
+    ossutil -c "/tmp/.ossutilconfig" cp "$tmp_file" "oss://$S3_BUCKET/$S3_PREFIX/$1" --force >/dev/null
+    local result=$?
+    rm -f "$tmp_file"
+    return $result
+  else
+    mc --config-dir "/tmp/.mc" pipe "s3/$S3_BUCKET/$S3_PREFIX/$1" >/dev/null
+  fi
+}
+
+# 删除存储中前缀下的对象
+storage_rm() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" rm "oss://$S3_BUCKET/$S3_PREFIX/$1" --force
+  else
+    mc --config-dir "/tmp/.mc" rm "s3/$S3_BUCKET/$S3_PREFIX/$1"
+  fi
+}
+
+# 列出存储中前缀下的对象名
+storage_ls() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" ls "oss://$S3_BUCKET/$S3_PREFIX/" | grep -oE "[^/ ]+$"
+  else
+    mc --config-dir "/tmp/.mc" ls "s3/$S3_BUCKET/$S3_PREFIX/" | awk '{print $NF}'
+  fi
+}
+
+# 从元数据（key=value 格式）中读取字段
+meta_value() {
+  echo "$1" | grep "^$2=" | head -n 1 | cut -d= -f2-
+}
+
+# 备份ID（时间戳）转换为秒
+id_to_epoch() {
+  date -d "${1:0:8} ${1:8:2}:${1:10:2}:${1:12:2}" +%s
+}
+
+# 从备份目录的一行中读取字段
+catalog_value() {
+  local fields=($1)
+  local i
+  for i in "${!CATALOG_FIELDS[@]}"; do
+    if [ "${CATALOG_FIELDS[$i]}" == "$2" ]; then
+      [ "${fields[$i]:--}" != "-" ] && echo "${fields[$i]}"
+      return 0
+    fi
+  done
+}
+
+# 按 CATALOG_FIELDS 的顺序输出一行备份目录，空值记为 -
+catalog_line() {
+  local values=()
+  local value
+  for value in "$@"; do
+    values+=("${value:--}")
+  done
+  echo "${values[*]}"
+}
+
+# 根据备份文件扩展名判断压缩方式（去重备份的分块各自压缩）
+file_codec() {
+  case "$1" in
+    *.idx) echo "dedup" ;;
+    *.zst) echo "zstd" ;;
+    *.gz) echo "gzip" ;;
+    *) echo "none" ;;
+  esac
+}
+
+# 没有备份目录时（目录引入前的备份），列出前缀一次，根据各备份的元数据重建目录
+rebuild_catalog() {
+  local file_name
+  storage_ls | grep -oE "^$BACKUP_FILE_PATTERN$" | sort | while IFS= read -r file_name; do
+    [[ "$file_name" =~ ^backup_([0-9]+) ]] || continue
+    local id="${BASH_REMATCH[1]}"
+    local meta=$(storage_cat "backup_$id.meta" 2>/dev/null)
+    # 离线 prepare 替换备份时新旧对象可能同时存在，以元数据中的文件为准
+    [ -n "$meta" ] && [ "$(meta_value "$meta" file)" != "$file_name" ] && continue
+    local prepared=$(meta_value "$meta" prepared)
+    # 没有元数据的旧备份：tar 格式在备份时已执行 prepare
+    if [ -z "$meta" ] && [[ "$file_name" == *.tar* ]]; then
+      prepared=1
+    fi
+    catalog_line "$id" "$(meta_value "$meta" type)" "$file_name" "$(meta_value "$meta" base_id)" \
+      "$(meta_value "$meta" full_id)" "$(meta_value "$meta" from_lsn)" "$(meta_value "$meta" to_lsn)" \
+      "${prepared:-0}" "$(meta_value "$meta" size)" "$(meta_value "$meta" sha256)" "$(file_codec "$file_name")" "" ""
+  done
+}
+
+# 读取备份目录到 CATALOG，S3兼容存储同时记录其 ETag 到 CATALOG_ETAG，写回时据此检测并发修改
+load_catalog() {
+  CATALOG_ETAG=""
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    CATALOG=$(storage_cat "$CATALOG_OBJECT" 2>/dev/null)
+  else
+    local etag_file=$(mktemp)
+    CATALOG=$(s3tool get "$S3_PREFIX/$CATALOG_OBJECT" --etag-file "$etag_file" 2>/dev/null)
+    CATALOG_ETAG=$(cat "$etag_file")
+    rm -f "$etag_file"
+  fi
+  if [ -z "$CATALOG" ]; then
+    echo "没有找到备份目录，根据已有备份重建"
+    CATALOG=$(rebuild_catalog)
+  fi
+}
+
+# 将 CATALOG 写回存储：S3兼容存储只在目录仍是读取时的版本（或仍不存在）时写入，已被其他作业修改时返回 2
+# 阿里云OSS不支持条件写入，只能直接覆盖
+save_catalog() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    echo "$CATALOG" | grep -v "^$" | storage_put "$CATALOG_OBJECT"
+  elif [ -n "$CATALOG_ETAG" ]; then
+    echo "$CATALOG" | grep -v "^$" | s3tool put "$S3_PREFIX/$CATALOG_OBJECT" --if-match "$CATALOG_ETAG"
+  else
+    echo "$CATALOG" | grep -v "^$" | s3tool put "$S3_PREFIX/$CATALOG_OBJECT" --if-none-match
+  fi
+}
+
+# 修改备份目录：读取最新的目录，调用 "$@" 修改 CATALOG 后写回
+# 同一前缀的定时备份、一次性备份和离线 prepare 作业可能同时修改目录，写入冲突时重新读取再修改，
+# 不会覆盖其他作业添加或删除的备份；修改函数返回非 0 表示无需修改，不写入
+modify_catalog() {
+  local attempt
+  for attempt in $(seq 1 $CATALOG_MAX_RETRIES); do
+    load_catalog
+    "$@" || return 0
+    save_catalog
+    local result=$?
+    [ $result -ne 2 ] && return $result
+    echo "备份目录已被其他作业修改，重新读取（第 $attempt 次）"
+    sleep $((RANDOM % 5 + 1))
+  done
+  return 1
+}
+
+# 添加或替换备份目录中的一行（按备份ID匹配）
+replace_catalog_entry() {
+  CATALOG=$( (echo "$CATALOG" | awk -v id="${1%% *}" 'NF && $1 != id'; echo "$1") | sort)
+}
+
+# 从备份目录中移除过期的备份，过期的备份ID和对象（备份文件和元数据）记录在 EXPIRED_IDS 和 EXPIRED_OBJECTS 中
+# 没有过期的备份时返回 1
+remove_expired_entries() {
+  EXPIRED_IDS=$(expired_ids)
+  [ -z "$EXPIRED_IDS" ] && return 1
+  EXPIRED_OBJECTS=($(echo "$CATALOG" | awk 'NR == FNR { expired[$1]; next } ($1 in expired) { print $3; print "backup_" $1 ".meta" }' <(echo "$EXPIRED_IDS") -))
+  CATALOG=$(echo "$CATALOG" | awk 'NR == FNR { expired[$1]; next } NF && !($1 in expired)' <(echo "$EXPIRED_IDS") -)
+}
+
+# 决定本次执行全量还是增量备份
+# 增量备份基于最近一次备份的 to_lsn；没有可用的基础备份或全量备份已超过 FULL_EVERY_DAYS 天时执行全量备份
+plan_backup() {
+  BACKUP_TYPE="full"
+  BASE_ID=""
+  FROM_LSN=""
+  FULL_ID="$DATE"
+  
+  if [ "$INCREMENTAL_ENABLED" != "true" ]; then
+    return
+  fi
+  
+  local last=$(echo "$CATALOG" | grep -v "^$" | tail -n 1)
+  if [ -z "$last" ]; then
+    echo "没有找到之前的备份，执行全量备份"
+    return
+  fi
+  
+  local last_id=$(catalog_value "$last" backup_id)
+  local last_full_id=$(catalog_value "$last" full_id)
+  local last_to_lsn=$(catalog_value "$last" to_lsn)
+  
+  # 已 prepare 的备份不能再应用增量
+  if [ -z "$last_to_lsn" ] || [ "$(catalog_value "$last" prepared)" == "1" ]; then
+    echo "最近的备份 $last_id 不能作为增量基础，执行全量备份"
+    return
+  fi
+  
+  local full_age=$(( $(date +%s) - $(id_to_epoch "$last_full_id") ))
+  if [ "$full_age" -ge $(( FULL_EVERY_DAYS * 86400 )) ]; then
+    echo "全量备份 $last_full_id 已超过 ${FULL_EVERY_DAYS} 天，执行全量备份"
+    return
+  fi
+  
+  BACKUP_TYPE="incremental"
+  BASE_ID="$last_id"
+  FROM_LSN="$last_to_lsn"
+  FULL_ID="$last_full_id"
+  echo "基于备份 $BASE_ID (LSN $FROM_LSN) 执行增量备份"
+}
+
+# 生成 xtrabackup 备份参数
+build_backup_args() {
+  BACKUP_ARGS=(--backup --host="$MYSQL_HOST" --port="$MYSQL_PORT" --user="$MYSQL_USER" --password="$MYSQL_PASSWORD" --extra-lsndir="$LSN_DIR")
+  if [ "$BACKUP_TYPE" == "incremental" ]; then
+    BACKUP_ARGS+=(--incremental-lsn="$FROM_LSN")
+  fi
+  if [ -n "$XTRABACKUP_PARALLEL" ]; then
+    BACKUP_ARGS+=(--parallel="$XTRABACKUP_PARALLEL")
+  fi
+  if [ -n "$XTRABACKUP_THROTTLE" ]; then
+    BACKUP_ARGS+=(--throttle="$XTRABACKUP_THROTTLE")
+  fi
+  
+  PREPARE_ARGS=()
+  local memory=$(prepare_memory)
+  if [ -n "$memory" ]; then
+    PREPARE_ARGS+=(--use-memory="$memory")
+  fi
+}
+
+# xtrabackup --prepare 的 --use-memory：XTRABACKUP_USE_MEMORY，或容器内存上限（cgroup v2/v1）的一半
+prepare_memory() {
+  if [ -n "$XTRABACKUP_USE_MEMORY" ]; then
+    echo "$XTRABACKUP_USE_MEMORY"
+    return
+  fi
+  local limit=$(cat /sys/fs/cgroup/memory.max 2>/dev/null || cat /sys/fs/cgroup/memory/memory.limit_in_bytes 2>/dev/null)
+  # 没有上限时为 max 或接近 2^63 的值
+  if [[ "$limit" =~ ^[0-9]+$ ]] && [ "$limit" -lt $((1 << 50)) ]; then
+    echo "$((limit / 2 / 1048576))M"
+  fi
+}
+
+# 设置本脚本的 IO 调度类，xtrabackup、压缩和上传等子进程继承该设置，减少与 MySQL 争用数据盘
+# 只有 BFQ（及旧内核的 CFQ）调度器按 IO 类分配磁盘时间；设置失败时照常备份
+set_io_class() {
+  local args=()
+  case "$IO_CLASS" in
+    "") return ;;
+    idle) args=(-c 3) ;;
+    best-effort) args=(-c 2 ${IO_PRIORITY:+-n "$IO_PRIORITY"}) ;;
+    *)
+      echo "警告: 未知的 IO 调度类 $IO_CLASS，忽略" >&2
+      return
+      ;;
+  esac
+  
+  if ionice "${args[@]}" -p $$; then
+    echo "IO 调度类: $(ionice -p $$)"
+  else
+    echo "警告: 设置 IO 调度类 $IO_CLASS 失败，不调整备份的 IO 优先级" >&2
+  fi
+}
+
+# 按配置的压缩方式压缩标准输入（zstd 和 pigz 默认使用所有CPU核心，可用 COMPRESSION_THREADS 限制）
+compress() {
+  local level=""
+  [ -n "$COMPRESSION_LEVEL" ] && level="-$COMPRESSION_LEVEL"
+  
+  case "$COMPRESSION_CODEC" in
+    zstd) zstd -q -T"${COMPRESSION_THREADS:-0}" $level -c ;;
+    pigz) pigz ${COMPRESSION_THREADS:+-p "$COMPRESSION_THREADS"} $level -c ;;
+    none) cat ;;
+    *) gzip $level -c ;;
+  esac
+}
+
+# 压缩标准输入写入文件 $1，同时计算写入内容的 SHA-256 和字节数记录到 DIGEST_FILE，上传后不必再读一遍备份
+compress_to_file() {
+  compress | tee "$1" | sha256sum > "$DIGEST_FILE.tmp"
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ] || [ "${status[2]}" -ne 0 ]; then
+    rm -f "$DIGEST_FILE.tmp"
+    return 1
+  fi
+  echo "$(awk '{print $1}' "$DIGEST_FILE.tmp") $(stat -c %s "$1")" > "$DIGEST_FILE"
+  rm -f "$DIGEST_FILE.tmp"
 }
 
 # 执行数据库备份
 perform_backup() {
   if [ "$SKIP_BACKUP" -eq 1 ]; then
     echo "跳过实际备份，创建测试文件"
-    echo "这是一个S3上传测试文件" > "$BACKUP_DIR/$BACKUP_NAME.tar.gz"
+    echo "这是一个S3上传测试文件" > "$BACKUP_DIR/$BACKUP_FILE"
     return 0
   fi
   
   # 执行备份
-  echo "开始备份到 $BACKUP_DIR/$BACKUP_NAME"
-  xtrabackup --backup --host="$MYSQL_HOST" --port="$MYSQL_PORT" --user="$MYSQL_USER" --password="$MYSQL_PASSWORD" --target-dir="$BACKUP_DIR/$BACKUP_NAME"
+  echo "开始${BACKUP_TYPE}备份到 $BACKUP_DIR/$BACKUP_NAME"
+  local started=$SECONDS
+  xtrabackup "${BACKUP_ARGS[@]}" --target-dir="$BACKUP_DIR/$BACKUP_NAME"
   
   if [ $? -ne 0 ]; then
     echo "备份失败！" >&2
     exit 1
   fi
+  COPY_SECONDS=$((SECONDS - started))
   
-  # 准备备份
-  echo "准备备份"
-  xtrabackup --prepare --target-dir="$BACKUP_DIR/$BACKUP_NAME"
+  # 准备备份（PREPARE_AT 为 restore 或 job 时上传未 prepare 的备份，缩短备份作业占用数据卷和节点 IO 的时间）
+  if [ "$PREPARE_AT" == "backup" ]; then
+    echo "准备备份"
+    xtrabackup --prepare "${PREPARE_ARGS[@]}" --target-dir="$BACKUP_DIR/$BACKUP_NAME"
   
-  if [ $? -ne 0 ]; then
-    echo "准备失败！" >&2
-    exit 1
+    if [ $? -ne 0 ]; then
+      echo "准备失败！" >&2
+      exit 1
+    fi
+    PREPARED=1
   fi
   
   # 压缩备份
-  echo "压缩备份"
-  tar czvf "$BACKUP_DIR/$BACKUP_NAME.tar.gz" -C "$BACKUP_DIR" "$BACKUP_NAME"
+  echo "压缩备份 ($COMPRESSION_CODEC)"
+  tar cf - -C "$BACKUP_DIR" "$BACKUP_NAME" | compress_to_file "$BACKUP_DIR/$BACKUP_FILE"
   
-  if [ $? -ne 0 ]; then
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ]; then
     echo "压缩失败！" >&2
     exit 1
   fi
 }
 
+# 上传标准输入
+# 流式模式整体压缩后分段上传；去重模式按内容分块，逐块压缩，已有备份中存在的分块不再上传
+stream_upload() {
+  if [[ "$BACKUP_MODE" == "dedup" ]]; then
+    # 与最近的全量备份和最近的备份对比分块
+    local base_args=()
+    local base
+    for base in $(echo "$CATALOG" | awk '$3 ~ /\.idx$/ { latest = $3; if ($2 != "incremental") full = $3 }
+        END { if (full) print full; if (latest != full) print latest }'); do
+      base_args+=(--base-index "$S3_PREFIX/$base")
+    done
+    local codec="zlib"
+    [ "$COMPRESSION_CODEC" == "none" ] && codec="none"
+    s3tool chunk-put "$S3_PREFIX/$BACKUP_FILE" "${base_args[@]}" --codec "$codec" \
+      ${COMPRESSION_LEVEL:+--level "$COMPRESSION_LEVEL"} --digest-file "$DIGEST_FILE"
+    return
+  fi
+  
+  compress | s3tool put "$S3_PREFIX/$BACKUP_FILE" --digest-file "$DIGEST_FILE"
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ]; then
+    echo "压缩失败！($COMPRESSION_CODEC=${status[0]})" >&2
+    return 1
+  fi
+  return "${status[1]}"
+}
+
+# 流式备份：xtrabackup 输出经压缩后直接分段上传，不在本地保存副本
+# 备份未经 prepare，恢复时再执行
+stream_backup() {
+  local target="s3/$S3_BUCKET/$S3_PREFIX/$BACKUP_FILE"
+  
+  if [ "$SKIP_BACKUP" -eq 1 ]; then
+    echo "跳过实际备份，上传测试文件"
+    echo "这是一个S3上传测试文件" | stream_upload
+    return 0
+  fi
+  
+  echo "开始${BACKUP_TYPE}${BACKUP_MODE}备份到 $target ($COMPRESSION_CODEC)"
+  local started=$SECONDS
+  xtrabackup "${BACKUP_ARGS[@]}" --stream=xbstream --target-dir="$BACKUP_DIR" | stream_upload
+  
+  # 任一环节失败都视为备份失败，并删除可能残留的不完整对象（去重备份在所有分块上传后才写入索引）
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ]; then
+    echo "流式备份失败！(xtrabackup=${status[0]}, 上传=${status[1]})" >&2
+    mc --config-dir "/tmp/.mc" rm "$target" >/dev/null 2>&1
+    exit 1
+  fi
+  
+  # 复制和上传同时进行
+  COPY_SECONDS=$((SECONDS - started))
+  UPLOAD_SECONDS=$COPY_SECONDS
+  echo "备份上传成功: $BACKUP_FILE"
+}
+
 # 配置存储凭证
 setup_auth() {
   if [[ "$S3_TYPE" == "aliyun" ]]; then
@@ -122,23 +566,31 @@ EOF
 
 # 上传备份到存储
 upload_backup() {
+  local started=$SECONDS
   if [[ "$S3_TYPE" == "aliyun" ]]; then
     # 创建检查点目录
-    checkpoint_dir="/tmp/.ossutil_checkpoint_${DATE}"
+    checkpoint_dir="$CHECKPOINT_DIR/ossutil"
     mkdir -p "$checkpoint_dir"
     
-    # 使用 ossutil 上传文件
+    # 使用 ossutil 分段并发上传文件，中断后从检查点继续
     echo "使用 ossutil 上传..."
-    ossutil -c "/tmp/.ossutilconfig" cp "$BACKUP_DIR/$BACKUP_NAME.tar.gz" "oss://$S3_BUCKET/$S3_PREFIX/$BACKUP_NAME.tar.gz" --checkpoint-dir="$checkpoint_dir" --force
+    ossutil -c "/tmp/.ossutilconfig" cp "$BACKUP_DIR/$BACKUP_FILE" "oss://$S3_BUCKET/$S3_PREFIX/$BACKUP_FILE" \
+      --checkpoint-dir="$checkpoint_dir" \
+      --bigfile-threshold=$((S3_PART_SIZE_MB * 1048576)) \
+      --part-size=$((S3_PART_SIZE_MB * 1048576)) \
+      --parallel="$S3_CONCURRENCY" \
+      --retry-times="$S3_MAX_RETRIES" \
+      ${S3_MAX_BANDWIDTH_MB:+--maxupspeed=$((S3_MAX_BANDWIDTH_MB * 1024))} \
+      --force
     
     if [ $? -ne 0 ]; then
       echo "上传到 OSS 存储失败！" >&2
       exit 1
     fi
   else
-    # 使用 mc 上传文件
-    echo "使用 mc 上传..."
-    mc --config-dir "/tmp/.mc" cp "$BACKUP_DIR/$BACKUP_NAME.tar.gz" "s3/$S3_BUCKET/$S3_PREFIX/$BACKUP_NAME.tar.gz"
+    # 使用 s3tool 分段并发上传文件，中断后从检查点继续
+    echo "使用 s3tool 上传..."
+    s3tool put "$S3_PREFIX/$BACKUP_FILE" "$BACKUP_DIR/$BACKUP_FILE" --checkpoint-dir "$CHECKPOINT_DIR"
     
     if [ $? -ne 0 ]; then
       echo "上传到 S3 存储失败！" >&2
@@ -146,8 +598,359 @@ upload_backup() {
     fi
   fi
   
-  echo "备份上传成功: $BACKUP_NAME.tar.gz"
+  UPLOAD_SECONDS=$((SECONDS - started))
+  echo "备份上传成功: $BACKUP_FILE"
+}
 
+# 记录已完成本地备份、等待上传的备份
+save_pending() {
+  cat > "$PENDING_FILE" << EOF
+DATE=$DATE
+BACKUP_NAME=$BACKUP_NAME
+BACKUP_FILE=$BACKUP_FILE
+BACKUP_TYPE=$BACKUP_TYPE
+BASE_ID=$BASE_ID
+FULL_ID=$FULL_ID
+FROM_LSN=$FROM_LSN
+PREPARED=$PREPARED
+START_TIME=$START_TIME
+EOF
+}
+
+# 容器重启后，如果上次的备份已完成但未上传成功，恢复其状态继续上传
+resume_pending() {
+  if [ -f "$PENDING_FILE" ]; then
+    source "$PENDING_FILE"
+    if [ -f "$BACKUP_DIR/$BACKUP_FILE" ]; then
+      echo "发现未上传完成的备份，继续上传: $BACKUP_FILE"
+      return 0
+    fi
+  fi
+  
+  # 清理上次中断的备份残留
+  rm -rf "$BACKUP_DIR"/backup_* "$LSN_DIR" "$CHECKPOINT_DIR" "$PENDING_FILE" "$DIGEST_FILE"
+  mkdir -p "$LSN_DIR"
+  return 1
+}
+
+# 上传备份元数据，后续增量备份和恢复据此确定备份链
+upload_metadata() {
+  if [ -f "$LSN_DIR/xtrabackup_checkpoints" ]; then
+    TO_LSN=$(grep "^to_lsn" "$LSN_DIR/xtrabackup_checkpoints" | awk '{print $3}')
+  fi
+  
+  backup_digest
+  
+  storage_put "$BACKUP_NAME.meta" << EOF
+backup_id=$DATE
+type=$BACKUP_TYPE
+file=$BACKUP_FILE
+base_id=$BASE_ID
+full_id=$FULL_ID
+from_lsn=$FROM_LSN
+to_lsn=$TO_LSN
+prepared=${PREPARED:-0}
+prepare_at=$PREPARE_AT
+size=$SIZE
+sha256=$SHA256
+EOF
+  
+  if [ $? -ne 0 ]; then
+    echo "上传备份元数据失败！" >&2
+    exit 1
+  fi
+}
+
+# 获取已上传备份的字节数和 SHA-256：读取压缩写入本地文件（compress_to_file）或 s3tool 流式上传时记录的结果，
+# 没有记录时（如测试文件）才读取本地文件计算
+backup_digest() {
+  SIZE=""
+  SHA256=""
+  if [ -f "$DIGEST_FILE" ]; then
+    read -r SHA256 SIZE < "$DIGEST_FILE"
+  elif [ -f "$BACKUP_DIR/$BACKUP_FILE" ]; then
+    SIZE=$(stat -c %s "$BACKUP_DIR/$BACKUP_FILE")
+    SHA256=$(sha256sum "$BACKUP_DIR/$BACKUP_FILE" | awk '{print $1}')
+  fi
+}
+
+# 将本次备份加入备份目录（同一备份ID重复上传时替换原有记录）
+update_catalog() {
+  # 离线 prepare 沿用原备份的结束时间（时间点恢复据此选择备份）
+  [ -z "$END_TIME" ] && END_TIME=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+  
+  local line=$(catalog_line "$DATE" "$BACKUP_TYPE" "$BACKUP_FILE" "$BASE_ID" "$FULL_ID" "$FROM_LSN" "$TO_LSN" \
+    "${PREPARED:-0}" "$SIZE" "$SHA256" "$(file_codec "$BACKUP_FILE")" "$START_TIME" "$END_TIME")
+  
+  if ! modify_catalog replace_catalog_entry "$line"; then
+    echo "更新备份目录失败！" >&2
+    exit 1
+  fi
+}
+
+# 备份目录概况（JSON）：备份数、最早和最新的备份ID、总字节数
+catalog_summary() {
+  echo "$CATALOG" | awk 'NF {
+    if (!count++) oldest = $1
+    latest = $1
+    if ($9 != "-") bytes += $9
+  } END {
+    printf "{\"count\": %d, \"oldestBackupId\": \"%s\", \"latestBackupId\": \"%s\", \"totalBytes\": %.0f}", count, oldest, latest, bytes
+  }'
+}
+
+# 将存储中前缀下的对象输出到标准输出
+# S3兼容存储使用 s3tool 按范围并发下载（去重备份按索引下载分块）；阿里云OSS顺序读取
+storage_stream() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" cat "oss://$S3_BUCKET/$S3_PREFIX/$1"
+  elif [[ "$1" == *.idx ]]; then
+    s3tool chunk-get "$S3_PREFIX/$1"
+  else
+    s3tool get "$S3_PREFIX/$1"
+  fi
+}
+
+# 根据备份文件扩展名解压标准输入（gzip 和 zstd 解压时校验各自的校验和）
+decompress() {
+  case "$1" in
+    *.zst) zstd -q -d -c ;;
+    *.gz) pigz -d -c ;;
+    *) cat ;;
+  esac
+}
+
+# 检查解压后的归档结构：xbstream 逐块校验 CRC32，tar 列出所有成员；两者都必须包含 xtrabackup_checkpoints
+check_structure() {
+  local result
+  if [[ "$1" == *.xbstream* ]]; then
+    xbcheck.py
+    result=$?
+  else
+    tar tf - | awk '/\/xtrabackup_checkpoints$/ { found = 1 } END { exit !found }'
+    local status=("${PIPESTATUS[@]}")
+    result=$((status[0] || status[1]))
+  fi
+  # 出错时读完剩余数据，下载和摘要计算照常完成
+  cat > /dev/null
+  return $result
+}
+
+# 校验已上传的备份：边下载边计算 SHA-256 和字节数并与备份目录比较，同时解压检查归档结构，不写入磁盘
+# 校验失败的原因记录在 VERIFY_ERROR 中，由 report_verify 报告，不重试
+verify_backup() {
+  local entry
+  if [ -n "$VERIFY_BACKUP_ID" ]; then
+    entry=$(echo "$CATALOG" | awk -v id="$VERIFY_BACKUP_ID" '$1 == id' | head -n 1)
+  else
+    entry=$(echo "$CATALOG" | grep -v "^$" | tail -n 1)
+  fi
+  if [ -z "$entry" ]; then
+    echo "备份目录中没有找到备份 ${VERIFY_BACKUP_ID:-（最新）}" >&2
+    exit 1
+  fi
+  
+  DATE=$(catalog_value "$entry" backup_id)
+  BACKUP_FILE=$(catalog_value "$entry" file)
+  local expected_sha256=$(catalog_value "$entry" sha256)
+  local expected_size=$(catalog_value "$entry" size)
+  echo "校验备份 $BACKUP_FILE"
+  [ -z "$expected_sha256" ] && echo "警告: 备份目录中没有该备份的 SHA-256，只检查归档结构" >&2
+  
+  rm -rf "$VERIFY_DIR"
+  mkdir -p "$VERIFY_DIR"
+  mkfifo "$VERIFY_DIR/sha256.fifo" "$VERIFY_DIR/size.fifo"
+  sha256sum < "$VERIFY_DIR/sha256.fifo" > "$VERIFY_DIR/sha256" &
+  local hash_pid=$!
+  wc -c < "$VERIFY_DIR/size.fifo" > "$VERIFY_DIR/size" &
+  local size_pid=$!
+  
+  storage_stream "$BACKUP_FILE" | tee "$VERIFY_DIR/sha256.fifo" "$VERIFY_DIR/size.fifo" \
+    | decompress "$BACKUP_FILE" | check_structure "$BACKUP_FILE"
+  local status=("${PIPESTATUS[@]}")
+  wait $hash_pid $size_pid
+  
+  SHA256=$(awk '{print $1}' "$VERIFY_DIR/sha256")
+  SIZE=$(cat "$VERIFY_DIR/size")
+  rm -rf "$VERIFY_DIR"
+  
+  # 解压失败时下载会因管道关闭而中断，优先报告解压和结构错误
+  VERIFY_ERROR=""
+  if [ "${status[2]}" -ne 0 ]; then
+    VERIFY_ERROR="解压失败（$(file_codec "$BACKUP_FILE")）"
+  elif [ "${status[3]}" -ne 0 ]; then
+    VERIFY_ERROR="归档结构错误"
+  elif [ "${status[0]}" -ne 0 ]; then
+    VERIFY_ERROR="下载失败"
+  elif [ -n "$expected_sha256" ] && [ "$SHA256" != "$expected_sha256" ]; then
+    VERIFY_ERROR="SHA-256 不匹配（目录中为 $expected_sha256，实际为 $SHA256）"
+  elif [ -n "$expected_size" ] && [ "$SIZE" != "$expected_size" ]; then
+    VERIFY_ERROR="大小不匹配（目录中为 $expected_size 字节，实际为 $SIZE 字节）"
+  fi
+  
+  if [ -n "$VERIFY_ERROR" ]; then
+    echo "备份 $BACKUP_FILE 校验失败: $VERIFY_ERROR" >&2
+  else
+    echo "备份 $BACKUP_FILE 校验通过（$SIZE 字节，SHA-256 $SHA256）"
+  fi
+}
+
+# 将校验结果写入容器终止消息（JSON）：
+#   action=verify、backupId、file、codec；size 和 sha256 为实际下载的字节数和摘要；
+#   verified 为是否通过，error 为失败原因
+report_verify() {
+  local verified="true"
+  [ -n "$VERIFY_ERROR" ] && verified="false"
+  if [ -w /dev/termination-log ]; then
+    cat > /dev/termination-log << EOF
+{"action": "verify", "backupId": "$DATE", "file": "$BACKUP_FILE", "size": "$SIZE", "sha256": "$SHA256", "codec": "$(file_codec "$BACKUP_FILE")", "verified": $verified, "error": "$VERIFY_ERROR"}
+EOF
+  fi
+}
+
+# 离线 prepare 已上传的备份：下载解压到本地，prepare 后重新打包上传为 backup_<ID>.prepared.tar*，
+# 备份目录和元数据指向新备份后删除原备份，恢复时不再需要 prepare
+# 由操作器在备份完成后创建的单独作业执行，不挂载数据卷，可以调度到 MySQL 以外的节点
+prepare_offline() {
+  local entry
+  if [ -n "$PREPARE_BACKUP_ID" ]; then
+    entry=$(echo "$CATALOG" | awk -v id="$PREPARE_BACKUP_ID" '$1 == id' | head -n 1)
+  else
+    entry=$(echo "$CATALOG" | grep -v "^$" | tail -n 1)
+  fi
+  if [ -z "$entry" ]; then
+    echo "备份目录中没有找到备份 ${PREPARE_BACKUP_ID:-（最新）}" >&2
+    exit 1
+  fi
+  
+  DATE=$(catalog_value "$entry" backup_id)
+  BACKUP_NAME="backup_$DATE"
+  BACKUP_FILE=$(catalog_value "$entry" file)
+  BACKUP_TYPE=$(catalog_value "$entry" type)
+  BASE_ID=$(catalog_value "$entry" base_id)
+  FULL_ID=$(catalog_value "$entry" full_id)
+  FROM_LSN=$(catalog_value "$entry" from_lsn)
+  TO_LSN=$(catalog_value "$entry" to_lsn)
+  PREPARED=$(catalog_value "$entry" prepared)
+  SIZE=$(catalog_value "$entry" size)
+  SHA256=$(catalog_value "$entry" sha256)
+  START_TIME=$(catalog_value "$entry" start_time)
+  END_TIME=$(catalog_value "$entry" end_time)
+  
+  if [ "$PREPARED" == "1" ]; then
+    echo "备份 $BACKUP_FILE 已经 prepare，跳过"
+    return
+  fi
+  # 增量备份链中的备份只能在恢复时按顺序 prepare
+  if [ "$BACKUP_TYPE" == "incremental" ] \
+    || echo "$CATALOG" | awk -v id="$DATE" '$5 == id && $1 != id { found = 1 } END { exit !found }'; then
+    echo "备份 $BACKUP_FILE 属于增量备份链，留到恢复时 prepare"
+    return
+  fi
+  
+  local source_file="$BACKUP_FILE"
+  local target_dir="$BACKUP_DIR/$BACKUP_NAME"
+  rm -rf "$target_dir"
+  mkdir -p "$target_dir"
+  
+  echo "下载并解压备份 $source_file"
+  if [[ "$source_file" == *.xbstream* ]]; then
+    storage_stream "$source_file" | decompress "$source_file" | xbstream -x -C "$target_dir"
+  else
+    storage_stream "$source_file" | decompress "$source_file" | tar xf - -C "$target_dir" --strip-components=1
+  fi
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ] || [ "${status[2]}" -ne 0 ]; then
+    echo "下载或解压备份失败！" >&2
+    exit 1
+  fi
+  
+  build_backup_args
+  echo "准备备份 ${PREPARE_ARGS[*]}"
+  xtrabackup --prepare "${PREPARE_ARGS[@]}" --target-dir="$target_dir"
+  if [ $? -ne 0 ]; then
+    echo "准备失败！" >&2
+    exit 1
+  fi
+  PREPARED=1
+  
+  BACKUP_FILE="$BACKUP_NAME.prepared.tar$COMPRESSION_EXT"
+  echo "压缩备份 ($COMPRESSION_CODEC)"
+  tar cf - -C "$BACKUP_DIR" "$BACKUP_NAME" | compress_to_file "$BACKUP_DIR/$BACKUP_FILE"
+  status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ]; then
+    echo "压缩失败！" >&2
+    exit 1
+  fi
+  rm -rf "$target_dir"
+  
+  upload_backup
+  
+  # prepare 可能持续数小时，期间其他备份和保留清理会修改备份目录，写入前重新读取
+  load_catalog
+  entry=$(echo "$CATALOG" | awk -v id="$DATE" '$1 == id' | head -n 1)
+  if [ "$(catalog_value "$entry" file)" != "$source_file" ]; then
+    storage_rm_batch "$BACKUP_FILE" || echo "警告: 删除 $BACKUP_FILE 失败" >&2
+    rm -rf "$BACKUP_DIR/$BACKUP_FILE" "$CHECKPOINT_DIR" "$DIGEST_FILE"
+    if [ -z "$entry" ]; then
+      echo "备份 $DATE 在 prepare 期间已被删除，丢弃 prepare 结果" >&2
+      exit 1
+    fi
+    BACKUP_FILE=$(catalog_value "$entry" file)
+    PREPARED=$(catalog_value "$entry" prepared)
+    SIZE=$(catalog_value "$entry" size)
+    SHA256=$(catalog_value "$entry" sha256)
+    echo "备份 $DATE 已被其他作业替换为 $BACKUP_FILE，丢弃本次 prepare 结果"
+    return
+  fi
+  upload_metadata
+  update_catalog
+  
+  # 备份目录已指向新备份，删除原备份（去重备份先删除不再被其他索引引用的分块）
+  if [[ "$source_file" == *.idx ]]; then
+    local keep_args=()
+    local index
+    for index in $(echo "$CATALOG" | awk '$3 ~ /\.idx$/ { print $3 }'); do
+      keep_args+=(--keep-index "$S3_PREFIX/$index")
+    done
+    s3tool chunk-gc "$S3_PREFIX/$source_file" "${keep_args[@]}" || echo "警告: 部分分块删除失败" >&2
+  fi
+  storage_rm_batch "$source_file" || echo "警告: 删除原备份 $source_file 失败" >&2
+  rm -rf "$BACKUP_DIR/$BACKUP_FILE" "$CHECKPOINT_DIR" "$DIGEST_FILE"
+  echo "备份 $DATE 已离线 prepare: $BACKUP_FILE"
+}
+
+# 将离线 prepare 的结果写入容器终止消息（JSON）：
+#   action=prepare、backupId；file、size、sha256、codec 为 prepare 后的备份对象；
+#   prepared 为 1 表示已 prepare，为 0 表示属于增量备份链、留到恢复时 prepare
+report_prepare() {
+  if [ -w /dev/termination-log ]; then
+    cat > /dev/termination-log << EOF
+{"action": "prepare", "backupId": "$DATE", "file": "$BACKUP_FILE", "size": "$SIZE", "sha256": "$SHA256", "codec": "$(file_codec "$BACKUP_FILE")", "prepared": "${PREPARED:-0}"}
+EOF
+  fi
+}
+
+# 上传速率（字节/秒）：备份对象字节数除以上传用时，用于评估限速的效果
+upload_rate() {
+  [ -n "$SIZE" ] && [ -n "$UPLOAD_SECONDS" ] && echo $((SIZE / (UPLOAD_SECONDS > 0 ? UPLOAD_SECONDS : 1)))
+}
+
+# 将备份结果写入容器终止消息（JSON），由操作器记录到资源状态中：
+#   backupId、type（full/incremental）、file、baseId、fullId、fromLsn、toLsn 描述备份及其所在的增量链；
+#   size、sha256、codec 描述上传的对象；prepared、prepareAt 为 prepare 状态和时机；
+#   startTime、endTime、copySeconds、uploadSeconds、uploadBytesPerSecond 为用时和上传速率；
+#   catalog 为备份目录概况（见 catalog_summary）
+report_result() {
+  if [ -w /dev/termination-log ]; then
+    cat > /dev/termination-log << EOF
+{"backupId": "$DATE", "type": "$BACKUP_TYPE", "file": "$BACKUP_FILE", "baseId": "$BASE_ID", "fullId": "$FULL_ID", "fromLsn": "$FROM_LSN", "toLsn": "$TO_LSN", "size": "$SIZE", "sha256": "$SHA256", "codec": "$(file_codec "$BACKUP_FILE")", "prepared": "${PREPARED:-0}", "prepareAt": "$PREPARE_AT", "startTime": "$START_TIME", "endTime": "$END_TIME", "copySeconds": "$COPY_SECONDS", "uploadSeconds": "$UPLOAD_SECONDS", "uploadBytesPerSecond": "$(upload_rate)", "catalog": $(catalog_summary)}
+EOF
+  fi
+}
+
+# 通知回调地址
+notify_callback() {
   if [ -n "$CALLBACK_URL" ]; then
     echo "回调: $CALLBACK_URL"
     result=$(curl -X POST "$CALLBACK_URL" -d "backup_name=$BACKUP_NAME" --max-time 10 --retry 3 --retry-delay 1 --retry-max-time 60)
@@ -155,57 +958,114 @@ upload_backup() {
   fi
 }
 
-# 清理本地备份文件
-cleanup() {
-  echo "清理本地备份文件"
-  rm -rf "$BACKUP_DIR/$BACKUP_NAME" "$BACKUP_DIR/$BACKUP_NAME.tar.gz"
-  echo "清理远程备份文件"
-  echo "清理${S3_KEEP_DAYS}天前的远程备份文件"
+# 按保留策略计算需要删除的备份ID
+# 保留 S3_KEEP_DAYS 天内的所有备份，以及最近 S3_KEEP_DAILY 天、S3_KEEP_WEEKLY 周、S3_KEEP_MONTHLY 个月中每天/周/月最新的备份
+# 仍有备份需要保留的备份链不能删除，否则其中的增量备份无法恢复（没有全量备份ID的旧备份自成一链）
+expired_ids() {
+  local keep_days_ago=$(date -d "$S3_KEEP_DAYS days ago" +%Y%m%d)
+  local lines=$(echo "$CATALOG" | grep -v "^$" | sort -r)
+  [ -z "$lines" ] && return
   
-  keep_days_ago=$(date -d "$S3_KEEP_DAYS days ago" +%Y%m%d)
+  # 每行前加上 ISO 周（一次 date 调用转换所有备份日期）
+  paste -d " " <(echo "$lines" | cut -c1-8 | date -f - +%G%V) <(echo "$lines") | awk \
+    -v keep_after="$keep_days_ago" -v daily="${S3_KEEP_DAILY:-0}" -v weekly="${S3_KEEP_WEEKLY:-0}" -v monthly="${S3_KEEP_MONTHLY:-0}" '
+    {
+      week = $1; id = $2; full = ($6 == "-") ? id : $6
+      day = substr(id, 1, 8); month = substr(id, 1, 6)
+      keep = day > keep_after
+      if (!(day in days) && kept_days < daily) { days[day]; kept_days++; keep = 1 }
+      if (!(week in weeks) && kept_weeks < weekly) { weeks[week]; kept_weeks++; keep = 1 }
+      if (!(month in months) && kept_months < monthly) { months[month]; kept_months++; keep = 1 }
+      if (keep) protected[full]
+      ids[NR] = id; chains[NR] = full
+    }
+    END {
+      for (i = 1; i <= NR; i++) if (!(chains[i] in protected)) print ids[i]
+    }'
+}
 
+# 批量删除存储中前缀下的对象
+# S3兼容存储使用 s3tool 的 DeleteObjects，每个请求最多删除1000个对象；ossutil 不支持批量删除指定对象，逐个删除
+storage_rm_batch() {
   if [[ "$S3_TYPE" == "aliyun" ]]; then
-    # 列出所有备份文件
-    backup_list=$(ossutil -c "/tmp/.ossutilconfig" ls "oss://$S3_BUCKET/$S3_PREFIX/" | grep -E "backup_[0-9]+\.tar\.gz")
-    
-    # 提取出所有备份文件的路径
-    while IFS= read -r line; do
-      if [[ "$line" =~ oss://.*/backup_([0-9]{8})[0-9]*\.tar\.gz ]]; then
-        file_path=$(echo "$line" | awk '{print $NF}')
-        backup_date="${BASH_REMATCH[1]}"
-        
-        if [ "$backup_date" -le "$keep_days_ago" ]; then
-          echo "删除旧备份文件: $file_path"
-          ossutil -c "/tmp/.ossutilconfig" rm "$file_path" --force
-        fi
-      fi
-    done <<< "$backup_list"
-  else
-    # 列出所有备份文件
-    backup_list=$(mc --config-dir "/tmp/.mc" ls "s3/$S3_BUCKET/$S3_PREFIX/" | grep -E "backup_[0-9]+\.tar\.gz")
-    
-    # 提取出所有备份文件的名称和日期
-    while IFS= read -r line; do
-      if [[ "$line" =~ [^/]*backup_([0-9]{8})[0-9]*\.tar\.gz ]]; then
-        file_name=$(echo "$line" | grep -o "backup_[0-9]*.tar.gz")
-        backup_date="${BASH_REMATCH[1]}"
-        
-        if [ "$backup_date" -le "$keep_days_ago" ]; then
-          echo "删除旧备份文件: $file_name"
-          mc --config-dir "/tmp/.mc" rm "s3/$S3_BUCKET/$S3_PREFIX/$file_name"
-        fi
-      fi
-    done <<< "$backup_list"
+    local object
+    for object in "$@"; do
+      storage_rm "$object" >/dev/null 2>&1 || echo "警告: 删除 $object 失败" >&2
+    done
+  else
+    s3tool rm "${@/#/$S3_PREFIX/}"
   fi
 }
 
+# 清理本地备份文件，并按备份目录清理过期的远程备份
+cleanup() {
+  echo "清理本地备份文件"
+  rm -rf "$BACKUP_DIR/$BACKUP_NAME" "$BACKUP_DIR/$BACKUP_FILE" "$CHECKPOINT_DIR" "$PENDING_FILE" "$DIGEST_FILE"
+  echo "清理远程备份文件（保留${S3_KEEP_DAYS}天内的备份，每日/每周/每月各保留 ${S3_KEEP_DAILY:-0}/${S3_KEEP_WEEKLY:-0}/${S3_KEEP_MONTHLY:-0} 个）"
+  
+  if [ -z "$(expired_ids)" ]; then
+    return
+  fi
+  
+  # 先从目录中移除再删除对象：删除失败只会留下目录之外的对象，目录不会指向已删除的备份
+  # 过期的备份按写入时最新的目录计算，备份文件和元数据一次批量删除
+  if ! modify_catalog remove_expired_entries; then
+    echo "更新备份目录失败，跳过远程清理" >&2
+    return
+  fi
+  [ -z "$EXPIRED_IDS" ] && return
+  local objects=("${EXPIRED_OBJECTS[@]}")
+  echo "删除 $(echo "$EXPIRED_IDS" | wc -l) 个过期备份: $(echo $EXPIRED_IDS)"
+  
+  # 去重备份先删除不再被保留的索引引用的分块，再删除索引
+  local expired_indexes=($(printf "%s\n" "${objects[@]}" | grep "\.idx$"))
+  if [ ${#expired_indexes[@]} -gt 0 ]; then
+    local keep_args=()
+    local index
+    for index in $(echo "$CATALOG" | awk '$3 ~ /\.idx$/ { print $3 }'); do
+      keep_args+=(--keep-index "$S3_PREFIX/$index")
+    done
+    s3tool chunk-gc "${expired_indexes[@]/#/$S3_PREFIX/}" "${keep_args[@]}" || echo "警告: 部分过期分块删除失败" >&2
+  fi
+  
+  storage_rm_batch "${objects[@]}" || echo "警告: 部分过期备份删除失败" >&2
+}
+
 # 主执行流程
 main() {
   check_requirements
-  perform_backup
+  set_io_class
   setup_auth
-  upload_backup
+  load_catalog
+  if [ "$BACKUP_ACTION" == "verify" ]; then
+    verify_backup
+    report_verify
+    exit 0
+  fi
+  if [ "$BACKUP_ACTION" == "prepare" ]; then
+    prepare_offline
+    report_prepare
+    exit 0
+  fi
+  if resume_pending; then
+    upload_backup
+  else
+    START_TIME=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+    plan_backup
+    build_backup_args
+    if [[ "$BACKUP_MODE" == "streaming" || "$BACKUP_MODE" == "dedup" ]]; then
+      stream_backup
+    else
+      perform_backup
+      save_pending
+      upload_backup
+    fi
+  fi
+  upload_metadata
+  update_catalog
+  notify_callback
   cleanup
+  report_result
   echo "备份完成！"
 }
 
@@ -0,0 +1,225 @@
+#!/bin/bash
+
+# 将所有环境变量写入 /app/env 文件
+env > /app/env
+
+# binlog 传送：作为 MySQL Pod 的边车运行，定期把数据目录中的 binlog 上传到备份存储，用于时间点恢复
+# - 正在写入的 binlog 每隔 BINLOG_SHIP_INTERVAL 秒上传新增的部分，保存为分段对象 binlogs/<文件名>.<序号>
+# - binlog 轮换后上传完整的 binlogs/<文件名>，删除其分段
+# - 早于最早备份的 binlog 恢复时不再需要，从存储中删除
+
+# 默认配置
+S3_BUCKET="example-bucket"
+S3_ENDPOINT="https://example.com"
+S3_ACCESS_KEY="**********"
+S3_SECRET_KEY="**********"
+S3_PREFIX="default"
+S3_TYPE="" # aliyun或留空表示S3兼容存储
+BINLOG_SHIP_INTERVAL=10 # 上传新增 binlog 的间隔（秒），即时间点恢复最多丢失的时间
+BINLOG_PRUNE_INTERVAL=3600 # 清理早于最早备份的 binlog 的间隔（秒）
+BINLOG_INDEX="binlog.index" # MySQL 的 binlog 索引文件（相对于数据目录）
+
+# MySQL 数据目录（只读挂载）
+DATA_DIR="/var/lib/mysql"
+
+# binlog 目录：前缀下的 binlogs/index 对象，每行一个 binlog（按文件名排序），字段以空格分隔
+# 文件名 已上传字节数 分段数 首个事件时间（epoch） 是否已轮换（1 表示已上传完整文件）
+BINLOG_DIR="binlogs"
+BINLOG_INDEX_OBJECT="$BINLOG_DIR/index"
+
+# 加载环境变量配置
+if [ -f /app/env ]; then
+  source /app/env
+fi
+
+# 使用环境变量覆盖默认值
+[ -n "$S3_BUCKET" ] && S3_BUCKET="$S3_BUCKET"
+[ -n "$S3_ENDPOINT" ] && S3_ENDPOINT="$S3_ENDPOINT"
+[ -n "$S3_ACCESS_KEY" ] && S3_ACCESS_KEY="$S3_ACCESS_KEY"
+[ -n "$S3_SECRET_KEY" ] && S3_SECRET_KEY="$S3_SECRET_KEY"
+[ -n "$S3_PREFIX" ] && S3_PREFIX="$S3_PREFIX"
+[ -n "$BINLOG_SHIP_INTERVAL" ] && BINLOG_SHIP_INTERVAL="$BINLOG_SHIP_INTERVAL"
+[ -n "$BINLOG_PRUNE_INTERVAL" ] && BINLOG_PRUNE_INTERVAL="$BINLOG_PRUNE_INTERVAL"
+[ -n "$BINLOG_INDEX" ] && BINLOG_INDEX="$BINLOG_INDEX"
+
+# 判断是否为阿里云OSS
+if [[ "$S3_ENDPOINT" == *"aliyuncs"* ]]; then
+  S3_TYPE="aliyun"
+fi
+
+# 检查必需变量
+check_requirements() {
+  if [ -z "$S3_BUCKET" ] || [ -z "$S3_ACCESS_KEY" ] || [ -z "$S3_SECRET_KEY" ]; then
+    echo "错误: S3_BUCKET, S3_ACCESS_KEY, 和 S3_SECRET_KEY 必须设置。" >&2
+    exit 1
+  fi
+}
+
+# 配置存储凭证
+setup_auth() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    echo "配置 Aliyun OSS 的 ossutil"
+    config_file="/tmp/.ossutilconfig"
+    cat > "$config_file" << EOF
+[Credentials]
+language=EN
+endpoint=$S3_ENDPOINT
+accessKeyID=$S3_ACCESS_KEY
+accessKeySecret=$S3_SECRET_KEY
+EOF
+  else
+    echo "使用 MinIO 客户端 S3 配置"
+    mkdir -p "/tmp/.mc"
+    mc --config-dir "/tmp/.mc" alias set s3 "$S3_ENDPOINT" "$S3_ACCESS_KEY" "$S3_SECRET_KEY"
+  fi
+}
+
+# 读取存储中前缀下的对象内容
+storage_cat() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" cat "oss://$S3_BUCKET/$S3_PREFIX/$1"
+  else
+    mc --config-dir "/tmp/.mc" cat "s3/$S3_BUCKET/$S3_PREFIX/$1"
+  fi
+}
+
+# 将标准输入上传为存储中前缀下的对象
+storage_put() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    local tmp_file=$(mktemp)
+    cat > "$tmp_file"
+    ossutil -c "/tmp/.ossutilconfig" cp "$tmp_file" "oss://$S3_BUCKET/$S3_PREFIX/$1" --force >/dev/null
+    local result=$?
+    rm -f "$tmp_file"
+    return $result
+  else
+    mc --config-dir "/tmp/.mc" pipe "s3/$S3_BUCKET/$S3_PREFIX/$1" >/dev/null
+  fi
+}
+
+# 批量删除存储中前缀下的对象
+storage_rm_batch() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    local object
+    for object in "$@"; do
+      ossutil -c "/tmp/.ossutilconfig" rm "oss://$S3_BUCKET/$S3_PREFIX/$object" --force >/dev/null 2>&1 \
+        || echo "警告: 删除 $object 失败" >&2
+    done
+  else
+    S3_ENDPOINT="$S3_ENDPOINT" S3_ACCESS_KEY="$S3_ACCESS_KEY" S3_SECRET_KEY="$S3_SECRET_KEY" S3_BUCKET="$S3_BUCKET" \
+      s3tool.py rm "${@/#/$S3_PREFIX/}"
+  fi
+}
+
+# 一个 binlog 的所有分段对象名
+segment_objects() {
+  local i
+  for ((i = 0; i < $2; i++)); do
+    printf "%s/%s.%06d\n" "$BINLOG_DIR" "$1" "$i"
+  done
+}
+
+# binlog 首个事件（格式描述事件）的时间戳，即 binlog 的创建时间：4 字节魔数之后的小端 32 位整数
+binlog_first_time() {
+  od -An -tu4 -j4 -N4 --endian=little "$1" | tr -d " "
+}
+
+# 将 INDEX 写回存储
+save_index() {
+  echo "$INDEX" | grep -v "^$" | storage_put "$BINLOG_INDEX_OBJECT"
+}
+
+# 在 INDEX 中替换（或加入）一个 binlog 的记录
+set_entry() {
+  INDEX=$( (echo "$INDEX" | awk -v file="$1" 'NF && $1 != file'; echo "$*") | sort)
+}
+
+# 上传所有 binlog 的新增部分；binlog 索引中的最后一个文件是 MySQL 正在写入的 binlog
+ship_binlogs() {
+  [ -f "$DATA_DIR/$BINLOG_INDEX" ] || return 0
+  local files=($(sed 's#^.*/##' "$DATA_DIR/$BINLOG_INDEX"))
+  [ ${#files[@]} -eq 0 ] && return 0
+  local active="${files[-1]}"
+  local changed=0
+  local file
+  
+  for file in "${files[@]}"; do
+    local path="$DATA_DIR/$file"
+    [ -f "$path" ] || continue
+    local name bytes segments first_time closed
+    read -r name bytes segments first_time closed <<< "$(echo "$INDEX" | awk -v file="$file" '$1 == file')"
+    local created=$(binlog_first_time "$path")
+  
+    # 同名 binlog 的创建时间不同，说明存储中的是另一个实例的 binlog（如从备份恢复的实例沿用了原前缀），不覆盖
+    if [ -n "$name" ] && [ "$first_time" != "-" ] && [ -n "$created" ] && [ "$first_time" != "$created" ]; then
+      echo "警告: 存储中已有另一个实例的 $file，跳过；从备份恢复的实例请使用新的备份前缀" >&2
+      continue
+    fi
+    [ "$closed" == "1" ] && continue
+    bytes=${bytes:-0}
+    segments=${segments:-0}
+    first_time=${created:--}
+  
+    local size=$(stat -c %s "$path")
+  
+    if [ "$file" != "$active" ]; then
+      # 已轮换：上传完整文件，之后恢复只需读取一个对象
+      echo "上传已轮换的 binlog $file（$size 字节）"
+      storage_put "$BINLOG_DIR/$file" < "$path" || return 1
+      set_entry "$file" "$size" 0 "$first_time" 1
+      save_index || return 1
+      if [ "$segments" -gt 0 ]; then
+        storage_rm_batch $(segment_objects "$file" "$segments") >/dev/null || echo "警告: 删除 $file 的分段失败" >&2
+      fi
+    elif [ "$size" -gt "$bytes" ]; then
+      # 正在写入：只上传新增的部分
+      tail -c +$((bytes + 1)) "$path" | head -c $((size - bytes)) \
+        | storage_put "$(printf "%s/%s.%06d" "$BINLOG_DIR" "$file" "$segments")" || return 1
+      set_entry "$file" "$size" $((segments + 1)) "$first_time" 0
+      changed=1
+    fi
+  done
+  
+  if [ "$changed" -eq 1 ]; then
+    save_index
+  fi
+}
+
+# 删除早于最早备份的 binlog：下一个 binlog 在最早备份开始前就已创建的 binlog 不会再被回放
+prune_binlogs() {
+  local oldest_id=$(storage_cat "catalog" 2>/dev/null | grep -v "^$" | head -n 1 | awk '{print $1}')
+  [ -z "$oldest_id" ] && return 0
+  local oldest_time=$(date -d "${oldest_id:0:8} ${oldest_id:8:2}:${oldest_id:10:2}:${oldest_id:12:2}" +%s)
+  
+  local expired=($(echo "$INDEX" | awk -v oldest="$oldest_time" 'NF {
+      if (NR > 1 && $4 != "-" && $4 <= oldest && closed[NR - 1]) print files[NR - 1]
+      files[NR] = $1; closed[NR] = ($5 == 1)
+    }'))
+  [ ${#expired[@]} -eq 0 ] && return 0
+  
+  echo "删除早于最早备份 $oldest_id 的 ${#expired[@]} 个 binlog: ${expired[*]}"
+  INDEX=$(echo "$INDEX" | awk 'NR == FNR { expired[$1]; next } NF && !($1 in expired)' <(printf "%s\n" "${expired[@]}") -)
+  save_index || return 1
+  storage_rm_batch "${expired[@]/#/$BINLOG_DIR/}" >/dev/null || echo "警告: 部分过期 binlog 删除失败" >&2
+}
+
+# 主执行流程
+main() {
+  check_requirements
+  setup_auth
+  INDEX=$(storage_cat "$BINLOG_INDEX_OBJECT" 2>/dev/null)
+  echo "每 ${BINLOG_SHIP_INTERVAL} 秒传送 $DATA_DIR 中的 binlog 到 $S3_PREFIX/$BINLOG_DIR/"
+  
+  local last_prune=0
+  while true; do
+    ship_binlogs || echo "警告: 传送 binlog 失败，下次重试" >&2
+    if [ $(($(date +%s) - last_prune)) -ge "$BINLOG_PRUNE_INTERVAL" ]; then
+      prune_binlogs || echo "警告: 清理 binlog 失败，下次重试" >&2
+      last_prune=$(date +%s)
+    fi
+    sleep "$BINLOG_SHIP_INTERVAL"
+  done
+}
+
+# 运行主函数
+main
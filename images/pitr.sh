@@ -0,0 +1,86 @@
+#!/bin/bash
+
+# 时间点恢复：回放 restore.sh 下载到数据目录 .pitr/ 中的 binlog
+# 作为恢复容器之后的初始化容器运行：临时启动不监听网络、不写 binlog 的 mysqld，
+# 用 mysqlbinlog 从备份的 binlog 位置回放到目标时间或 GTID，完成后正常关闭 mysqld
+
+# MySQL 数据目录
+DATA_DIR="/var/lib/mysql"
+# restore.sh 写入的 binlog 和回放计划（BINLOG_FILES、START_POSITION、STOP_DATETIME、INCLUDE_GTIDS）
+PITR_DIR="$DATA_DIR/.pitr"
+PLAN_FILE="$PITR_DIR/plan"
+# 回放用的 mysqld 只通过这个套接字连接
+SOCKET="/tmp/pitr.sock"
+# 等待 mysqld 启动的最长时间（秒）
+STARTUP_TIMEOUT=300
+
+# 以跳过权限检查的方式启动 mysqld：恢复的数据使用原实例的账号，本容器不知道其密码
+start_mysqld() {
+  echo "启动临时 mysqld"
+  mysqld --datadir="$DATA_DIR" --socket="$SOCKET" --pid-file=/tmp/pitr.pid \
+    --skip-networking --skip-grant-tables --disable-log-bin --skip-replica-start &
+  MYSQLD_PID=$!
+  
+  local i
+  for ((i = 0; i < STARTUP_TIMEOUT; i++)); do
+    if mysqladmin --socket="$SOCKET" ping >/dev/null 2>&1; then
+      return 0
+    fi
+    if ! kill -0 "$MYSQLD_PID" 2>/dev/null; then
+      echo "mysqld 启动失败" >&2
+      exit 1
+    fi
+    sleep 1
+  done
+  echo "等待 mysqld 启动超时" >&2
+  exit 1
+}
+
+# 正常关闭 mysqld（SIGTERM），等待其完成
+stop_mysqld() {
+  kill -TERM "$MYSQLD_PID"
+  wait "$MYSQLD_PID"
+}
+
+# 回放 binlog
+# 先执行 FLUSH PRIVILEGES 重新加载权限表，binlog 中的 CREATE USER、GRANT 等语句才能执行
+# 时间以 UTC 解释；--skip-gtids 使回放不依赖 gtid_mode，GTID 目标通过 --include-gtids 截止
+replay_binlogs() {
+  local args=(--skip-gtids --start-position="$START_POSITION")
+  [ -n "$STOP_DATETIME" ] && args+=(--stop-datetime="$STOP_DATETIME")
+  [ -n "$INCLUDE_GTIDS" ] && args+=(--include-gtids="$INCLUDE_GTIDS")
+  local files=($BINLOG_FILES)
+  
+  echo "回放 ${#files[@]} 个 binlog: ${files[*]}（${STOP_DATETIME:+截止 $STOP_DATETIME UTC}${INCLUDE_GTIDS:+截止 GTID $INCLUDE_GTIDS}）"
+  { echo "FLUSH PRIVILEGES;"; TZ=UTC mysqlbinlog "${args[@]}" "${files[@]/#/$PITR_DIR/}"; } \
+    | mysql --socket="$SOCKET" -uroot
+  
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ]; then
+    echo "回放 binlog 失败！(mysqlbinlog=${status[0]}, mysql=${status[1]})" >&2
+    return 1
+  fi
+}
+
+# 主执行流程
+main() {
+  if [ ! -f "$PLAN_FILE" ]; then
+    echo "没有时间点恢复计划，跳过"
+    exit 0
+  fi
+  source "$PLAN_FILE"
+  
+  start_mysqld
+  if ! replay_binlogs; then
+    stop_mysqld
+    exit 1
+  fi
+  stop_mysqld
+  
+  # 回放完成后删除计划，容器重启时不再重复回放
+  rm -rf "$PITR_DIR"
+  echo "时间点恢复完成"
+}
+
+# 运行主函数
+main
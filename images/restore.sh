@@ -11,10 +11,28 @@ S3_SECRET_KEY="**********"
 S3_PREFIX="default"
 S3_TYPE="" # aliyun或留空表示S3兼容存储
 BACKUP_ID="" # 备份ID，如不提供则使用最新备份
+S3_PART_SIZE_MB=16 # 并发下载的分段大小（MiB）
+S3_CONCURRENCY=4 # 同时下载的分段数
+S3_MAX_RETRIES=5 # 单个分段失败后的重试次数
+XTRABACKUP_USE_MEMORY="" # xtrabackup --prepare 使用的内存（如 1G），留空使用容器内存上限的一半（没有上限时使用 xtrabackup 默认值）
+POINT_IN_TIME="" # 时间点恢复的目标：UTC 时间（如 2024-01-01T12:00:00Z）或 GTID（<server_uuid>:<事务号>），留空只恢复备份
 
-# 恢复目录和临时目录
+# 恢复目录和增量备份的临时目录
 RESTORE_DIR="/app/restore"
 TEMP_DIR="/tmp/mysql_backup"
+# 时间点恢复需要回放的 binlog 和回放计划，由 MySQL 镜像中的 pitr.sh 在启动 MySQL 前回放
+PITR_DIR="$RESTORE_DIR/.pitr"
+
+# 匹配所有格式的备份文件名（backup_<ID>.tar 或 .xbstream，可带 .gz/.zst 压缩后缀）
+BACKUP_FILE_PATTERN="backup_[0-9]+(\.prepared)?\.(tar|xbstream)(\.gz|\.zst|\.idx)?"
+
+# 备份目录：backup.sh 维护的前缀下的 catalog 对象，每行一个备份（按备份ID排序），空值记为 -
+CATALOG_OBJECT="catalog"
+CATALOG_FIELDS=(backup_id type file base_id full_id from_lsn to_lsn prepared size sha256 codec start_time end_time)
+
+# binlog-shipper.sh 传送的 binlog 及其目录（每行: 文件名 字节数 分段数 创建时间 是否已轮换）
+BINLOG_DIR="binlogs"
+BINLOG_INDEX_OBJECT="$BINLOG_DIR/index"
 
 # 加载环境变量配置
 if [ -f /app/env ]; then
@@ -29,6 +47,11 @@ fi
 [ -n "$S3_PREFIX" ] && S3_PREFIX="$S3_PREFIX"
 [ -n "$S3_TYPE" ] && S3_TYPE="$S3_TYPE"
 [ -n "$BACKUP_ID" ] && BACKUP_ID="$BACKUP_ID"
+[ -n "$S3_PART_SIZE_MB" ] && S3_PART_SIZE_MB="$S3_PART_SIZE_MB"
+[ -n "$S3_CONCURRENCY" ] && S3_CONCURRENCY="$S3_CONCURRENCY"
+[ -n "$S3_MAX_RETRIES" ] && S3_MAX_RETRIES="$S3_MAX_RETRIES"
+[ -n "$XTRABACKUP_USE_MEMORY" ] && XTRABACKUP_USE_MEMORY="$XTRABACKUP_USE_MEMORY"
+[ -n "$POINT_IN_TIME" ] && POINT_IN_TIME="$POINT_IN_TIME"
 
 
 # 判断是否为阿里云OSS
@@ -79,14 +102,61 @@ EOF
     mc --config-dir "/tmp/.mc" alias set s3 "$S3_ENDPOINT" "$S3_ACCESS_KEY" "$S3_SECRET_KEY"
   fi
 }
+# 列出前缀下的所有备份文件名（整名匹配，不包括进行中的去重上传的 .pending 标记等对象）
+list_backups() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" ls "oss://$S3_BUCKET/$S3_PREFIX/" | grep -oE "[^/ ]+$" | grep -E "^$BACKUP_FILE_PATTERN$"
+  else
+    mc --config-dir "/tmp/.mc" ls "s3/$S3_BUCKET/$S3_PREFIX/" | awk '{print $NF}' | grep -E "^$BACKUP_FILE_PATTERN$"
+  fi
+}
+
+# 读取存储中前缀下的对象内容
+storage_cat() {
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" cat "oss://$S3_BUCKET/$S3_PREFIX/$1"
+  else
+    mc --config-dir "/tmp/.mc" cat "s3/$S3_BUCKET/$S3_PREFIX/$1"
+  fi
+}
+
+# 从元数据（key=value 格式）中读取字段
+meta_value() {
+  echo "$1" | grep "^$2=" | head -n 1 | cut -d= -f2-
+}
+
+# 从备份目录的一行中读取字段
+catalog_value() {
+  local fields=($1)
+  local i
+  for i in "${!CATALOG_FIELDS[@]}"; do
+    if [ "${CATALOG_FIELDS[$i]}" == "$2" ]; then
+      [ "${fields[$i]:--}" != "-" ] && echo "${fields[$i]}"
+      return 0
+    fi
+  done
+}
+
+# 在备份目录中查找指定备份ID的一行
+catalog_entry() {
+  echo "$CATALOG" | awk -v id="$1" '$1 == id' | head -n 1
+}
+
 # 列出备份并获取目标备份文件名
+# 有备份目录时只读取目录；目录引入前的前缀才列出所有备份
 get_backup_file() {
   local backup_files=""
   local target_file=""
   
-  # 如果指定了备份ID，直接返回对应文件名
+  # 如果指定了备份ID，查找对应文件（格式和压缩方式由扩展名决定）
   if [ -n "$BACKUP_ID" ]; then
-    target_file="backup_${BACKUP_ID}.tar.gz"
+    target_file=$(catalog_value "$(catalog_entry "$BACKUP_ID")" file)
+    if [ -z "$target_file" ]; then
+      target_file=$(list_backups | grep -E "^backup_${BACKUP_ID}\." | head -n 1)
+    fi
+    if [ -z "$target_file" ]; then
+      target_file="backup_${BACKUP_ID}.tar.gz"
+    fi
     if [ -n "$S3_PREFIX" ]; then
       target_file="$S3_PREFIX/$target_file"
     fi
@@ -98,10 +168,18 @@ get_backup_file() {
   # 否则查找最新的备份文件
   echo "查找最新备份..." >&2
   
-  if [[ "$S3_TYPE" == "aliyun" ]]; then
+  if [ -n "$CATALOG" ] && pitr_time > /dev/null; then
+    # 时间点恢复：使用目标时间之前完成的最近一个备份
+    echo "读取备份目录，查找 $POINT_IN_TIME 之前的备份..." >&2
+    target_file=$(catalog_value "$(echo "$CATALOG" | awk -v iso="$(pitr_time +%Y-%m-%dT%H:%M:%SZ)" -v id="$(pitr_time +%Y%m%d%H%M%S)" \
+      'NF && ($13 != "-" ? $13 <= iso : $1 <= id)' | tail -n 1)" file)
+  elif [ -n "$CATALOG" ]; then
+    echo "读取备份目录..." >&2
+    target_file=$(catalog_value "$(echo "$CATALOG" | grep -v "^$" | tail -n 1)" file)
+  elif [[ "$S3_TYPE" == "aliyun" ]]; then
     # 阿里云OSS方式
     echo "列出 OSS 存储桶中的备份..." >&2
-    backup_files=$(ossutil -c "/tmp/.ossutilconfig" ls "oss://$S3_BUCKET/$S3_PREFIX/" | grep -E "backup_[0-9]+\.tar\.gz")
+    backup_files=$(list_backups)
     
     if [ -z "$backup_files" ]; then
       echo "没有找到备份文件" >&2
@@ -109,7 +187,7 @@ get_backup_file() {
     fi
     
     # 提取所有备份文件名并按时间戳排序（最新的在前）
-    all_backups=$(echo "$backup_files" | grep -o "backup_[0-9]*\.tar\.gz" | sort -r)
+    all_backups=$(echo "$backup_files" | sort -r)
     target_file=$(echo "$all_backups" | head -n 1)
   else
     # MinIO/S3方式
@@ -117,7 +195,7 @@ get_backup_file() {
     mc --config-dir "/tmp/.mc" ls "s3/$S3_BUCKET/$S3_PREFIX/" >&2
     
     # 提取所有备份文件并按名称排序（最新的在前）
-    all_backups=$(mc --config-dir "/tmp/.mc" ls "s3/$S3_BUCKET/$S3_PREFIX/" | grep -o "backup_[0-9]*\.tar\.gz" | sort -r)
+    all_backups=$(list_backups | sort -r)
     
     if [ -z "$all_backups" ]; then
       echo "没有找到备份文件" >&2
@@ -143,79 +221,270 @@ get_backup_file() {
   echo "$full_path"
 }
 
-# 下载备份文件
-download_backup() {
-  local backup_file="$1"
-  local success=false
+# 根据备份文件扩展名解压标准输入（去重备份的分块由 s3tool 下载时解压）
+decompress() {
+  case "$1" in
+    *.zst) zstd -q -d -c ;;
+    *.gz) pigz -d -c ;;
+    *) cat ;;
+  esac
+}
+
+# 将备份对象输出到标准输出（对象名相对于存储桶）
+# S3兼容存储使用 s3tool 按范围并发下载，去重备份按索引并发下载分块；ossutil 不支持输出到标准输出的并发下载，阿里云OSS顺序读取
+storage_stream() {
+  local command="get"
+  [[ "$1" == *.idx ]] && command="chunk-get"
+  if [[ "$S3_TYPE" == "aliyun" ]]; then
+    ossutil -c "/tmp/.ossutilconfig" cat "oss://$S3_BUCKET/$1"
+  else
+    S3_ENDPOINT="$S3_ENDPOINT" S3_ACCESS_KEY="$S3_ACCESS_KEY" S3_SECRET_KEY="$S3_SECRET_KEY" S3_BUCKET="$S3_BUCKET" \
+      s3tool.py "$command" "$1" --part-size-mb "$S3_PART_SIZE_MB" --concurrency "$S3_CONCURRENCY" --retries "$S3_MAX_RETRIES"
+  fi
+}
+
+# 解析恢复链：从目标备份沿 base_id 回溯到全量备份
+# 按应用顺序输出每个备份的文件名和是否已 prepare（每行 "<文件名> <0|1>"）
+resolve_chain() {
+  local backup_id="$1"
+  local chain=""
   
-  echo "下载备份文件: $backup_file"
+  while [ -n "$backup_id" ]; do
+    # 优先使用备份目录，不在目录中的备份读取其元数据
+    local entry=$(catalog_entry "$backup_id")
+    if [ -n "$entry" ]; then
+      chain="$(catalog_value "$entry" file) $(catalog_value "$entry" prepared)"$'\n'"$chain"
+      if [ "$(catalog_value "$entry" type)" != "incremental" ]; then
+        break
+      fi
+      backup_id=$(catalog_value "$entry" base_id)
+      continue
+    fi
   
-  if [[ "$S3_TYPE" == "aliyun" ]]; then
-    echo "使用 ossutil 下载..."
-    ossutil -c "/tmp/.ossutilconfig" cp "oss://$S3_BUCKET/$backup_file" "$TEMP_DIR/" --checkpoint-dir="/tmp/.ossutil_checkpoint" --force
-    if [ $? -eq 0 ]; then
-      success=true
+    local meta=$(storage_cat "backup_$backup_id.meta" 2>/dev/null)
+  
+    if [ -z "$meta" ]; then
+      # 没有元数据的旧备份：tar 格式在备份时已执行 prepare
+      local file=$(list_backups | grep -E "^backup_${backup_id}\." | head -n 1)
+      if [ -z "$file" ]; then
+        echo "错误: 找不到备份 $backup_id" >&2
+        exit 1
+      fi
+      local prepared=0
+      [[ "$file" == *.tar* ]] && prepared=1
+      chain="$file $prepared"$'\n'"$chain"
+      break
     fi
-  else
-    echo "使用 MinIO 客户端下载..."
-    mc --config-dir "/tmp/.mc" cp "s3/$S3_BUCKET/$backup_file" "$TEMP_DIR/"
-    if [ $? -eq 0 ]; then
-      success=true
+  
+    chain="$(meta_value "$meta" file) $(meta_value "$meta" prepared)"$'\n'"$chain"
+    if [ "$(meta_value "$meta" type)" != "incremental" ]; then
+      break
     fi
+    backup_id=$(meta_value "$meta" base_id)
+  done
+  
+  printf "%s" "$chain"
+}
+
+# 将一个备份的内容边下载边解压到指定目录，不在本地保存备份文件
+# tar 格式的归档内含 backup_<ID>/ 目录，解压时去掉这一层
+extract_backup() {
+  local backup_file="$1"
+  local target_dir="$2"
+  mkdir -p "$target_dir"
+  
+  echo "流式解压备份文件: $backup_file"
+  if [[ "$backup_file" == *.xbstream* ]]; then
+    storage_stream "$backup_file" | decompress "$backup_file" | xbstream -x -C "$target_dir"
+  else
+    storage_stream "$backup_file" | decompress "$backup_file" | tar xf - -C "$target_dir" --strip-components=1
   fi
   
-  if [ "$success" = false ]; then
-    echo "下载失败"
+  local status=("${PIPESTATUS[@]}")
+  if [ "${status[0]}" -ne 0 ] || [ "${status[1]}" -ne 0 ] || [ "${status[2]}" -ne 0 ]; then
+    echo "解压失败"
     exit 1
   fi
-  
-  echo "下载完成: $TEMP_DIR/$(basename "$backup_file")"
 }
 
-# 解压备份并恢复
-restore_backup() {
-  local backup_file=$(basename "$1")
-  
-  echo "解压备份文件..."
-  tar xzf "$TEMP_DIR/$backup_file" -C "$TEMP_DIR"
+# xtrabackup --prepare 的 --use-memory：XTRABACKUP_USE_MEMORY，或容器内存上限（cgroup v2/v1）的一半
+prepare_memory() {
+  if [ -n "$XTRABACKUP_USE_MEMORY" ]; then
+    echo "$XTRABACKUP_USE_MEMORY"
+    return
+  fi
+  local limit=$(cat /sys/fs/cgroup/memory.max 2>/dev/null || cat /sys/fs/cgroup/memory/memory.limit_in_bytes 2>/dev/null)
+  # 没有上限时为 max 或接近 2^63 的值
+  if [[ "$limit" =~ ^[0-9]+$ ]] && [ "$limit" -lt $((1 << 50)) ]; then
+    echo "$((limit / 2 / 1048576))M"
+  fi
+}
+
+# 执行 xtrabackup --prepare
+# 以 PREPARE_AT=restore/job 上传的备份在这里 prepare（离线 prepare 尚未完成时也是如此），--use-memory 越大 redo 应用越快
+prepare_backup() {
+  local memory=$(prepare_memory)
+  xtrabackup --prepare ${memory:+--use-memory="$memory"} --target-dir="$RESTORE_DIR" "$@"
   if [ $? -ne 0 ]; then
-    echo "解压失败"
+    echo "准备失败"
     exit 1
   fi
+}
+
+# 按顺序恢复备份链：全量备份解压到恢复目录，依次应用增量备份
+restore_chain() {
+  local files=()
+  local prepared=()
+  while read -r file flag; do
+    [ -z "$file" ] && continue
+    [ -n "$S3_PREFIX" ] && file="$S3_PREFIX/$file"
+    files+=("$file")
+    prepared+=("$flag")
+  done <<< "$1"
+  
+  local count=${#files[@]}
+  echo "恢复备份链（共 $count 个备份）: ${files[*]}"
+  
+  extract_backup "${files[0]}" "$RESTORE_DIR"
+  
+  if [ "$count" -eq 1 ]; then
+    # 流式备份和增量模式下的全量备份未在备份时执行 prepare
+    if [ "${prepared[0]}" != "1" ]; then
+      echo "准备备份..."
+      prepare_backup
+    fi
+  else
+    # 除最后一个增量外都只应用redo日志，不回滚未提交事务
+    echo "准备全量备份..."
+    prepare_backup --apply-log-only
+  
+    local incremental_dir="$TEMP_DIR/incremental"
+    for ((i = 1; i < count; i++)); do
+      extract_backup "${files[$i]}" "$incremental_dir"
+  
+      echo "应用增量备份 ${files[$i]}..."
+      if [ "$i" -lt $((count - 1)) ]; then
+        prepare_backup --apply-log-only --incremental-dir="$incremental_dir"
+      else
+        prepare_backup --incremental-dir="$incremental_dir"
+      fi
+      rm -rf "$incremental_dir"
+    done
+  fi
   
-  # 获取解压后的目录名
-  backup_dir="${backup_file%.tar.gz}"
+  # 设置权限（一次遍历同时修改所有权和权限）
+  echo "设置权限..."
+  find "$RESTORE_DIR" -exec chown mysql:mysql {} + -exec chmod 750 {} + 2>/dev/null \
+    || echo "警告: 无法更改所有权为mysql用户，如果在容器内运行这可能是正常的。"
   
-  if [ ! -d "$TEMP_DIR/$backup_dir" ]; then
-    echo "错误: 无法找到解压后的目录: $TEMP_DIR/$backup_dir"
+  echo "恢复完成到: $RESTORE_DIR"
+  echo "注意: 您可能需要重启MySQL服务器以使用恢复的数据。"
+}
+
+# 按格式输出时间点恢复的目标时间（UTC）；目标是 GTID 或未设置时返回失败
+pitr_time() {
+  [ -n "$POINT_IN_TIME" ] || return 1
+  [[ "$POINT_IN_TIME" =~ ^[0-9a-fA-F-]{36}:[0-9]+$ ]] && return 1
+  date -u -d "$POINT_IN_TIME" "${1:-+%s}"
+}
+
+# 截掉 binlog 末尾不完整的事件（传送时 MySQL 可能正写到一半）：从 4 字节魔数之后按事件头中的事件长度逐个跳过
+trim_binlog() {
+  python3.9 - "$1" << 'EOF'
+import os
+import struct
+import sys
+  
+path = sys.argv[1]
+size = os.path.getsize(path)
+offset = 4
+with open(path, "rb") as f:
+    while offset + 19 <= size:
+        f.seek(offset + 9)
+        length, = struct.unpack("<I", f.read(4))
+        if length < 19 or offset + length > size:
+            break
+        offset += length
+os.truncate(path, offset)
+EOF
+}
+
+# 时间点恢复：下载备份的 binlog 位置之后的 binlog，写入回放计划
+# 目标是时间时只下载创建于目标时间之前的 binlog；回放在 MySQL 镜像中进行（恢复镜像没有 mysqld）
+prepare_pitr() {
+  rm -rf "$PITR_DIR"
+  [ -z "$POINT_IN_TIME" ] && return
+  
+  if [ ! -f "$RESTORE_DIR/xtrabackup_binlog_info" ]; then
+    echo "错误: 备份中没有 binlog 位置（xtrabackup_binlog_info），无法进行时间点恢复" >&2
     exit 1
   fi
+  local start_file start_position
+  read -r start_file start_position _ < "$RESTORE_DIR/xtrabackup_binlog_info"
   
-  echo "将文件复制到恢复目录: $RESTORE_DIR"
-  cp -r "$TEMP_DIR/$backup_dir"/* "$RESTORE_DIR/"
-  if [ $? -ne 0 ]; then
-    echo "恢复失败"
+  local stop_datetime=""
+  local include_gtids=""
+  local target_time=""
+  if target_time=$(pitr_time); then
+    # mysqlbinlog 的 --stop-datetime 不包含该秒本身，加一秒以包含目标时间提交的事务
+    stop_datetime=$(date -u -d "@$((target_time + 1))" "+%Y-%m-%d %H:%M:%S")
+  elif [[ "$POINT_IN_TIME" =~ ^([0-9a-fA-F-]{36}):([0-9]+)$ ]]; then
+    include_gtids="${BASH_REMATCH[1]}:1-${BASH_REMATCH[2]}"
+  else
+    echo "错误: 无法解析时间点恢复目标 $POINT_IN_TIME" >&2
     exit 1
   fi
   
-  # 设置权限
-  echo "设置权限..."
-  chown -R mysql:mysql "$RESTORE_DIR" 2>/dev/null || echo "警告: 无法更改所有权为mysql用户，如果在容器内运行这可能是正常的。"
-  chmod -R 750 "$RESTORE_DIR"
+  local binlogs=$(storage_cat "$BINLOG_INDEX_OBJECT" 2>/dev/null | awk -v start="$start_file" -v target="$target_time" \
+    'NF && $1 >= start && ($1 == start || target == "" || $4 == "-" || $4 <= target) { print $1, $3, $5 }')
+  if [ "$(echo "$binlogs" | awk 'NR == 1 { print $1 }')" != "$start_file" ]; then
+    echo "错误: 存储中没有备份之后的 binlog $start_file，请确认已启用 binlog 传送" >&2
+    exit 1
+  fi
   
-  echo "清理临时文件..."
-  rm -rf "$TEMP_DIR/$backup_dir" "$TEMP_DIR/$backup_file"
+  mkdir -p "$PITR_DIR"
+  local files=()
+  local file segments closed
+  while read -r file segments closed; do
+    echo "下载 binlog $file"
+    local failed=0
+    if [ "$closed" == "1" ]; then
+      storage_stream "$S3_PREFIX/$BINLOG_DIR/$file" > "$PITR_DIR/$file" || failed=1
+    else
+      # 正在写入的 binlog 由按序上传的分段拼接而成
+      : > "$PITR_DIR/$file"
+      local i
+      for ((i = 0; i < segments; i++)); do
+        storage_cat "$(printf "%s/%s.%06d" "$BINLOG_DIR" "$file" "$i")" >> "$PITR_DIR/$file" || failed=1
+      done
+      trim_binlog "$PITR_DIR/$file" || failed=1
+    fi
+    if [ "$failed" -ne 0 ]; then
+      echo "下载 binlog $file 失败" >&2
+      exit 1
+    fi
+    files+=("$file")
+  done <<< "$binlogs"
   
-  echo "恢复完成到: $RESTORE_DIR"
-  echo "注意: 您可能需要重启MySQL服务器以使用恢复的数据。"
+  cat > "$PITR_DIR/plan" << EOF
+BINLOG_FILES="${files[*]}"
+START_POSITION="$start_position"
+STOP_DATETIME="$stop_datetime"
+INCLUDE_GTIDS="$include_gtids"
+EOF
+  chmod -R a+rX "$PITR_DIR"
+  echo "时间点恢复: 从 $start_file:$start_position 回放 ${#files[@]} 个 binlog 到 $POINT_IN_TIME"
 }
 
 # 主执行流程
 main() {
   setup_auth
+  CATALOG=$(storage_cat "$CATALOG_OBJECT" 2>/dev/null)
   backup_file=$(get_backup_file)
-  download_backup "$backup_file"
-  restore_backup "$backup_file"
+  backup_id=$(basename "$backup_file" | grep -oE "[0-9]+" | head -n 1)
+  chain=$(resolve_chain "$backup_id") || exit 1
+  restore_chain "$chain"
+  prepare_pitr
 }
 
 # 运行主函数
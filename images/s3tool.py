@@ -0,0 +1,853 @@
+#!/usr/bin/env python3.9
+"""
+S3 兼容存储的备份上传下载工具
+
+- 分段并发上传，分段大小和并发数可配置
+- 按范围并发下载，按顺序输出，可直接通过管道解压
+- 每个分段失败后单独重试（指数退避）
+- 上传可限制总带宽（所有上传线程共享），减少与数据库争用网络
+- 上传文件时在检查点目录记录上传ID，容器重启后只上传缺失的分段
+- 批量删除对象，每个请求最多删除 1000 个
+- 去重存储：数据流按内容切分，分块以 SHA-256 命名，已有的分块不再上传
+- 条件写入：按读取时的 ETag 写回小对象（如备份目录），期间被其他作业修改时不覆盖
+
+用法:
+  s3tool.py put <对象名> [文件] [--max-bandwidth-mb <MiB/s>]    省略文件或为 - 时从标准输入读取
+  s3tool.py put <对象名> --if-match <ETag> | --if-none-match    条件写入标准输入，冲突时退出码为 2
+  s3tool.py get <对象名> [文件] [--etag-file <文件>]    省略文件或为 - 时输出到标准输出
+  s3tool.py rm <对象名>...
+  s3tool.py chunk-put <索引名> [--base-index <索引名>]...   从标准输入读取
+  s3tool.py chunk-get <索引名> [文件]
+  s3tool.py chunk-gc <过期索引名>... [--keep-index <索引名>]...
+
+对象名相对于存储桶，连接参数从 S3_ENDPOINT、S3_ACCESS_KEY、S3_SECRET_KEY、
+S3_BUCKET 环境变量读取，上传带宽上限默认从 S3_MAX_BANDWIDTH_MB 读取，可在本地用 MinIO 测试:
+
+  docker run -p 9000:9000 minio/minio server /data
+  S3_ENDPOINT=http://localhost:9000 S3_ACCESS_KEY=minioadmin S3_SECRET_KEY=minioadmin \\
+    S3_BUCKET=test ./s3tool.py put test/backup.tar.gz backup.tar.gz
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+MIB = 1024 * 1024
+
+# S3 限制：除最后一个分段外每段至少 5 MiB，最多 10000 段
+MIN_PART_SIZE = 5 * MIB
+MAX_PARTS = 10000
+
+# 条件写入时对象已被修改（或已存在）的退出码，调用方重新读取后重试
+CONFLICT_EXIT_CODE = 2
+
+# 单个 DeleteObjects 请求最多删除的对象数
+MAX_DELETE_KEYS = 1000
+
+# 流式上传时总大小未知，每上传这么多段分段大小翻倍，保证大备份不超过分段数上限
+PART_SIZE_DOUBLING_INTERVAL = 2000
+
+# 去重分块的大小范围，随机数据上平均约 1 MiB
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_MAX_SIZE = 4 * MIB
+CHUNK_READ_SIZE = 8 * MIB
+
+# 去重上传进行中时，索引旁的 <索引>.pending 标记记录其基础索引；超过这个时间的标记视为已中断的上传
+PENDING_SUFFIX = ".pending"
+PENDING_MAX_AGE = timedelta(days=2)
+
+# 因进行中的上传暂缓回收的过期索引另存为 <索引>.expired，之后的回收继续处理
+DEFERRED_SUFFIX = ".expired"
+
+# 按内容切分：约 1/16 的字节值（不含 0x00 和 0xFF，避免在空页和填充中频繁切分）
+# 是标记字节，连续 5 个标记字节之后切分。切分点只取决于附近的内容，
+# 插入或删除数据后后续切分点重新对齐，未变化的数据得到相同的分块。
+# 用 bytes.translate 把数据映射为 "0"/"1" 后 find，速度接近内存带宽
+CHUNK_MARKS = bytes(b for b in range(1, 255) if hashlib.sha256(bytes([b])).digest()[0] < 16)
+CHUNK_MARK_TABLE = bytes(ord("1") if b in CHUNK_MARKS else ord("0") for b in range(256))
+CHUNK_BOUNDARY = b"11111"
+
+
+def log(message):
+    print(f"[s3tool] {message}", file=sys.stderr, flush=True)
+
+
+def env_int(name, default):
+    value = os.environ.get(name, "")
+    return int(value) if value else default
+
+
+def is_retryable(error):
+    """网络错误、服务端错误和限流可以重试，其他请求错误（如存储桶不存在）直接失败。"""
+    if not isinstance(error, ClientError):
+        return True
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+    code = error.response.get("Error", {}).get("Code", "")
+    return status >= 500 or status in (408, 429) or code in ("RequestTimeout", "SlowDown", "Throttling")
+
+
+def with_retries(description, func, retries):
+    """执行 func，可重试的错误按指数退避最多重试 retries 次。"""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except (BotoCoreError, ClientError) as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = min(2 ** attempt, 30)
+            log(f"{description}失败（第 {attempt + 1} 次）: {e}，{delay} 秒后重试")
+            time.sleep(delay)
+
+
+def is_conflict(error):
+    """条件写入的前提不成立：对象已被修改，或并发的条件写入冲突。"""
+    code = error.response.get("Error", {}).get("Code", "")
+    return code in ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+def write_digest(path, sha256, size):
+    if path:
+        with open(path, "w") as f:
+            f.write(f"{sha256.hexdigest()} {size}\n")
+
+
+def create_client(concurrency):
+    return boto3.client(
+        "s3",
+        endpoint_url=os.environ.get("S3_ENDPOINT") or None,
+        aws_access_key_id=os.environ.get("S3_ACCESS_KEY"),
+        aws_secret_access_key=os.environ.get("S3_SECRET_KEY"),
+        region_name=os.environ.get("S3_REGION", "us-east-1"),
+        config=Config(
+            # 重试由本工具按分段处理
+            retries={"max_attempts": 1, "mode": "standard"},
+            max_pool_connections=concurrency + 2,
+            s3={"addressing_style": "path"},
+        ),
+    )
+
+
+class RateLimiter:
+    """
+    所有上传线程共享的带宽上限：每个分段上传前按其字节数预约发送时间，
+    平均速率不超过 rate 字节/秒（每个线程最多突发一个分段）。rate 为 0 时不限速。
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class Transfer:
+    """单个对象的分段传输。"""
+
+    def __init__(self, client, bucket, key, part_size, concurrency, retries, limiter=None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.limiter = limiter or RateLimiter(0)
+
+    def _retry(self, description, func):
+        return with_retries(description, func, self.retries)
+
+
+class Uploader(Transfer):
+    """并发分段上传文件或数据流。"""
+
+    def _upload_part(self, upload_id, number, data):
+        self.limiter.acquire(len(data))
+        response = self._retry(
+            f"上传分段 {number} ",
+            lambda: self.client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=data,
+            ),
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def _complete(self, upload_id, parts):
+        parts = sorted(parts, key=lambda part: part["PartNumber"])
+        self._retry(
+            "完成分段上传",
+            lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            ),
+        )
+
+    def _create_upload(self):
+        response = self._retry(
+            "创建分段上传",
+            lambda: self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key),
+        )
+        return response["UploadId"]
+
+    def _put_empty(self):
+        self._retry("上传空对象", lambda: self.client.put_object(Bucket=self.bucket, Key=self.key, Body=b""))
+
+    def _list_uploaded_parts(self, upload_id):
+        parts = {}
+        marker = 0
+        while True:
+            response = self.client.list_parts(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=upload_id,
+                PartNumberMarker=marker,
+            )
+            for part in response.get("Parts", []):
+                parts[part["PartNumber"]] = {"PartNumber": part["PartNumber"], "ETag": part["ETag"]}
+            if not response.get("IsTruncated"):
+                return parts
+            marker = response["NextPartNumberMarker"]
+
+    def upload_file(self, path, checkpoint_dir=None):
+        """上传文件，检查点中有未完成的上传时续传缺失的分段。"""
+        size = os.path.getsize(path)
+        if size == 0:
+            self._put_empty()
+            return
+
+        # 文件过大时增大分段，保证不超过分段数上限
+        part_size = max(self.part_size, -(-size // MAX_PARTS))
+        part_count = -(-size // part_size)
+
+        checkpoint = Checkpoint(checkpoint_dir, self.bucket, self.key, path, size, part_size)
+        upload_id = checkpoint.load()
+        done = {}
+        if upload_id:
+            try:
+                done = self._list_uploaded_parts(upload_id)
+                log(f"从检查点续传 {self.key}，已上传 {len(done)}/{part_count} 个分段")
+            except ClientError as e:
+                log(f"检查点中的上传已失效（{e}），重新上传")
+                upload_id = None
+        if not upload_id:
+            upload_id = self._create_upload()
+            checkpoint.save(upload_id)
+
+        def upload_range(number):
+            with open(path, "rb") as f:
+                f.seek((number - 1) * part_size)
+                return self._upload_part(upload_id, number, f.read(part_size))
+
+        pending = [number for number in range(1, part_count + 1) if number not in done]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for part in pool.map(upload_range, pending):
+                done[part["PartNumber"]] = part
+
+        # 分段已上传完成后失败时保留检查点，重启后直接完成上传
+        self._complete(upload_id, done.values())
+        checkpoint.remove()
+        log(f"已上传 {self.key}（{size} 字节，{part_count} 个分段）")
+
+    def put_conditional(self, body, if_match=None):
+        """
+        一次请求写入小对象：指定 if_match 时只在对象的 ETag 仍为该值时写入，
+        否则只在对象不存在时写入；前提不成立时抛出 ClientError（is_conflict）。
+        """
+        conditions = {"IfMatch": if_match} if if_match else {"IfNoneMatch": "*"}
+        self._retry(
+            f"条件写入 {self.key} ",
+            lambda: self.client.put_object(Bucket=self.bucket, Key=self.key, Body=body, **conditions),
+        )
+        log(f"已写入 {self.key}（{len(body)} 字节）")
+
+    def upload_stream(self, stream, digest_file=None):
+        """
+        上传数据流，同时最多缓存 concurrency 个分段；失败时放弃本次上传。
+        指定 digest_file 时，上传完成后写入数据流的 SHA-256 和字节数（"<sha256> <size>"）。
+        """
+        sha256 = hashlib.sha256()
+        first = stream.read(self.part_size)
+        if not first:
+            self._put_empty()
+            write_digest(digest_file, sha256, 0)
+            return
+
+        upload_id = self._create_upload()
+        parts = []
+        size = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                in_flight = set()
+                number = 1
+                data = first
+                while data:
+                    # 等待空闲的上传线程，限制内存占用
+                    if len(in_flight) >= self.concurrency:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        parts.extend(future.result() for future in finished)
+
+                    in_flight.add(pool.submit(self._upload_part, upload_id, number, data))
+                    sha256.update(data)
+                    size += len(data)
+
+                    number += 1
+                    doublings = (number - 1) // PART_SIZE_DOUBLING_INTERVAL
+                    data = stream.read(self.part_size << doublings)
+                    if data and number > MAX_PARTS:
+                        raise RuntimeError(f"数据流超过 {MAX_PARTS} 个分段，请增大分段大小")
+
+                parts.extend(future.result() for future in wait(in_flight).done)
+
+            self._complete(upload_id, parts)
+        except BaseException:
+            log(f"上传 {self.key} 失败，放弃分段上传")
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+            except (BotoCoreError, ClientError) as e:
+                log(f"放弃分段上传失败: {e}")
+            raise
+
+        write_digest(digest_file, sha256, size)
+        log(f"已上传 {self.key}（{size} 字节，{len(parts)} 个分段）")
+
+
+class Downloader(Transfer):
+    """按范围并发下载对象，按顺序写出，同时最多缓存 concurrency 个分段。"""
+
+    def _get_range(self, etag, start, end):
+        def fetch():
+            # 用 ETag 保证各分段来自同一个对象版本
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Range=f"bytes={start}-{end}",
+                IfMatch=etag,
+            )
+            return response["Body"].read()
+
+        return self._retry(f"下载范围 {start}-{end} ", fetch)
+
+    def download(self, out, etag_file=None):
+        """下载对象；指定 etag_file 时写入所下载版本的 ETag，用于之后的条件写入。"""
+        head = self._retry("获取对象信息", lambda: self.client.head_object(Bucket=self.bucket, Key=self.key))
+        size = head["ContentLength"]
+        etag = head["ETag"]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = deque()
+            for start in range(0, size, self.part_size):
+                if len(in_flight) >= self.concurrency:
+                    out.write(in_flight.popleft().result())
+                end = min(start + self.part_size, size) - 1
+                in_flight.append(pool.submit(self._get_range, etag, start, end))
+            while in_flight:
+                out.write(in_flight.popleft().result())
+        out.flush()
+
+        if etag_file:
+            with open(etag_file, "w") as f:
+                f.write(f"{etag}\n")
+        log(f"已下载 {self.key}（{size} 字节）")
+
+
+def delete_objects(client, bucket, keys, retries):
+    """
+    批量删除对象，每 MAX_DELETE_KEYS 个对象一个 DeleteObjects 请求。
+    不存在的对象视为已删除；返回删除失败的对象数。
+    """
+    failed = 0
+    for start in range(0, len(keys), MAX_DELETE_KEYS):
+        batch = keys[start:start + MAX_DELETE_KEYS]
+        response = with_retries(
+            f"删除 {len(batch)} 个对象",
+            lambda: client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            ),
+            retries,
+        )
+        for error in response.get("Errors", []):
+            log(f"删除 {error['Key']} 失败: {error.get('Code')} {error.get('Message')}")
+            failed += 1
+    log(f"已删除 {len(keys) - failed}/{len(keys)} 个对象")
+    return failed
+
+
+def split_chunks(stream):
+    """按内容把数据流切分为 CHUNK_MIN_SIZE 到 CHUNK_MAX_SIZE 字节的分块。"""
+    data = marks = b""
+    start = 0
+    eof = False
+    while True:
+        if not eof and len(data) - start < CHUNK_MAX_SIZE:
+            block = stream.read(CHUNK_READ_SIZE)
+            if block:
+                data = data[start:] + block
+                marks = marks[start:] + block.translate(CHUNK_MARK_TABLE)
+                start = 0
+                continue
+            eof = True
+        if start >= len(data):
+            return
+        end = marks.find(CHUNK_BOUNDARY, start + CHUNK_MIN_SIZE, start + CHUNK_MAX_SIZE)
+        end = end + len(CHUNK_BOUNDARY) if end >= 0 else min(len(data), start + CHUNK_MAX_SIZE)
+        yield data[start:end]
+        start = end
+
+
+class ChunkStore:
+    """
+    去重备份：数据流按内容切分为分块，分块以 SHA-256 命名保存在索引所在目录的 chunks/ 下，
+    索引对象按顺序记录分块；已存在的分块不再上传，多个备份共享相同的分块。
+    """
+
+    def __init__(self, client, bucket, index_key, concurrency, retries, limiter=None):
+        self.client = client
+        self.bucket = bucket
+        self.index_key = index_key
+        self.chunk_dir = posixpath.join(posixpath.dirname(index_key), "chunks")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.limiter = limiter or RateLimiter(0)
+
+    def _chunk_key(self, digest):
+        return f"{self.chunk_dir}/{digest[:2]}/{digest}"
+
+    def _read_index(self, key):
+        response = with_retries(
+            f"读取索引 {key} ",
+            lambda: self.client.get_object(Bucket=self.bucket, Key=key),
+            self.retries,
+        )
+        return json.loads(response["Body"].read())
+
+    def _known_chunks(self, index_keys):
+        """已有备份索引引用的分块，无需重新上传；索引不存在时忽略。"""
+        known = set()
+        for key in index_keys:
+            try:
+                known.update(digest for digest, _ in self._read_index(key)["chunks"])
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+                log(f"基础索引 {key} 不存在，忽略")
+        return known
+
+    def _put_chunk(self, digest, data, codec, level):
+        body = zlib.compress(data, level) if codec == "zlib" else data
+        self.limiter.acquire(len(body))
+        self._put_object(self._chunk_key(digest), body)
+        return len(body)
+
+    def _put_object(self, key, body):
+        with_retries(
+            f"上传 {key} ",
+            lambda: self.client.put_object(Bucket=self.bucket, Key=key, Body=body),
+            self.retries,
+        )
+
+    def _scan_directory(self):
+        """
+        列出索引所在目录（不含分块）：返回进行中的去重上传的标记（对象名到修改时间，
+        即上传开始的时间）、目录中的索引，以及暂缓回收的过期索引。
+        """
+        prefix = posixpath.dirname(self.index_key)
+        prefix = f"{prefix}/" if prefix else ""
+        expired_before = datetime.now(timezone.utc) - PENDING_MAX_AGE
+        markers = {}
+        indexes = set()
+        deferred = set()
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for item in page.get("Contents", []):
+                key = item["Key"]
+                if key.endswith(DEFERRED_SUFFIX):
+                    deferred.add(key)
+                elif key.endswith(".idx"):
+                    indexes.add(key)
+                elif key.endswith(PENDING_SUFFIX) and item["LastModified"] >= expired_before:
+                    markers[key] = item["LastModified"]
+        return markers, indexes, deferred
+
+    def _exclude_pending(self, digests, markers):
+        """去掉 digests 中进行中的上传可能用到的分块：其基础索引引用的，以及上传开始后修改的。"""
+        if not markers:
+            return digests
+        base_indexes = set()
+        for key in markers:
+            try:
+                base_indexes.update(self._read_index(key).get("baseIndexes", []))
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+                # 上传已完成，标记已删除；其索引由调用方作为新出现的索引处理
+        candidates = sorted(digests - self._known_chunks(base_indexes))
+        return self._uploaded_before(candidates, min(markers.values()))
+
+    def _defer(self, expired_indexes):
+        """保存过期索引的副本，调用方删除索引后，之后的回收仍能找到其分块。"""
+        for key in expired_indexes:
+            if key.endswith(DEFERRED_SUFFIX):
+                continue
+            try:
+                with_retries(
+                    f"保存过期索引 {key} ",
+                    lambda: self.client.copy_object(Bucket=self.bucket, Key=key + DEFERRED_SUFFIX,
+                                                    CopySource={"Bucket": self.bucket, "Key": key}),
+                    self.retries,
+                )
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+
+    def _uploaded_before(self, digests, cutoff):
+        """digests 中修改时间早于 cutoff 的分块；已不存在的分块忽略。"""
+        def modified(digest):
+            try:
+                head = with_retries(
+                    f"获取分块 {digest} 信息",
+                    lambda: self.client.head_object(Bucket=self.bucket, Key=self._chunk_key(digest)),
+                    self.retries,
+                )
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+                return None
+            return head["LastModified"]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            times = dict(zip(digests, pool.map(modified, digests)))
+        return {digest for digest, time in times.items() if time is not None and time < cutoff}
+
+    def put_stream(self, stream, base_indexes=(), codec="zlib", level=6, digest_file=None):
+        """
+        分块上传数据流，所有分块上传完成后才写入索引，失败时不留下索引。
+        base_indexes 为已有备份的索引，其中的分块视为已存在。
+        上传期间保留 .pending 标记，分块回收据此保留基础索引的分块和本次新上传的分块。
+        """
+        pending_key = self.index_key + PENDING_SUFFIX
+        self._put_object(pending_key, json.dumps({"baseIndexes": list(base_indexes)}).encode())
+        known = self._known_chunks(base_indexes)
+        sha256 = hashlib.sha256()
+        chunks = []
+        size = 0
+        uploaded = 0
+        stored = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+            for data in split_chunks(stream):
+                digest = hashlib.sha256(data).hexdigest()
+                chunks.append([digest, len(data)])
+                sha256.update(data)
+                size += len(data)
+                if digest in known:
+                    continue
+                known.add(digest)
+
+                # 等待空闲的上传线程，限制内存占用
+                if len(in_flight) >= self.concurrency:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    stored += sum(future.result() for future in finished)
+                in_flight.add(pool.submit(self._put_chunk, digest, data, codec, level))
+                uploaded += 1
+
+            stored += sum(future.result() for future in wait(in_flight).done)
+
+        index = {
+            "version": 1,
+            "codec": codec,
+            "size": size,
+            "sha256": sha256.hexdigest(),
+            "chunks": chunks,
+        }
+        self._put_object(self.index_key, json.dumps(index, separators=(",", ":")).encode())
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=pending_key)
+        except (BotoCoreError, ClientError) as e:
+            log(f"删除上传标记 {pending_key} 失败: {e}")
+        write_digest(digest_file, sha256, size)
+        log(f"已上传 {self.index_key}（{size} 字节，{len(chunks)} 个分块，"
+            f"新上传 {uploaded} 个分块共 {stored} 字节）")
+
+    def _get_chunk(self, digest, codec):
+        def fetch():
+            response = self.client.get_object(Bucket=self.bucket, Key=self._chunk_key(digest))
+            return response["Body"].read()
+
+        body = with_retries(f"下载分块 {digest} ", fetch, self.retries)
+        data = zlib.decompress(body) if codec == "zlib" else body
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise RuntimeError(f"分块 {digest} 校验失败")
+        return data
+
+    def download(self, out):
+        """按索引并发下载分块，按顺序写出，同时最多缓存 concurrency 个分块。"""
+        index = self._read_index(self.index_key)
+        codec = index.get("codec", "none")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = deque()
+            for digest, _ in index["chunks"]:
+                if len(in_flight) >= self.concurrency:
+                    out.write(in_flight.popleft().result())
+                in_flight.append(pool.submit(self._get_chunk, digest, codec))
+            while in_flight:
+                out.write(in_flight.popleft().result())
+        out.flush()
+
+        log(f"已下载 {self.index_key}（{index['size']} 字节，{len(index['chunks'])} 个分块）")
+
+    def collect(self, expired_indexes, kept_indexes):
+        """
+        删除过期索引引用、且不被保留的索引引用的分块；返回删除失败的分块数。
+
+        进行中的去重上传写入索引前，其基础索引的分块和开始后上传的分块都不删除，
+        这些过期索引另存为 .expired，在没有进行中的上传时再回收。读取索引期间可能
+        有上传开始或完成，删除前重新列出目录，直到没有新的标记和索引出现。
+        """
+        markers, indexes, deferred = self._scan_directory()
+        expired_indexes = set(expired_indexes) | deferred
+        kept_indexes = set(kept_indexes)
+        unreferenced = self._known_chunks(expired_indexes) - self._known_chunks(kept_indexes)
+        # 目录中不在过期之列的索引（如调用方读取备份目录后完成的备份）也保留
+        seen = indexes | kept_indexes
+        unreferenced -= self._known_chunks(indexes - expired_indexes - kept_indexes)
+
+        while True:
+            candidates = self._exclude_pending(unreferenced, markers)
+            latest_markers, latest_indexes, _ = self._scan_directory()
+            new_indexes = latest_indexes - seen - expired_indexes
+            if set(latest_markers) <= set(markers) and not new_indexes:
+                break
+            unreferenced -= self._known_chunks(new_indexes)
+            seen |= new_indexes
+            markers = {**markers, **latest_markers}
+
+        if markers:
+            log(f"有进行中的去重上传，{len(unreferenced) - len(candidates)} 个分块暂不删除")
+            self._defer(expired_indexes)
+        failed = 0
+        if candidates:
+            failed = delete_objects(
+                self.client,
+                self.bucket,
+                sorted(self._chunk_key(digest) for digest in candidates),
+                self.retries,
+            )
+        if not markers and not failed and deferred:
+            delete_objects(self.client, self.bucket, sorted(deferred), self.retries)
+        return failed
+
+
+class Checkpoint:
+    """记录文件上传的上传ID；文件或分段大小变化时检查点失效。"""
+
+    def __init__(self, directory, bucket, key, path, size, part_size):
+        self.identity = {
+            "bucket": bucket,
+            "key": key,
+            "size": size,
+            "mtime": int(os.path.getmtime(path)),
+            "partSize": part_size,
+        }
+        self.path = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            digest = hashlib.sha1(f"{bucket}/{key}".encode()).hexdigest()
+            self.path = os.path.join(directory, f"{digest}.json")
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("identity") != self.identity:
+            return None
+        return data.get("uploadId")
+
+    def save(self, upload_id):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"identity": self.identity, "uploadId": upload_id}, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def upload_limiter(args):
+    """上传命令的带宽上限（--max-bandwidth-mb，MiB/s），其他命令不限速。"""
+    return RateLimiter(getattr(args, "max_bandwidth_mb", 0) * MIB)
+
+
+def run_chunk_command(args, client, bucket):
+    store = ChunkStore(client, bucket, args.key if args.command != "chunk-gc" else args.keys[0],
+                       args.concurrency, args.retries, upload_limiter(args))
+    try:
+        if args.command == "chunk-put":
+            store.put_stream(sys.stdin.buffer, args.base_index, args.codec,
+                             min(max(args.level, 1), 9), args.digest_file)
+        elif args.command == "chunk-gc":
+            return 1 if store.collect(args.keys, args.keep_index) else 0
+        elif args.file == "-":
+            store.download(sys.stdout.buffer)
+        else:
+            with open(args.file, "wb") as f:
+                store.download(f)
+    except BrokenPipeError:
+        log(f"下载 {store.index_key} 中断: 输出管道已关闭")
+        return 1
+    except (BotoCoreError, ClientError, OSError, RuntimeError, ValueError) as e:
+        log(f"{args.command} 失败: {e}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 分段上传下载工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    put = subparsers.add_parser("put", help="上传文件或标准输入")
+    put.add_argument("key", help="对象名（相对于存储桶）")
+    put.add_argument("file", nargs="?", default="-", help="要上传的文件，- 表示标准输入")
+    put.add_argument("--checkpoint-dir", default=os.environ.get("S3_CHECKPOINT_DIR"))
+    put.add_argument("--digest-file", help="上传标准输入时，写入其 SHA-256 和字节数的文件")
+    condition = put.add_mutually_exclusive_group()
+    condition.add_argument("--if-match", help="只在对象的 ETag 仍为该值时写入标准输入")
+    condition.add_argument("--if-none-match", action="store_true", help="只在对象不存在时写入标准输入")
+
+    get = subparsers.add_parser("get", help="下载到文件或标准输出")
+    get.add_argument("key", help="对象名（相对于存储桶）")
+    get.add_argument("file", nargs="?", default="-", help="下载到的文件，- 表示标准输出")
+    get.add_argument("--etag-file", help="写入所下载对象版本的 ETag 的文件")
+
+    rm = subparsers.add_parser("rm", help="批量删除对象")
+    rm.add_argument("keys", nargs="+", metavar="key", help="对象名（相对于存储桶）")
+
+    chunk_put = subparsers.add_parser("chunk-put", help="去重上传标准输入")
+    chunk_put.add_argument("key", help="索引对象名（相对于存储桶），分块保存在同一目录的 chunks/ 下")
+    chunk_put.add_argument("--base-index", action="append", default=[],
+                           help="已有备份的索引，其中的分块不再上传")
+    chunk_put.add_argument("--codec", choices=("zlib", "none"), default="zlib", help="分块压缩方式")
+    chunk_put.add_argument("--level", type=int, default=6, help="zlib 压缩级别（1-9）")
+    chunk_put.add_argument("--digest-file", help="写入数据 SHA-256 和字节数的文件")
+
+    chunk_get = subparsers.add_parser("chunk-get", help="按索引下载去重备份")
+    chunk_get.add_argument("key", help="索引对象名（相对于存储桶）")
+    chunk_get.add_argument("file", nargs="?", default="-", help="下载到的文件，- 表示标准输出")
+
+    chunk_gc = subparsers.add_parser("chunk-gc", help="删除过期索引独占的分块")
+    chunk_gc.add_argument("keys", nargs="+", metavar="key", help="过期的索引对象名（相对于存储桶）")
+    chunk_gc.add_argument("--keep-index", action="append", default=[],
+                          help="保留的索引，其引用的分块不会删除")
+
+    for subparser in (put, get, rm, chunk_put, chunk_get, chunk_gc):
+        subparser.add_argument("--part-size-mb", type=int, default=env_int("S3_PART_SIZE_MB", 16))
+        subparser.add_argument("--concurrency", type=int, default=env_int("S3_CONCURRENCY", 4))
+        subparser.add_argument("--retries", type=int, default=env_int("S3_MAX_RETRIES", 5))
+    for subparser in (put, chunk_put):
+        subparser.add_argument("--max-bandwidth-mb", type=int, default=env_int("S3_MAX_BANDWIDTH_MB", 0),
+                               help="上传带宽上限（MiB/s），0 表示不限速")
+
+    args = parser.parse_args()
+
+    bucket = os.environ.get("S3_BUCKET")
+    if not bucket:
+        log("错误: 必须设置 S3_BUCKET")
+        return 1
+
+    if args.command == "rm":
+        try:
+            failed = delete_objects(create_client(args.concurrency), bucket, args.keys, args.retries)
+        except (BotoCoreError, ClientError) as e:
+            log(f"删除失败: {e}")
+            return 1
+        return 1 if failed else 0
+
+    if args.command.startswith("chunk-"):
+        return run_chunk_command(args, create_client(args.concurrency), bucket)
+
+    transfer_args = (
+        create_client(args.concurrency),
+        bucket,
+        args.key,
+        args.part_size_mb * MIB,
+        args.concurrency,
+        args.retries,
+    )
+
+    if args.command == "get":
+        try:
+            if args.file == "-":
+                Downloader(*transfer_args).download(sys.stdout.buffer, args.etag_file)
+            else:
+                with open(args.file, "wb") as f:
+                    Downloader(*transfer_args).download(f, args.etag_file)
+        except BrokenPipeError:
+            # 下游进程（解压）已退出，由调用方根据其退出码报告错误
+            log(f"下载 {args.key} 中断: 输出管道已关闭")
+            return 1
+        except (BotoCoreError, ClientError, OSError) as e:
+            log(f"下载失败: {e}")
+            return 1
+        return 0
+
+    uploader = Uploader(*transfer_args, upload_limiter(args))
+    try:
+        if args.if_match or args.if_none_match:
+            if args.file == "-":
+                uploader.put_conditional(sys.stdin.buffer.read(), args.if_match)
+            else:
+                with open(args.file, "rb") as f:
+                    uploader.put_conditional(f.read(), args.if_match)
+        elif args.file == "-":
+            uploader.upload_stream(sys.stdin.buffer, args.digest_file)
+        else:
+            uploader.upload_file(args.file, args.checkpoint_dir)
+    except ClientError as e:
+        if is_conflict(e):
+            log(f"{args.key} 已被修改，未写入")
+            return CONFLICT_EXIT_CODE
+        log(f"上传失败: {e}")
+        return 1
+    except (BotoCoreError, OSError, RuntimeError) as e:
+        log(f"上传失败: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
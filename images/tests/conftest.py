@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tools are standalone scripts copied into the images, so tests import them by file name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,77 @@
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import s3tool
+
+BUCKET = "bucket1"
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def put_index(client, key, digests):
+    body = json.dumps({"chunks": [[digest, 1] for digest in digests]})
+    client.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+
+def stored_chunks(client):
+    response = client.list_objects_v2(Bucket=BUCKET, Prefix="backups/chunks/")
+    return sorted(item["Key"].rsplit("/", 1)[1] for item in response.get("Contents", []))
+
+
+@pytest.fixture
+def store(client):
+    store = s3tool.ChunkStore(client, BUCKET, "backups/old.idx", 2, 0)
+    for digest in ("aa", "bb", "cc"):
+        client.put_object(Bucket=BUCKET, Key=store._chunk_key(digest), Body=b"x")
+    put_index(client, "backups/old.idx", ["aa", "bb", "cc"])
+    put_index(client, "backups/kept.idx", ["aa"])
+    return store
+
+
+def test_collect_deletes_unreferenced_chunks(client, store):
+    assert store.collect(["backups/old.idx"], ["backups/kept.idx"]) == 0
+
+    assert stored_chunks(client) == ["aa"]
+
+
+def test_collect_keeps_chunks_of_upload_started_while_reading_indexes(client, store, monkeypatch):
+    known_chunks = store._known_chunks
+
+    def start_upload(index_keys):
+        # A dedup upload based on the expired index starts after the first directory scan
+        if not client.list_objects_v2(Bucket=BUCKET, Prefix="backups/new.idx").get("Contents"):
+            client.put_object(Bucket=BUCKET, Key="backups/new.idx.pending",
+                              Body=json.dumps({"baseIndexes": ["backups/old.idx"]}))
+        return known_chunks(index_keys)
+
+    monkeypatch.setattr(store, "_known_chunks", start_upload)
+
+    assert store.collect(["backups/old.idx"], ["backups/kept.idx"]) == 0
+
+    assert stored_chunks(client) == ["aa", "bb", "cc"]
+    deferred = client.head_object(Bucket=BUCKET, Key="backups/old.idx.expired")
+    assert deferred["ContentLength"] > 0
+
+
+def test_collect_keeps_chunks_of_upload_finished_while_reading_indexes(client, store, monkeypatch):
+    known_chunks = store._known_chunks
+
+    def finish_upload(index_keys):
+        # The whole upload runs between the first directory scan and the delete
+        put_index(client, "backups/new.idx", ["aa", "bb"])
+        return known_chunks(index_keys)
+
+    monkeypatch.setattr(store, "_known_chunks", finish_upload)
+
+    assert store.collect(["backups/old.idx"], ["backups/kept.idx"]) == 0
+
+    assert stored_chunks(client) == ["aa", "bb"]
@@ -0,0 +1,43 @@
+import io
+import os
+import random
+
+import s3tool
+
+
+def chunk(data):
+    return list(s3tool.split_chunks(io.BytesIO(data)))
+
+
+def test_chunks_cover_the_stream_within_size_limits():
+    data = os.urandom(20 * s3tool.MIB)
+
+    chunks = chunk(data)
+
+    assert b"".join(chunks) == data
+    assert all(len(c) <= s3tool.CHUNK_MAX_SIZE for c in chunks)
+    # Only the last chunk may be shorter than the minimum
+    assert all(len(c) >= s3tool.CHUNK_MIN_SIZE for c in chunks[:-1])
+
+
+def test_small_and_empty_streams():
+    assert chunk(b"") == []
+    assert chunk(b"x" * 1000) == [b"x" * 1000]
+
+
+def test_data_without_boundaries_is_cut_at_the_maximum_size():
+    chunks = chunk(b"\0" * (3 * s3tool.CHUNK_MAX_SIZE + 1))
+
+    assert [len(c) for c in chunks] == [s3tool.CHUNK_MAX_SIZE] * 3 + [1]
+
+
+def test_boundaries_realign_after_an_insertion():
+    data = random.Random(1).randbytes(16 * s3tool.MIB)
+    edited = data[:s3tool.MIB] + b"inserted" + data[s3tool.MIB:]
+
+    before = set(chunk(data))
+    after = chunk(edited)
+
+    # Only the chunks around the insertion change
+    assert len([c for c in after if c not in before]) <= 2
+    assert len(after) > 5
@@ -0,0 +1,44 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import s3tool
+
+BUCKET = "bucket1"
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_delete_objects_in_batches(client, monkeypatch):
+    keys = [f"backups/chunks/{i:04}" for i in range(2 * s3tool.MAX_DELETE_KEYS + 1)]
+    for key in keys:
+        client.put_object(Bucket=BUCKET, Key=key, Body=b"")
+    delete_objects = client.delete_objects
+    batches = []
+
+    def record_batch(**kwargs):
+        batches.append(len(kwargs["Delete"]["Objects"]))
+        return delete_objects(**kwargs)
+
+    monkeypatch.setattr(client, "delete_objects", record_batch)
+
+    # Keys that do not exist count as deleted
+    assert s3tool.delete_objects(client, BUCKET, keys + ["backups/missing"], 0) == 0
+
+    assert batches == [s3tool.MAX_DELETE_KEYS, s3tool.MAX_DELETE_KEYS, 2]
+    assert "Contents" not in client.list_objects_v2(Bucket=BUCKET, Prefix="backups/")
+
+
+def test_delete_objects_counts_failed_keys(client, monkeypatch):
+    def partly_failed(**kwargs):
+        return {"Errors": [{"Key": "b", "Code": "AccessDenied", "Message": "Access Denied"}]}
+
+    monkeypatch.setattr(client, "delete_objects", partly_failed)
+
+    assert s3tool.delete_objects(client, BUCKET, ["a", "b", "c"], 0) == 1
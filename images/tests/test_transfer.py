@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import s3tool
+
+BUCKET = "bucket1"
+PART_SIZE = s3tool.MIN_PART_SIZE
+# Two full parts and a short last part
+DATA = os.urandom(2 * PART_SIZE + 1024)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("S3_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_SECRET_KEY", "testing")
+    monkeypatch.delenv("S3_ENDPOINT", raising=False)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def backup_file(tmp_path):
+    path = tmp_path / "backup.tar.gz"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def uploader(client, key="backup.tar.gz", retries=0):
+    return s3tool.Uploader(client, BUCKET, key, PART_SIZE, 2, retries)
+
+
+def read_object(client, key="backup.tar.gz"):
+    return client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def server_error(operation):
+    return ClientError({"Error": {"Code": "InternalError"}, "ResponseMetadata": {"HTTPStatusCode": 500}}, operation)
+
+
+def test_upload_file_in_parts(client, backup_file):
+    uploader(client).upload_file(backup_file)
+
+    assert read_object(client) == DATA
+    # The ETag of a multipart object ends with the part count
+    assert client.head_object(Bucket=BUCKET, Key="backup.tar.gz")["ETag"].endswith('-3"')
+
+
+def test_upload_stream_in_parts(client, tmp_path):
+    digest_file = tmp_path / "digest"
+
+    uploader(client).upload_stream(io.BytesIO(DATA), str(digest_file))
+
+    assert read_object(client) == DATA
+    sha256, size = digest_file.read_text().split()
+    assert sha256 == hashlib.sha256(DATA).hexdigest()
+    assert int(size) == len(DATA)
+
+
+def test_upload_retries_only_the_failed_part(client, backup_file, monkeypatch):
+    monkeypatch.setattr(s3tool.time, "sleep", lambda seconds: None)
+    upload_part = client.upload_part
+    attempts = []
+
+    def flaky_upload_part(**kwargs):
+        attempts.append(kwargs["PartNumber"])
+        if kwargs["PartNumber"] == 2 and attempts.count(2) == 1:
+            raise server_error("UploadPart")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(client, "upload_part", flaky_upload_part)
+
+    uploader(client, retries=1).upload_file(backup_file)
+
+    assert sorted(attempts) == [1, 2, 2, 3]
+    assert read_object(client) == DATA
+
+
+def test_upload_file_resumes_from_checkpoint(client, backup_file, tmp_path, monkeypatch):
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    upload_part = client.upload_part
+
+    def fail_last_part(**kwargs):
+        if kwargs["PartNumber"] == 3:
+            raise server_error("UploadPart")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(client, "upload_part", fail_last_part)
+    with pytest.raises(ClientError):
+        uploader(client).upload_file(backup_file, checkpoint_dir)
+    assert os.listdir(checkpoint_dir)
+
+    resumed = []
+
+    def record_part(**kwargs):
+        resumed.append(kwargs["PartNumber"])
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(client, "upload_part", record_part)
+    uploader(client).upload_file(backup_file, checkpoint_dir)
+
+    assert resumed == [3]
+    assert read_object(client) == DATA
+    assert not os.listdir(checkpoint_dir)
+
+
+def test_upload_file_restarts_when_checkpointed_upload_is_gone(client, backup_file, tmp_path, monkeypatch):
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    upload_part = client.upload_part
+
+    def fail_last_part(**kwargs):
+        if kwargs["PartNumber"] == 3:
+            raise server_error("UploadPart")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(client, "upload_part", fail_last_part)
+    with pytest.raises(ClientError):
+        uploader(client).upload_file(backup_file, checkpoint_dir)
+    for upload in client.list_multipart_uploads(Bucket=BUCKET)["Uploads"]:
+        client.abort_multipart_upload(Bucket=BUCKET, Key=upload["Key"], UploadId=upload["UploadId"])
+
+    monkeypatch.setattr(client, "upload_part", upload_part)
+    uploader(client).upload_file(backup_file, checkpoint_dir)
+
+    assert read_object(client) == DATA
+
+
+def test_download_in_ranges(client, tmp_path, monkeypatch):
+    client.put_object(Bucket=BUCKET, Key="backup.tar.gz", Body=DATA)
+    get_object = client.get_object
+    ranges = []
+
+    def record_range(**kwargs):
+        ranges.append(kwargs["Range"])
+        return get_object(**kwargs)
+
+    monkeypatch.setattr(client, "get_object", record_range)
+    etag_file = tmp_path / "etag"
+    out = io.BytesIO()
+
+    s3tool.Downloader(client, BUCKET, "backup.tar.gz", PART_SIZE, 2, 0).download(out, str(etag_file))
+
+    assert out.getvalue() == DATA
+    assert ranges == [
+        f"bytes=0-{PART_SIZE - 1}",
+        f"bytes={PART_SIZE}-{2 * PART_SIZE - 1}",
+        f"bytes={2 * PART_SIZE}-{len(DATA) - 1}",
+    ]
+    assert etag_file.read_text().strip() == client.head_object(Bucket=BUCKET, Key="backup.tar.gz")["ETag"]
+
+
+def test_put_conditional(client):
+    catalog = uploader(client, "catalog")
+
+    catalog.put_conditional(b"v1")
+    etag = client.head_object(Bucket=BUCKET, Key="catalog")["ETag"]
+    with pytest.raises(ClientError) as created_twice:
+        catalog.put_conditional(b"v1")
+    catalog.put_conditional(b"v2", etag)
+    with pytest.raises(ClientError) as stale:
+        catalog.put_conditional(b"v3", etag)
+
+    assert s3tool.is_conflict(created_twice.value)
+    assert s3tool.is_conflict(stale.value)
+    assert read_object(client, "catalog") == b"v2"
+
+
+def test_put_conflict_exit_code(client, tmp_path, monkeypatch):
+    body = tmp_path / "catalog"
+    body.write_bytes(b"v2")
+    client.put_object(Bucket=BUCKET, Key="catalog", Body=b"v1")
+    monkeypatch.setattr(s3tool.sys, "argv", ["s3tool.py", "put", "catalog", str(body), "--if-match", '"stale"'])
+
+    assert s3tool.main() == s3tool.CONFLICT_EXIT_CODE
+    assert read_object(client, "catalog") == b"v1"
@@ -0,0 +1,64 @@
+import io
+import struct
+import zlib
+
+import pytest
+
+import xbcheck
+
+
+def chunk(path, chunk_type=xbcheck.CHUNK_PAYLOAD, payload=b"", offset=0, flags=0, checksum=None):
+    name = path.encode()
+    data = xbcheck.MAGIC + struct.pack("<BBI", flags, chunk_type, len(name)) + name
+    if chunk_type == xbcheck.CHUNK_EOF:
+        return data
+    if checksum is None:
+        checksum = zlib.crc32(payload)
+    return data + struct.pack("<QQI", len(payload), offset, checksum) + payload
+
+
+def eof(path):
+    return chunk(path, xbcheck.CHUNK_EOF)
+
+
+def file_chunks(path, *payloads):
+    offset = 0
+    data = b""
+    for payload in payloads:
+        data += chunk(path, payload=payload, offset=offset)
+        offset += len(payload)
+    return data + eof(path)
+
+
+CHECKPOINTS = file_chunks(xbcheck.CHECKPOINTS_FILE, b"backup_type = full-backuped\n")
+
+
+def check(data):
+    return xbcheck.check_stream(io.BytesIO(data))
+
+
+def test_complete_stream():
+    data = file_chunks("ibdata1", b"a" * 100, b"b" * 50) + file_chunks("mysql.ibd", b"c") + CHECKPOINTS
+
+    assert check(data) == (3, 151 + len(b"backup_type = full-backuped\n"))
+
+
+def test_ignorable_unknown_chunks_are_skipped():
+    data = chunk("ibdata1", ord("X"), b"extension", flags=xbcheck.FLAG_IGNORABLE) + eof("ibdata1") + CHECKPOINTS
+
+    assert check(data)[0] == 2
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"XBSTCK02" + CHECKPOINTS[8:], "魔数"),
+    (CHECKPOINTS[:-5], "截断"),
+    (chunk("ibdata1", payload=b"a", checksum=0) + eof("ibdata1") + CHECKPOINTS, "校验失败"),
+    (chunk("ibdata1", payload=b"a", offset=10) + eof("ibdata1") + CHECKPOINTS, "不连续"),
+    (chunk("ibdata1", payload=b"a") + CHECKPOINTS, "缺少结束块"),
+    (eof("ibdata1") + chunk("ibdata1", payload=b"a") + CHECKPOINTS, "结束块之后"),
+    (chunk("ibdata1", ord("X"), b"a") + eof("ibdata1") + CHECKPOINTS, "未知"),
+    (file_chunks("ibdata1", b"a"), xbcheck.CHECKPOINTS_FILE),
+])
+def test_broken_streams(data, message):
+    with pytest.raises(xbcheck.StreamError, match=message):
+        check(data)
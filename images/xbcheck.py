@@ -0,0 +1,112 @@
+#!/usr/bin/env python3.9
+"""
+检查标准输入中的 xbstream 流结构，不写入磁盘
+
+- 每个块的魔数、类型和路径长度合法，数据块的 CRC32 校验通过
+- 每个文件的数据块偏移连续，并以结束块收尾
+- 流中包含 xtrabackup_checkpoints（xtrabackup 最后写入，缺失说明备份不完整）
+
+用法:
+  s3tool.py get backup_<ID>.xbstream.zst | zstd -d -c | xbcheck.py
+"""
+import struct
+import sys
+import zlib
+
+MAGIC = b"XBSTCK01"
+
+# 块类型：数据、稀疏数据（带空洞映射）、文件结束
+CHUNK_PAYLOAD = ord("P")
+CHUNK_SPARSE = ord("S")
+CHUNK_EOF = ord("E")
+
+# 标志位：读取方不认识的块类型可以跳过
+FLAG_IGNORABLE = 0x01
+
+# xbstream 路径长度上限（FN_REFLEN）
+MAX_PATH_LENGTH = 512
+
+CHECKPOINTS_FILE = "xtrabackup_checkpoints"
+
+
+class StreamError(Exception):
+    pass
+
+
+def log(message):
+    print(f"[xbcheck] {message}", file=sys.stderr, flush=True)
+
+
+def read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise StreamError(f"数据流在 {size} 字节的读取中截断（只读到 {len(data)} 字节）")
+    return data
+
+
+def check_stream(stream):
+    """读完整个流并检查结构，返回 (文件数, 数据字节数)。"""
+    offsets = {}
+    finished = set()
+    payload_bytes = 0
+
+    while True:
+        magic = stream.read(len(MAGIC))
+        if not magic:
+            break
+        if magic != MAGIC:
+            raise StreamError(f"块魔数错误: {magic!r}")
+
+        flags, chunk_type, path_length = struct.unpack("<BBI", read_exact(stream, 6))
+        if path_length >= MAX_PATH_LENGTH:
+            raise StreamError(f"路径长度 {path_length} 超出上限")
+        path = read_exact(stream, path_length).decode("utf-8", "replace")
+        if path in finished:
+            raise StreamError(f"{path} 在结束块之后还有数据")
+
+        if chunk_type == CHUNK_EOF:
+            finished.add(path)
+            continue
+        if chunk_type not in (CHUNK_PAYLOAD, CHUNK_SPARSE) and not flags & FLAG_IGNORABLE:
+            raise StreamError(f"{path} 的块类型 {chunk_type:#x} 未知")
+
+        sparse_map_size = 0
+        if chunk_type == CHUNK_SPARSE:
+            sparse_map_size, = struct.unpack("<I", read_exact(stream, 4))
+        length, offset, checksum = struct.unpack("<QQI", read_exact(stream, 20))
+        read_exact(stream, sparse_map_size * 8)
+        payload = read_exact(stream, length)
+        payload_bytes += length
+
+        if chunk_type != CHUNK_PAYLOAD:
+            # 稀疏块的偏移包含空洞，未知块的内容不解析
+            offsets[path] = None
+            continue
+        if zlib.crc32(payload) != checksum:
+            raise StreamError(f"{path} 偏移 {offset} 的数据块校验失败")
+        expected = offsets.setdefault(path, 0)
+        if expected is not None:
+            if offset != expected:
+                raise StreamError(f"{path} 的数据块不连续（期望偏移 {expected}，实际 {offset}）")
+            offsets[path] = offset + length
+
+    unfinished = sorted(set(offsets) - finished)
+    if unfinished:
+        raise StreamError(f"{len(unfinished)} 个文件缺少结束块，如 {unfinished[0]}")
+    if CHECKPOINTS_FILE not in finished:
+        raise StreamError(f"数据流中没有 {CHECKPOINTS_FILE}")
+    return len(finished), payload_bytes
+
+
+def main():
+    try:
+        files, payload_bytes = check_stream(sys.stdin.buffer)
+    except StreamError as e:
+        log(f"xbstream 结构错误: {e}")
+        return 1
+    log(f"xbstream 结构完整: {files} 个文件，{payload_bytes} 字节")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,10 +7,16 @@ import time
 from kubernetes.client.rest import ApiException
 from kubernetes import client
 
-from src.utils.helpers import create_owner_reference, format_labels, get_secret_data
+from src.utils.helpers import (
+    create_owner_reference, format_labels, get_secret_data,
+    get_k8s_custom_api, k8s_call
+)
 from src.resources.job import create_backup_job
+from src.resources.snapshot import create_volume_snapshot
+from src.utils.metrics import observe_reconcile
 
 @kopf.on.create('mysql.subat.cn', 'v1', 'simplemysqlbackups')
+@observe_reconcile('backup_create')
 async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
     name = meta['name']
     namespace = meta['namespace']
@@ -29,6 +35,10 @@ async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
         logger.error(error_msg)
         raise kopf.PermanentError(error_msg)
     
+    # Snapshot backups are taken by the storage driver and never leave the cluster
+    if spec.get('method') == 'snapshot':
+        return await create_snapshot_backup(spec, meta, body, patch, logger)
+    
     if not s3_config:
         error_msg = f"SimpleMySqlBackup {name} is missing required field 's3'"
         logger.error(error_msg)
@@ -46,8 +56,9 @@ async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
     # Try to get the referenced MySQL resource to use its node selector
     node_selector = None
     try:
-        api_instance = client.CustomObjectsApi()
-        mysql_resource = api_instance.get_namespaced_custom_object(
+        api_instance = get_k8s_custom_api()
+        mysql_resource = await k8s_call(
+            api_instance.get_namespaced_custom_object,
             group="mysql.subat.cn",
             version="v1",
             namespace=namespace,
@@ -71,10 +82,13 @@ async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
     # Start time for the backup
     start_time = datetime.datetime.now().isoformat()
     
+    # Verification jobs stream an uploaded backup back instead of taking one
+    verify = spec.get('action') == 'verify'
+    
     # Create backup job
-    logger.info(f"Creating backup job for MySQL instance: {mysql_ref}")
+    logger.info(f"Creating {'verification' if verify else 'backup'} job for MySQL instance: {mysql_ref}")
     try:
-        job = create_backup_job(
+        job = await create_backup_job(
             name=name,
             namespace=namespace,
             mysql_ref=mysql_ref,
@@ -82,18 +96,22 @@ async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
             labels=labels,
             node_selector=node_selector,
             owner_references=[owner_ref],
-            ttl_seconds_after_finished=ttl_seconds_after_finished
+            ttl_seconds_after_finished=ttl_seconds_after_finished,
+            backup_config=spec
         )
         
         # Update status
         backup_id = job.metadata.name.split('-')[-1]  # Extract backup ID from job name
+        if verify:
+            # The verified backup; the job reports it once resolved if unset
+            backup_id = spec.get('backupId')
         patch.status['phase'] = 'Running'
-        patch.status['message'] = f'Backup job created for {mysql_ref}'
+        patch.status['message'] = f"{'Verification' if verify else 'Backup'} job created for {mysql_ref}"
         patch.status['backupId'] = backup_id
         patch.status['startTime'] = start_time
         patch.status['jobName'] = job.metadata.name
         
-        logger.info(f"Backup job {job.metadata.name} created with backup ID: {backup_id}")
+        logger.info(f"{'Verification' if verify else 'Backup'} job {job.metadata.name} created with backup ID: {backup_id}")
         
         return {'backupId': backup_id}
     
@@ -104,95 +122,51 @@ async def on_backup_create(spec, meta, status, body, patch, logger, **kwargs):
         patch.status['message'] = error_msg
         raise kopf.PermanentError(error_msg)
 
-@kopf.on.delete('mysql.subat.cn', 'v1', 'simplemysqlbackups')
-async def on_backup_delete(spec, meta, status, logger, **kwargs):
+async def create_snapshot_backup(spec, meta, body, patch, logger):
+    """Take a SimpleMySqlBackup as a CSI VolumeSnapshot of the instance's data PVC."""
     name = meta['name']
     namespace = meta['namespace']
+    mysql_ref = spec['mysqlRef']
     
-    logger.info(f"SimpleMySqlBackup resource {name} in namespace {namespace} is being deleted. "
-                f"Related backup job resources with owner references will be garbage-collected.")
+    backup_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    snapshot_name = f"{name}-{backup_id}"
     
-    # Note: The actual backup data in S3 is not deleted 
-
-@kopf.timer('mysql.subat.cn', 'v1', 'simplemysqlbackups', interval=3600)  # Run every hour
-async def cleanup_completed_backups(logger, **kwargs):
-    """
-    Periodically check and clean up completed backup resources.
-    This timer runs every hour and cleans up backup resources that:
-    1. Have completed successfully (job status is "Succeeded")
-    2. Have been completed for more than the specified retention period
-    """
-    logger.info("Running scheduled cleanup of completed backup resources")
+    # The snapshot belongs to the backup resource, so retention deletes both;
+    # the mysql-ref label lets its completion update the instance
+    labels = {**format_labels(name, 'backup'), 'mysql-ref': mysql_ref}
     
+    logger.info(f"Creating VolumeSnapshot {snapshot_name} of {mysql_ref}-data")
     try:
-        # Get all SimpleMySqlBackup resources
-        api = client.CustomObjectsApi()
-        backups = api.list_cluster_custom_object(
-            group="mysql.subat.cn",
-            version="v1",
-            plural="simplemysqlbackups"
+        await create_volume_snapshot(
+            name=snapshot_name,
+            namespace=namespace,
+            pvc_name=f"{mysql_ref}-data",
+            labels=labels,
+            owner_references=[create_owner_reference(body)],
+            snapshot_class=spec.get('volumeSnapshotClassName')
         )
-        
-        batch_api = client.BatchV1Api()
-        
-        # Current time for comparison
-        current_time = datetime.datetime.now()
-        
-        for backup in backups.get('items', []):
-            name = backup['metadata']['name']
-            namespace = backup['metadata']['namespace']
-            status = backup.get('status', {})
-            
-            # Skip if no status yet
-            if not status:
-                continue
-                
-            # Skip if no job name in status
-            job_name = status.get('jobName')
-            if not job_name:
-                continue
-            
-            # Check if the job exists and its status
-            try:
-                job = batch_api.read_namespaced_job(job_name, namespace)
-                
-                # If job is completed
-                if job.status.succeeded:
-                    # Get completion time
-                    completion_time = None
-                    for condition in job.status.conditions or []:
-                        if condition.type == "Complete" and condition.status == "True":
-                            completion_time = condition.last_transition_time
-                            break
-                    
-                    if completion_time:
-                        # Parse completion time
-                        completion_time = completion_time.replace(tzinfo=None)
-                        
-                        # Get retention period from spec (default to 7 days if not specified)
-                        retention_days = backup.get('spec', {}).get('retentionDays', 3)
-                        retention_seconds = retention_days * 86400
-                        
-                        # Check if retention period has passed
-                        elapsed = (current_time - completion_time).total_seconds()
-                        if elapsed > retention_seconds:
-                            logger.info(f"Cleaning up completed backup {name} in namespace {namespace} "
-                                       f"(completed {elapsed/86400:.1f} days ago)")
-                            
-                            # Delete the backup resource
-                            api.delete_namespaced_custom_object(
-                                group="mysql.subat.cn",
-                                version="v1",
-                                plural="simplemysqlbackups",
-                                namespace=namespace,
-                                name=name
-                            )
-            except ApiException as e:
-                if e.status == 404:
-                    # Job not found, might have been cleaned up already
-                    logger.info(f"Job {job_name} for backup {name} not found, might have been cleaned up already")
-                else:
-                    logger.error(f"Error checking job {job_name} for backup {name}: {e}")
-    
     except ApiException as e:
-        logger.error(f"Error during backup cleanup: {e}") 
\ No newline at end of file
+        error_msg = f"Failed to create VolumeSnapshot: {e}"
+        logger.error(error_msg)
+        patch.status['phase'] = 'Failed'
+        patch.status['message'] = error_msg
+        raise kopf.PermanentError(error_msg)
+    
+    patch.status['phase'] = 'Running'
+    patch.status['message'] = f"VolumeSnapshot {snapshot_name} created for {mysql_ref}"
+    patch.status['backupId'] = backup_id
+    patch.status['startTime'] = datetime.datetime.now().isoformat()
+    patch.status['snapshotName'] = snapshot_name
+    
+    return {'backupId': backup_id}
+
+@kopf.on.delete('mysql.subat.cn', 'v1', 'simplemysqlbackups')
+@observe_reconcile('backup_delete')
+async def on_backup_delete(spec, meta, status, logger, **kwargs):
+    name = meta['name']
+    namespace = meta['namespace']
+    
+    logger.info(f"SimpleMySqlBackup resource {name} in namespace {namespace} is being deleted. "
+                f"Related backup job resources with owner references will be garbage-collected.")
+    
+    # Note: The actual backup data in S3 is not deleted
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set
+
+import kopf
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from src.resources.job import create_prepare_job
+from src.utils.cache import add_cache_listener
+from src.utils.helpers import format_timestamp, get_k8s_batch_api, get_k8s_core_api, get_k8s_custom_api, k8s_call
+from src.utils.metrics import observe_backup_job
+
+logger = logging.getLogger('mysql-operator')
+
+# UIDs of finished backup Jobs whose result has already been recorded
+_reported_jobs: Set[str] = set()
+
+# Annotation marking a backup Job whose result was recorded, so the relist
+# after an operator restart does not record it again
+REPORTED_ANNOTATION = "mysql.subat.cn/result-recorded"
+
+
+def get_job_result(job: client.V1Job) -> Optional[Dict[str, Any]]:
+    """
+    Get the outcome of a finished Job.
+
+    Returns:
+        None while the Job is still running, otherwise a dict with the
+        phase, completion time, duration and failure reason
+    """
+    for condition in (job.status and job.status.conditions) or []:
+        if condition.status != "True" or condition.type not in ("Complete", "Failed"):
+            continue
+
+        finished_at = job.status.completion_time or condition.last_transition_time
+        result = {
+            'phase': 'Succeeded' if condition.type == "Complete" else 'Failed',
+            'completionTime': format_timestamp(finished_at),
+            'durationSeconds': None,
+            'failureReason': None
+        }
+        if job.status.start_time:
+            result['durationSeconds'] = int((finished_at - job.status.start_time).total_seconds())
+        if condition.type == "Failed":
+            result['failureReason'] = f"{condition.reason}: {condition.message}"
+        return result
+
+    return None
+
+
+async def get_job_report(namespace: str, job_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the report backup.sh writes to its container termination message.
+
+    Returns:
+        The parsed JSON report (its fields are listed at report_result,
+        report_verify and report_prepare in backup.sh), or None if no pod
+        of the Job left one
+    """
+    pods = await k8s_call(
+        get_k8s_core_api().list_namespaced_pod,
+        namespace,
+        label_selector=f"job-name={job_name}"
+    )
+    for pod in pods.items:
+        for container in (pod.status and pod.status.container_statuses) or []:
+            terminated = container.state and container.state.terminated
+            if not terminated or terminated.exit_code != 0 or not terminated.message:
+                continue
+            try:
+                return json.loads(terminated.message)
+            except ValueError:
+                logger.warning(f"Ignoring malformed report of backup job {job_name}: {terminated.message!r}")
+    return None
+
+
+async def patch_custom_status(plural: str, namespace: str, name: str, status: Dict[str, Any]) -> None:
+    """Merge-patch the status of a SimpleMySql or SimpleMySqlBackup, ignoring deleted objects."""
+    try:
+        await k8s_call(
+            get_k8s_custom_api().patch_namespaced_custom_object_status,
+            group="mysql.subat.cn",
+            version="v1",
+            plural=plural,
+            namespace=namespace,
+            name=name,
+            body={'status': status}
+        )
+    except ApiException as e:
+        if e.status != 404:
+            raise
+
+
+def get_verify_status(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Status of a SimpleMySqlBackup from the report of its verification job."""
+    status = {
+        'backupId': report.get('backupId'),
+        'backupFile': report.get('file'),
+        'backupSize': int(report['size']) if report.get('size') else None,
+        'sha256': report.get('sha256') or None,
+        'compressionCodec': report.get('codec'),
+        'verified': bool(report.get('verified'))
+    }
+    if status['verified']:
+        status['message'] = f"Backup {report.get('backupId')} verified"
+    else:
+        status.update({
+            'phase': 'Failed',
+            'message': f"Verification of backup {report.get('backupId')} failed: {report.get('error')}",
+            'failureReason': report.get('error')
+        })
+    return status
+
+
+def get_transfer_status(report: Dict[str, Any]) -> Dict[str, Any]:
+    """How long a backup took to copy and upload, and the upload rate it achieved."""
+    return {
+        key: int(report[key]) if report.get(key) else None
+        for key in ('copySeconds', 'uploadSeconds', 'uploadBytesPerSecond')
+    }
+
+
+def get_prepare_status(result: Dict[str, Any], report: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Status of a SimpleMySqlBackup from the outcome of its offline prepare job."""
+    if result['phase'] != 'Succeeded':
+        return {'prepared': False, 'prepareFailureReason': result['failureReason']}
+    if not report or report.get('prepared') != '1':
+        # Part of an incremental chain: prepared when restored
+        return {'prepared': False}
+    return {
+        'prepared': True,
+        'prepareFailureReason': None,
+        'backupFile': report.get('file'),
+        'backupSize': int(report['size']) if report.get('size') else None,
+        'sha256': report.get('sha256') or None,
+        'compressionCodec': report.get('codec')
+    }
+
+
+async def mark_job_reported(namespace: str, name: str) -> None:
+    """Annotate a backup Job once its result is recorded, ignoring deleted Jobs."""
+    try:
+        await k8s_call(
+            get_k8s_batch_api().patch_namespaced_job,
+            name=name,
+            namespace=namespace,
+            body={'metadata': {'annotations': {REPORTED_ANNOTATION: 'true'}}}
+        )
+    except ApiException as e:
+        if e.status != 404:
+            raise
+
+
+async def on_backup_job_event(event_type: str, job: client.V1Job) -> None:
+    """Record the outcome of a finished backup Job on its owning resources."""
+    uid = job.metadata.uid
+    if event_type == 'DELETED':
+        _reported_jobs.discard(uid)
+        return
+
+    result = get_job_result(job)
+    if result is None or uid in _reported_jobs:
+        return
+    # Claim the Job before the first await so a concurrent event for it is skipped
+    _reported_jobs.add(uid)
+    if (job.metadata.annotations or {}).get(REPORTED_ANNOTATION):
+        return
+
+    name = job.metadata.name
+    namespace = job.metadata.namespace
+    labels = job.metadata.labels or {}
+    logger.info(f"Backup job {name} in namespace {namespace} {result['phase'].lower()} "
+                f"after {result['durationSeconds']}s")
+
+    try:
+        # The backup container reports what it uploaded, including its LSN
+        report = None
+        if result['phase'] == 'Succeeded':
+            report = await get_job_report(namespace, name)
+
+        # Offline prepare jobs only record the prepared backup on its resource
+        if labels.get('backup-action') == 'prepare':
+            for owner in job.metadata.owner_references or []:
+                if owner.kind == "SimpleMySqlBackup":
+                    await patch_custom_status('simplemysqlbackups', namespace, owner.name,
+                                              get_prepare_status(result, report))
+            await mark_job_reported(namespace, name)
+            return
+
+        # Jobs created for a SimpleMySqlBackup report back to it
+        for owner in job.metadata.owner_references or []:
+            if owner.kind == "SimpleMySqlBackup":
+                backup_status = {
+                    'phase': result['phase'],
+                    'message': result['failureReason'] or f"Backup job {name} completed",
+                    'completionTime': result['completionTime'],
+                    'durationSeconds': result['durationSeconds'],
+                    'failureReason': result['failureReason']
+                }
+                if report and report.get('action') == 'verify':
+                    backup_status.update(get_verify_status(report))
+                elif report:
+                    backup_status.update({
+                        'backupType': report.get('type'),
+                        'baseBackupId': report.get('baseId') or None,
+                        'toLsn': report.get('toLsn') or None,
+                        'backupFile': report.get('file'),
+                        'backupSize': int(report['size']) if report.get('size') else None,
+                        'sha256': report.get('sha256') or None,
+                        'compressionCodec': report.get('codec'),
+                        'prepared': report.get('prepared') == '1'
+                    })
+                    backup_status.update(get_transfer_status(report))
+                await patch_custom_status('simplemysqlbackups', namespace, owner.name, backup_status)
+
+        # Both scheduled and on-demand backups update the instance
+        mysql_ref = labels.get('mysql-ref')
+        if mysql_ref and result['phase'] == 'Succeeded':
+            mysql_status = {'lastBackup': result['completionTime']}
+            if report:
+                mysql_status['backupChain'] = {
+                    'lastBackupId': report.get('backupId'),
+                    'lastBackupType': report.get('type'),
+                    'lastLsn': report.get('toLsn') or None,
+                    'fullBackupId': report.get('fullId')
+                }
+                mysql_status['lastBackupTransfer'] = get_transfer_status(report)
+                # Summary of the catalog object the backup maintains in its prefix
+                if report.get('catalog'):
+                    mysql_status['backupCatalog'] = report['catalog']
+            await patch_custom_status('simplemysqls', namespace, mysql_ref, mysql_status)
+
+        # Backups uploaded unprepared with prepare: job are prepared by a separate Job
+        if report and report.get('prepareAt') == 'job' and report.get('prepared') != '1':
+            prepare_job = await create_prepare_job(job, report.get('backupId'))
+            if prepare_job is not None:
+                logger.info(f"Created offline prepare job {prepare_job.metadata.name} for backup {report.get('backupId')}")
+        await mark_job_reported(namespace, name)
+    except ApiException as e:
+        logger.error(f"Failed to record result of backup job {name}: {e}")
+        # Try again on the Job's next event
+        _reported_jobs.discard(uid)
+        return
+
+    observe_backup_job(result['phase'].lower(), result['durationSeconds'])
+
+
+@kopf.on.startup()
+async def start_backup_job_tracking(**_):
+    loop = asyncio.get_running_loop()
+
+    def on_job_event(event_type, job):
+        # Called on the cache's watch thread; hand the event over to the loop
+        if (job.metadata.labels or {}).get('component') == 'backup':
+            asyncio.run_coroutine_threadsafe(on_backup_job_event(event_type, job), loop)
+
+    add_cache_listener('Job', on_job_event)
@@ -1,12 +1,18 @@
+import asyncio
 import kopf
 import logging
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime
 import croniter
 
 from kubernetes.client.rest import ApiException
 
+from src.utils.dag import run_dependency_graph
+from src.utils.cache import get_cached_object
+from src.utils.config import get_backup_scheduler_mode
 from src.utils.helpers import create_owner_reference, format_labels, get_secret_data
+from src.utils.metrics import observe_reconcile
 from src.resources.deployment import create_mysql_deployment
 from src.resources.service import create_mysql_service
 from src.resources.secret import create_mysql_secret
@@ -16,6 +22,7 @@ from src.resources.backup import create_backup_cronjob, delete_backup_cronjob
 
 @kopf.on.create('mysql.subat.cn', 'v1', 'simplemysqls')
 @kopf.on.update('mysql.subat.cn', 'v1', 'simplemysqls')
+@observe_reconcile('mysql_change')
 async def on_mysql_change(spec, meta, status, body, patch, logger, **kwargs):
     name = meta['name']
     namespace = meta['namespace']
@@ -34,6 +41,7 @@ async def on_mysql_change(spec, meta, status, body, patch, logger, **kwargs):
     # Extract backup configuration
     backup_config = spec.get('backup', {})
     backup_enabled = backup_config.get('enabled', False)
+    backup_method = backup_config.get('method', 'xtrabackup')
     backup_schedule = backup_config.get('schedule', '0 2 * * *')
     backup_s3 = backup_config.get('s3', {})
     
@@ -52,6 +60,7 @@ async def on_mysql_change(spec, meta, status, body, patch, logger, **kwargs):
     
     # Extract restore configuration
     restore_config = spec.get('restore')
+    restore_snapshot = (restore_config or {}).get('fromSnapshot')
     
     # Extract phpMyAdmin configuration
     phpmyadmin_config = spec.get('phpmyadmin', {})
@@ -65,152 +74,180 @@ async def on_mysql_change(spec, meta, status, body, patch, logger, **kwargs):
     # Create owner reference
     owner_ref = create_owner_reference(body)
     
-    # Handle secret for credentials
-    if existing_secret:
-        # Use existing secret
-        logger.info(f"Using existing secret: {existing_secret}")
-        secret_name = existing_secret
+    # Apply result of every child object, for the reconcile report
+    results = {}
+    
+    # Children are reconciled as a dependency graph: only the Deployment
+    # needs the Secret and PVC, everything else is applied concurrently
+    async def apply_secret(outputs):
+        # Handle secret for credentials
+        if existing_secret:
+            # Use existing secret
+            logger.info(f"Using existing secret: {existing_secret}")
+            
+            # Get existing secret data
+            secret_data = await get_secret_data(existing_secret, namespace)
+            return existing_secret, secret_data.get('MYSQL_DATABASE', db_name)
         
-        # Get existing secret data
-        secret_data = get_secret_data(existing_secret, namespace)
-        db_name = secret_data.get('MYSQL_DATABASE', db_name)
-    else:
         # Create secret
         logger.info(f"Creating or updating secret for: {name}")
-        secret, created = create_mysql_secret(
+        secret, results['secret'] = await create_mysql_secret(
             name=name,
             namespace=namespace,
             db_name=db_name,
             password=db_password,
             callback_url=backup_callback_url,
+            labels=labels,
             owner_references=[owner_ref]
         )
         secret_name = f"{name}-credentials"
         
-        if created:
-            logger.info(f"Secret {secret_name} created")
-        else:
-            logger.info(f"Secret {secret_name} updated")
-    
-    # Create PVC
-    logger.info(f"Creating PVC for: {name}")
-    pvc = create_mysql_pvc(
-        name=name,
-        namespace=namespace,
-        storage_size=storage_size,
-        storage_class=storage_class,
-        labels=labels,
-        owner_references=[owner_ref]
-    )
-    
-    # Create Deployment
-    logger.info(f"Creating Deployment for: {name}")
-    deployment = create_mysql_deployment(
-        name=name,
-        namespace=namespace,
-        storage_claim_name=f"{name}-data",
-        secret_name=secret_name,
-        db_name=db_name,
-        labels=labels,
-        resources=resources,
-        node_selector=node_selector,
-        affinity=affinity,
-        tolerations=tolerations,
-        owner_references=[owner_ref],
-        restore_from_backup=restore_config
-    )
-    
-    # Create Service
-    logger.info(f"Creating Service for: {name}")
-    service = create_mysql_service(
-        name=name,
-        namespace=namespace,
-        labels=labels,
-        owner_references=[owner_ref]
-    )
-    
-    # Handle backup configuration
-    if backup_enabled:
-        logger.info(f"Setting up backup CronJob for MySQL instance: {name}")
-        
-        cronjob, created = create_backup_cronjob(
+        logger.info(f"Secret {secret_name} {results['secret']}")
+        return secret_name, db_name
+    
+    async def apply_pvc(outputs):
+        # Create PVC
+        logger.info(f"Creating PVC for: {name}")
+        pvc, results['pvc'] = await create_mysql_pvc(
             name=name,
             namespace=namespace,
-            schedule=backup_schedule,
-            mysql_ref=name,
-            s3_config=backup_s3,
-            node_selector=node_selector,
+            storage_size=storage_size,
+            storage_class=storage_class,
             labels=labels,
-            owner_references=[owner_ref]
+            owner_references=[owner_ref],
+            from_snapshot=restore_snapshot
         )
+    
+    async def apply_deployment(outputs):
+        secret_name, deployment_db_name = outputs['secret']
         
-        if created:
-            logger.info(f"Backup CronJob created for MySQL instance: {name}")
-        else:
-            logger.info(f"Backup CronJob updated for MySQL instance: {name}")
-            
-        # Update status with backup information
-        # Calculate next backup time
-        cron = croniter.croniter(backup_schedule, datetime.now())
-        next_backup = cron.get_next(datetime)
-        
-        patch.status['nextBackup'] = next_backup.strftime("%Y-%m-%d %H:%M:%S")
-    else:
-        # If backup was enabled but is now disabled, delete the CronJob
-        if status and status.get('nextBackup'):
-            logger.info(f"Removing backup CronJob for MySQL instance: {name}")
-            delete_backup_cronjob(name, namespace)
-        
-        # Remove backup information from status
-        if 'nextBackup' in patch.status:
-            patch.status['nextBackup'] = None
-        if 'lastBackup' in patch.status:
-            patch.status['lastBackup'] = None
-    
-    # Handle phpMyAdmin
-    if phpmyadmin_enabled:
-        logger.info(f"Setting up phpMyAdmin for MySQL instance: {name}")
-        
-        # Create phpMyAdmin deployment
-        phpmyadmin_deployment, created = create_phpmyadmin_deployment(
+        # Create Deployment
+        logger.info(f"Creating Deployment for: {name}")
+        deployment, results['deployment'] = await create_mysql_deployment(
             name=name,
             namespace=namespace,
-            mysql_service_name=name,
-            port=phpmyadmin_port,
-            resources=phpmyadmin_resources,
+            storage_claim_name=f"{name}-data",
+            secret_name=secret_name,
+            db_name=deployment_db_name,
+            labels=labels,
+            resources=resources,
             node_selector=node_selector,
-            owner_references=[owner_ref]
+            affinity=affinity,
+            tolerations=tolerations,
+            owner_references=[owner_ref],
+            restore_from_backup=restore_config,
+            backup_config=backup_config
         )
-        
-        if created:
-            logger.info(f"phpMyAdmin deployment created for MySQL instance: {name}")
-        else:
-            logger.info(f"phpMyAdmin deployment updated for MySQL instance: {name}")
-        
-        # Create phpMyAdmin service
-        phpmyadmin_service, created = create_phpmyadmin_service(
+    
+    async def apply_service(outputs):
+        # Create Service
+        logger.info(f"Creating Service for: {name}")
+        service, results['service'] = await create_mysql_service(
             name=name,
             namespace=namespace,
-            port=phpmyadmin_port,
+            labels=labels,
             owner_references=[owner_ref]
         )
-        
-        if created:
-            logger.info(f"phpMyAdmin service created for MySQL instance: {name}")
+    
+    async def apply_backup(outputs):
+        # Handle backup configuration
+        if backup_enabled and backup_method == 'snapshot':
+            # Snapshots are taken by the operator's schedule timer, not by a CronJob;
+            # delete it unless the cache knows it is gone (it may be disabled or not synced)
+            cached, cronjob = get_cached_object('CronJob', namespace, f"{name}-backup")
+            if not cached or cronjob is not None:
+                logger.info(f"Removing backup CronJob replaced by snapshot backups for MySQL instance: {name}")
+                await delete_backup_cronjob(name, namespace)
+        elif backup_enabled:
+            logger.info(f"Setting up backup CronJob for MySQL instance: {name}")
+            
+            # With the operator scheduler the CronJob is only the Job template
+            operator_scheduled = get_backup_scheduler_mode() == 'operator'
+            cronjob, results['cronjob'] = await create_backup_cronjob(
+                name=name,
+                namespace=namespace,
+                schedule=backup_schedule,
+                mysql_ref=name,
+                s3_config=backup_s3,
+                node_selector=node_selector,
+                labels=format_labels(name, 'backup'),
+                owner_references=[owner_ref],
+                backup_config=backup_config,
+                suspend=operator_scheduled
+            )
+            
+            logger.info(f"Backup CronJob {results['cronjob']} for MySQL instance: {name}")
+            
+            # The operator scheduler reports the jittered next backup itself
+            if not operator_scheduled:
+                # Update status with backup information
+                # Calculate next backup time
+                cron = croniter.croniter(backup_schedule, datetime.now())
+                next_backup = cron.get_next(datetime)
+                
+                patch.status['nextBackup'] = next_backup.strftime("%Y-%m-%d %H:%M:%S")
         else:
-            logger.info(f"phpMyAdmin service updated for MySQL instance: {name}")
-        
-        # Update status with phpMyAdmin URL
-        patch.status['phpmyadminUrl'] = f"http://{name}-phpmyadmin.{namespace}.svc.cluster.local:{phpmyadmin_port}"
-    else:
-        # If phpMyAdmin was enabled but is now disabled, delete the resources
-        if status and status.get('phpmyadminUrl'):
-            logger.info(f"Removing phpMyAdmin resources for MySQL instance: {name}")
-            delete_phpmyadmin(name, namespace)
-        
-        # Remove phpMyAdmin URL from status
-        if 'phpmyadminUrl' in patch.status:
-            patch.status['phpmyadminUrl'] = None
+            # If backup was enabled but is now disabled, delete the CronJob
+            if status and status.get('nextBackup'):
+                logger.info(f"Removing backup CronJob for MySQL instance: {name}")
+                await delete_backup_cronjob(name, namespace)
+            
+            # Remove backup information from status
+            if 'nextBackup' in patch.status:
+                patch.status['nextBackup'] = None
+            if 'lastBackup' in patch.status:
+                patch.status['lastBackup'] = None
+    
+    async def apply_phpmyadmin(outputs):
+        # Handle phpMyAdmin
+        if phpmyadmin_enabled:
+            logger.info(f"Setting up phpMyAdmin for MySQL instance: {name}")
+            
+            # Create phpMyAdmin deployment and service
+            phpmyadmin_deployment = create_phpmyadmin_deployment(
+                name=name,
+                namespace=namespace,
+                mysql_service_name=name,
+                port=phpmyadmin_port,
+                resources=phpmyadmin_resources,
+                node_selector=node_selector,
+                owner_references=[owner_ref]
+            )
+            phpmyadmin_service = create_phpmyadmin_service(
+                name=name,
+                namespace=namespace,
+                port=phpmyadmin_port,
+                owner_references=[owner_ref]
+            )
+            (_, results['phpmyadmin-deployment']), (_, results['phpmyadmin-service']) = \
+                await asyncio.gather(phpmyadmin_deployment, phpmyadmin_service)
+            
+            logger.info(f"phpMyAdmin deployment {results['phpmyadmin-deployment']} for MySQL instance: {name}")
+            logger.info(f"phpMyAdmin service {results['phpmyadmin-service']} for MySQL instance: {name}")
+            
+            # Update status with phpMyAdmin URL
+            patch.status['phpmyadminUrl'] = f"http://{name}-phpmyadmin.{namespace}.svc.cluster.local:{phpmyadmin_port}"
+        else:
+            # If phpMyAdmin was enabled but is now disabled, delete the resources
+            if status and status.get('phpmyadminUrl'):
+                logger.info(f"Removing phpMyAdmin resources for MySQL instance: {name}")
+                await delete_phpmyadmin(name, namespace)
+            
+            # Remove phpMyAdmin URL from status
+            if 'phpmyadminUrl' in patch.status:
+                patch.status['phpmyadminUrl'] = None
+    
+    started = time.monotonic()
+    outputs = await run_dependency_graph({
+        'secret': ([], apply_secret),
+        'pvc': ([], apply_pvc),
+        'deployment': (['secret', 'pvc'], apply_deployment),
+        'service': ([], apply_service),
+        'backup': ([], apply_backup),
+        'phpmyadmin': ([], apply_phpmyadmin),
+    })
+    duration = time.monotonic() - started
+    secret_name, db_name = outputs['secret']
     
     # Update status
     patch.status['phase'] = 'Running'
@@ -220,11 +257,21 @@ async def on_mysql_change(spec, meta, status, body, patch, logger, **kwargs):
     patch.status['dbPort'] = '3306'
     patch.status['secretName'] = secret_name
     
-    logger.info(f"SimpleMySql {name} successfully processed")
+    # Report how many children actually had to be written
+    written = sum(1 for result in results.values() if result != 'unchanged')
+    patch.status['lastReconcile'] = {
+        'written': written,
+        'unchanged': len(results) - written,
+        'durationSeconds': round(duration, 3)
+    }
+    
+    logger.info(f"SimpleMySql {name} successfully processed in {duration:.2f}s "
+                f"({written} of {len(results)} child objects written)")
     
     return {'secretName': secret_name}
 
 @kopf.on.delete('mysql.subat.cn', 'v1', 'simplemysqls')
+@observe_reconcile('mysql_delete')
 async def on_mysql_delete(spec, meta, status, logger, **kwargs):
     name = meta['name']
     namespace = meta['namespace']
@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from src.utils.helpers import get_k8s_custom_api, k8s_call, parse_timestamp
+from src.utils.metrics import register_queue
+
+logger = logging.getLogger('mysql-operator')
+
+# Delay before retrying a failed deletion
+RETRY_DELAY_SECONDS = 300
+
+# Default retention of a completed SimpleMySqlBackup, matching the CRD default
+DEFAULT_RETENTION_DAYS = 7
+
+
+class RetentionScheduler:
+    """
+    Operator-wide scheduler for SimpleMySqlBackup retention.
+
+    Every completed backup is kept in a min-heap keyed by its expiry time
+    (completion + retentionDays) and deleted exactly when it comes due. The
+    heap is fed from backup watch events, whose completion is recorded by the
+    backup Job watch, so no cluster-wide listing is needed; superseded heap
+    entries are skipped when they are popped.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, namespace: str, name: str, due: float) -> None:
+        """Set the expiry time of a backup, replacing any earlier one."""
+        key = (namespace, name)
+        current = self._entries.get(key)
+        if current and current[1] == due:
+            return
+
+        seq = next(self._counter)
+        self._entries[key] = (seq, due)
+        heapq.heappush(self._heap, (due, seq, key))
+
+        # Wake the loop if this is now the earliest entry
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def forget(self, namespace: str, name: str) -> None:
+        """Stop tracking a backup."""
+        self._entries.pop((namespace, name), None)
+
+    async def run(self) -> None:
+        """Delete due backups until cancelled, sleeping until the next one is due."""
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if not entry or entry[0] != seq:
+                    continue
+                del self._entries[key]
+
+                try:
+                    await self._expire(*key)
+                except Exception as e:
+                    if isinstance(e, ApiException):
+                        logger.error(f"Retention cleanup of backup {key[1]} in namespace {key[0]} failed: {e}")
+                    else:
+                        logger.exception(f"Retention cleanup of backup {key[1]} in namespace {key[0]} failed")
+                    # Try again later unless the backup was rescheduled meanwhile
+                    if key not in self._entries:
+                        self.schedule(key[0], key[1], time.time() + RETRY_DELAY_SECONDS)
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _expire(self, namespace: str, name: str) -> None:
+        logger.info(f"Cleaning up completed backup {name} in namespace {namespace} (retention period passed)")
+        try:
+            await k8s_call(
+                get_k8s_custom_api().delete_namespaced_custom_object,
+                group="mysql.subat.cn",
+                version="v1",
+                plural="simplemysqlbackups",
+                namespace=namespace,
+                name=name
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+
+_scheduler: Optional[RetentionScheduler] = None
+_scheduler_task: Optional[asyncio.Task] = None
+
+def get_retention_scheduler() -> RetentionScheduler:
+    """Get the operator-wide retention scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RetentionScheduler()
+    return _scheduler
+
+@kopf.on.startup()
+async def start_retention_scheduler(**_):
+    global _scheduler_task
+    scheduler = get_retention_scheduler()
+    register_queue("retention", lambda: len(scheduler))
+    _scheduler_task = asyncio.create_task(scheduler.run())
+
+@kopf.on.cleanup()
+async def stop_retention_scheduler(**_):
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+
+@kopf.on.event('mysql.subat.cn', 'v1', 'simplemysqlbackups')
+async def track_backup_retention(event, spec, meta, status, **kwargs):
+    """Keep the retention scheduler in sync with SimpleMySqlBackup resources."""
+    name = meta['name']
+    namespace = meta['namespace']
+    scheduler = get_retention_scheduler()
+
+    if event['type'] == 'DELETED' or meta.get('deletionTimestamp'):
+        scheduler.forget(namespace, name)
+        return
+
+    if status.get('phase') == 'Succeeded' and status.get('completionTime'):
+        # Get retention period from spec
+        retention_days = spec.get('retentionDays', DEFAULT_RETENTION_DAYS)
+        expiry = parse_timestamp(status['completionTime']) + retention_days * 86400
+        scheduler.schedule(namespace, name, expiry)
+    else:
+        # Running backups are scheduled once they complete; failed ones are kept for inspection
+        scheduler.forget(namespace, name)
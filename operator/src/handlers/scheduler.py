@@ -0,0 +1,389 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import croniter
+import kopf
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from src.handlers.jobs import get_job_result, patch_custom_status
+from src.resources.backup import start_cronjob_job
+from src.utils.cache import add_cache_listener, get_cached_object
+from src.utils.config import (
+    get_backup_max_concurrent, get_backup_max_concurrent_per_node,
+    get_backup_scheduler_mode, get_backup_window_minutes
+)
+from src.utils.helpers import format_timestamp, get_k8s_batch_api, get_k8s_core_api, k8s_call
+from src.utils.metrics import register_queue
+
+logger = logging.getLogger('mysql-operator')
+
+# Delay before retrying a backup whose Job could not be started
+RETRY_DELAY_SECONDS = 60
+
+# Assumed run time of a backup until some have been observed, for start estimates
+DEFAULT_BACKUP_SECONDS = 600
+
+# Weight of the latest backup in the running average of backup durations
+DURATION_SMOOTHING = 0.2
+
+# Format of nextBackup and lastScheduledBackup, the local time of the schedule
+STATUS_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+Key = Tuple[str, str]
+
+
+def get_jitter(namespace: str, name: str, window_seconds: int) -> int:
+    """Offset of an instance's backups into the window, the same on every operator run."""
+    if window_seconds <= 0:
+        return 0
+    digest = hashlib.sha256(f"{namespace}/{name}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % window_seconds
+
+
+class BackupScheduler:
+    """
+    Operator-wide scheduler for the backups of all SimpleMySql instances.
+
+    Each instance's backup CronJob is kept suspended as the Job template.
+    Every schedule slot is shifted by a deterministic jitter within the
+    instance's backup window, so instances sharing a schedule spread out
+    instead of all starting in the same minute. Instances are kept in a
+    min-heap keyed by their next due time, like the retention scheduler;
+    due instances join a FIFO queue and are started while fewer than the
+    cluster-wide and per-node limits of backups run. Running backups,
+    including on-demand ones, are tracked from the Job watch, and every
+    finished backup wakes the queue.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_node: int):
+        self.max_concurrent = max_concurrent
+        self.max_per_node = max_per_node
+        self._heap = []
+        self._entries: Dict[Key, Dict[str, Any]] = {}
+        self._queue: List[Key] = []
+        self._running: Dict[Key, Key] = {}
+        self._nodes: Dict[Key, Optional[str]] = {}
+        self._published: Dict[Key, Dict[str, Any]] = {}
+        self._average_seconds = float(DEFAULT_BACKUP_SECONDS)
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def update(self, namespace: str, name: str, schedule: str, window_seconds: int,
+               last_slot: Optional[float]) -> None:
+        """Track an instance's backup schedule, replacing any earlier one."""
+        key = (namespace, name)
+        entry = self._entries.get(key)
+        if entry and entry['schedule'] == schedule and entry['window'] == window_seconds:
+            return
+        if entry and entry['last'] is not None:
+            last_slot = max(last_slot or 0, entry['last'])
+
+        entry = {
+            'schedule': schedule,
+            'window': window_seconds,
+            'jitter': get_jitter(namespace, name, window_seconds),
+            'last': last_slot
+        }
+        if key in self._queue:
+            # Already due: start the queued slot, the new schedule applies after it
+            entry.update({field: self._entries[key][field] for field in ('slot', 'due', 'seq')})
+            self._entries[key] = entry
+            return
+        self._entries[key] = entry
+        self._schedule_next(key, entry)
+
+    def forget(self, namespace: str, name: str) -> None:
+        """Stop scheduling an instance's backups."""
+        key = (namespace, name)
+        self._entries.pop(key, None)
+        self._published.pop(key, None)
+        if key in self._queue:
+            self._queue.remove(key)
+            self._wakeup.set()
+
+    def on_job(self, event_type: str, job: client.V1Job) -> None:
+        """Track running backups from Job events; a finished backup frees its slot."""
+        key = (job.metadata.namespace, job.metadata.name)
+        instance = (job.metadata.labels or {}).get('mysql-ref')
+        result = get_job_result(job)
+        if event_type != 'DELETED' and instance and result is None:
+            self._running[key] = (job.metadata.namespace, instance)
+            return
+
+        instance = self._running.pop(key, None)
+        if instance is None:
+            return
+        # Look the node up again next time, in case the instance moved
+        self._nodes.pop(instance, None)
+        if result and result['durationSeconds'] is not None:
+            self._average_seconds += DURATION_SMOOTHING * (result['durationSeconds'] - self._average_seconds)
+        self._wakeup.set()
+
+    def _next_slot(self, entry: Dict[str, Any]) -> Tuple[float, float]:
+        """Next schedule slot after the last one started, and when it is due with the jitter."""
+        now = time.time()
+        last = entry['last']
+        start = last if last is not None else now - entry['window']
+        cron = croniter.croniter(entry['schedule'], datetime.fromtimestamp(start))
+        slot = cron.get_next(float)
+        # Without a record of the last slot, only look ahead instead of catching up
+        while last is None and slot + entry['jitter'] < now:
+            slot = cron.get_next(float)
+        return slot, slot + entry['jitter']
+
+    def _schedule_next(self, key: Key, entry: Dict[str, Any], due: Optional[float] = None) -> None:
+        slot, next_due = self._next_slot(entry)
+        entry['slot'] = slot
+        entry['due'] = due if due is not None else next_due
+
+        seq = next(self._counter)
+        entry['seq'] = seq
+        heapq.heappush(self._heap, (entry['due'], seq, key))
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Queue and start due backups until cancelled, sleeping until the next one is due."""
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if not entry or entry.get('seq') != seq or key in self._queue:
+                    continue
+                self._queue.append(key)
+                self._nodes.pop(key, None)
+                logger.info(f"Backup of {key[1]} in namespace {key[0]} is due, queued at position {len(self._queue)}")
+
+            self._wakeup.clear()
+            try:
+                await self._dispatch()
+                await self._publish()
+            except ApiException as e:
+                logger.error(f"Backup scheduling failed: {e}")
+            except Exception:
+                logger.exception("Unexpected error while scheduling backups")
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _node_of(self, key: Key) -> Optional[str]:
+        """Node of an instance's MySQL pod, which its backups share through the data PVC."""
+        if key not in self._nodes:
+            pods = await k8s_call(
+                get_k8s_core_api().list_namespaced_pod,
+                key[0],
+                label_selector=f"instance={key[1]},component=mysql,managed-by=mysql-operator"
+            )
+            nodes = [pod.spec.node_name for pod in pods.items if pod.spec.node_name]
+            self._nodes[key] = nodes[0] if nodes else None
+        return self._nodes[key]
+
+    async def _running_per_node(self) -> Dict[Optional[str], int]:
+        counts: Dict[Optional[str], int] = {}
+        for instance in list(self._running.values()):
+            node = await self._node_of(instance)
+            counts[node] = counts.get(node, 0) + 1
+        return counts
+
+    def _node_is_full(self, node: Optional[str], per_node: Dict[Optional[str], int]) -> bool:
+        # Backups of instances whose pod is not scheduled only count cluster-wide
+        return bool(self.max_per_node and node and per_node.get(node, 0) >= self.max_per_node)
+
+    async def _dispatch(self) -> None:
+        """Start queued backups in order while the concurrency limits allow."""
+        per_node = await self._running_per_node()
+        running = len(self._running)
+        for key in list(self._queue):
+            if self.max_concurrent and running >= self.max_concurrent:
+                return
+            # Like the CronJob's Forbid policy, wait while the instance is still being backed up
+            if key in self._running.values():
+                continue
+            node = await self._node_of(key)
+            if self._node_is_full(node, per_node):
+                continue
+
+            self._queue.remove(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            started = await self._start(key, entry)
+            if started is None:
+                self._schedule_next(key, entry, due=time.time() + RETRY_DELAY_SECONDS)
+                continue
+
+            job_name, job_running = started
+            if job_running:
+                self._running[(key[0], job_name)] = key
+                running += 1
+                per_node[node] = per_node.get(node, 0) + 1
+
+            # Missed slots are skipped: the next backup is the next slot from now
+            entry['last'] = croniter.croniter(entry['schedule'], datetime.now()).get_prev(float)
+            self._schedule_next(key, entry)
+            await patch_custom_status('simplemysqls', key[0], key[1], {
+                'lastScheduledBackup': datetime.fromtimestamp(entry['last']).strftime(STATUS_TIME_FORMAT)
+            })
+
+    async def _start(self, key: Key, entry: Dict[str, Any]) -> Optional[Tuple[str, bool]]:
+        """
+        Start the backup Job of an instance.
+
+        Returns:
+            The Job's name and whether it is running, or None if it could not
+            be started; a Job started earlier for the same slot may be finished
+        """
+        namespace, name = key
+        cronjob_name = f"{name}-backup"
+        cached, cronjob = get_cached_object('CronJob', namespace, cronjob_name)
+        try:
+            if not cached:
+                cronjob = await k8s_call(get_k8s_batch_api().read_namespaced_cron_job, cronjob_name, namespace)
+            if cronjob is None:
+                logger.warning(f"Backup CronJob {cronjob_name} in namespace {namespace} not found, retrying later")
+                return None
+            job = await start_cronjob_job(cronjob, entry['slot'])
+        except ApiException as e:
+            if e.status != 404:
+                logger.error(f"Failed to start scheduled backup of {name} in namespace {namespace}: {e}")
+            return None
+
+        job_name = f"{cronjob_name}-{int(entry['slot'] // 60)}"
+        if job is not None:
+            logger.info(f"Started scheduled backup job {job_name} in namespace {namespace}")
+            return job_name, True
+
+        # Started before, e.g. by a previous operator run: only count it if it still runs
+        logger.info(f"Backup job {job_name} in namespace {namespace} was already started")
+        cached, job = get_cached_object('Job', namespace, job_name)
+        if not cached:
+            try:
+                job = await k8s_call(get_k8s_batch_api().read_namespaced_job, job_name, namespace)
+            except ApiException as e:
+                if e.status != 404:
+                    logger.error(f"Failed to read backup job {job_name} in namespace {namespace}: {e}")
+                    return None
+        # A Job that is gone has finished and been cleaned up
+        return job_name, job is not None and get_job_result(job) is None
+
+    def _expected_start(self, position: int, node: Optional[str], ahead_on_node: int) -> float:
+        """
+        Estimate when a queued backup starts: the slots are all taken, so each
+        round of backups ahead of it takes about the average backup duration.
+        """
+        rounds = 1
+        if self.max_concurrent:
+            rounds = max(rounds, math.ceil(position / self.max_concurrent))
+        if self.max_per_node and node:
+            rounds = max(rounds, math.ceil((ahead_on_node + 1) / self.max_per_node))
+        return time.time() + rounds * self._average_seconds
+
+    async def _publish(self) -> None:
+        """Write each instance's place in the schedule to its status when it changed."""
+        ahead_on_node: Dict[Optional[str], int] = {}
+        queued: Dict[Key, Dict[str, Any]] = {}
+        for position, key in enumerate(self._queue, start=1):
+            node = self._nodes.get(key)
+            queued[key] = {
+                'state': 'Queued',
+                'position': position,
+                'node': node,
+                'expectedStart': format_timestamp(datetime.fromtimestamp(
+                    self._expected_start(position, node, ahead_on_node.get(node, 0)), timezone.utc))
+            }
+            ahead_on_node[node] = ahead_on_node.get(node, 0) + 1
+
+        for key, entry in list(self._entries.items()):
+            state = queued.get(key) or {
+                'state': 'Scheduled',
+                'position': None,
+                'node': None,
+                'expectedStart': format_timestamp(datetime.fromtimestamp(entry['due'], timezone.utc))
+            }
+            next_backup = datetime.fromtimestamp(entry['due']).strftime(STATUS_TIME_FORMAT)
+
+            # Estimates drift every round; only rewrite them when the position or node changes
+            published = self._published.get(key)
+            if published and published['backupQueue']['state'] == state['state'] \
+                    and published['backupQueue']['position'] == state['position'] \
+                    and published['backupQueue']['node'] == state['node'] \
+                    and published['nextBackup'] == next_backup:
+                continue
+
+            status = {'nextBackup': next_backup, 'backupQueue': state}
+            await patch_custom_status('simplemysqls', key[0], key[1], status)
+            self._published[key] = status
+
+
+_scheduler: Optional[BackupScheduler] = None
+_scheduler_task: Optional[asyncio.Task] = None
+
+def get_backup_scheduler() -> BackupScheduler:
+    """Get the operator-wide backup scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = BackupScheduler(get_backup_max_concurrent(), get_backup_max_concurrent_per_node())
+    return _scheduler
+
+@kopf.on.startup()
+async def start_backup_scheduler(**_):
+    global _scheduler_task
+    if get_backup_scheduler_mode() != 'operator':
+        return
+    scheduler = get_backup_scheduler()
+    register_queue("backup", lambda: len(scheduler))
+
+    loop = asyncio.get_running_loop()
+
+    def on_job_event(event_type, job):
+        # Called on the cache's watch thread; hand the event over to the loop
+        if (job.metadata.labels or {}).get('component') == 'backup':
+            loop.call_soon_threadsafe(scheduler.on_job, event_type, job)
+
+    add_cache_listener('Job', on_job_event)
+    _scheduler_task = asyncio.create_task(scheduler.run())
+
+@kopf.on.cleanup()
+async def stop_backup_scheduler(**_):
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+
+@kopf.on.event('mysql.subat.cn', 'v1', 'simplemysqls')
+async def track_backup_schedule(event, spec, meta, status, **kwargs):
+    """Keep the backup scheduler in sync with the backup schedules of SimpleMySql resources."""
+    if get_backup_scheduler_mode() != 'operator':
+        return
+    name = meta['name']
+    namespace = meta['namespace']
+    scheduler = get_backup_scheduler()
+    backup_config = spec.get('backup', {})
+
+    if event['type'] == 'DELETED' or meta.get('deletionTimestamp') \
+            or not backup_config.get('enabled') or backup_config.get('method') == 'snapshot':
+        scheduler.forget(namespace, name)
+        if event['type'] != 'DELETED' and status.get('backupQueue'):
+            await patch_custom_status('simplemysqls', namespace, name, {'backupQueue': None})
+        return
+
+    last = status.get('lastScheduledBackup')
+    scheduler.update(
+        namespace,
+        name,
+        backup_config.get('schedule', '0 2 * * *'),
+        backup_config.get('windowMinutes', get_backup_window_minutes()) * 60,
+        datetime.strptime(last, STATUS_TIME_FORMAT).timestamp() if last else None
+    )
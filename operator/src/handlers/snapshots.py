@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime
+from typing import Set
+
+import croniter
+import kopf
+from kubernetes.client.rest import ApiException
+
+from src.handlers.jobs import patch_custom_status
+from src.resources.snapshot import SNAPSHOT_GROUP, SNAPSHOT_PLURAL, SNAPSHOT_VERSION, get_snapshot_result
+from src.utils.helpers import format_labels, get_k8s_custom_api, k8s_call, parse_timestamp
+
+logger = logging.getLogger('mysql-operator')
+
+# How often instances with snapshot backups are checked for a due schedule
+SCHEDULE_CHECK_SECONDS = 60
+
+# Default retention of scheduled snapshot backups, matching the CRD default
+DEFAULT_SNAPSHOT_KEEP_DAYS = 7
+
+# UIDs of VolumeSnapshots whose successful result has already been recorded
+_reported_snapshots: Set[str] = set()
+
+
+@kopf.on.event(SNAPSHOT_GROUP, SNAPSHOT_VERSION, SNAPSHOT_PLURAL,
+               labels={'component': 'backup', 'managed-by': 'mysql-operator'})
+async def track_backup_snapshot(event, meta, status, **kwargs):
+    """Record the outcome of a backup VolumeSnapshot on its owning resources."""
+    uid = meta['uid']
+    if event['type'] == 'DELETED':
+        _reported_snapshots.discard(uid)
+        return
+
+    result = get_snapshot_result(status)
+    if result is None or uid in _reported_snapshots:
+        return
+
+    name = meta['name']
+    namespace = meta['namespace']
+    logger.info(f"Backup snapshot {name} in namespace {namespace} {result['phase'].lower()}")
+
+    try:
+        for owner in meta.get('ownerReferences') or []:
+            if owner['kind'] != "SimpleMySqlBackup":
+                continue
+            backup_status = {
+                'phase': result['phase'],
+                'message': result['failureReason'] or f"VolumeSnapshot {name} is ready",
+                'completionTime': result['creationTime'],
+                'failureReason': result['failureReason'],
+                'backupType': 'snapshot'
+            }
+            if result['restoreSize']:
+                backup_status['snapshotRestoreSize'] = result['restoreSize']
+            await patch_custom_status('simplemysqlbackups', namespace, owner['name'], backup_status)
+
+        mysql_ref = (meta.get('labels') or {}).get('mysql-ref')
+        if mysql_ref and result['phase'] == 'Succeeded':
+            await patch_custom_status('simplemysqls', namespace, mysql_ref, {
+                'lastBackup': result['creationTime'],
+                'lastSnapshot': name
+            })
+    except ApiException as e:
+        logger.error(f"Failed to record result of backup snapshot {name}: {e}")
+        return
+
+    # The snapshot controller retries failed snapshots, so only success is final
+    if result['phase'] == 'Succeeded':
+        _reported_snapshots.add(uid)
+
+
+def _snapshot_backups_enabled(spec, **_) -> bool:
+    backup_config = spec.get('backup', {})
+    return bool(backup_config.get('enabled')) and backup_config.get('method') == 'snapshot'
+
+
+@kopf.timer('mysql.subat.cn', 'v1', 'simplemysqls', interval=SCHEDULE_CHECK_SECONDS,
+            when=_snapshot_backups_enabled)
+async def schedule_snapshot_backups(spec, meta, status, patch, logger, **kwargs):
+    """
+    Create a snapshot SimpleMySqlBackup whenever the backup schedule comes due.
+
+    The backups are not owned by the instance, like on-demand ones, so
+    deleting the instance keeps its snapshots for a restore; they expire
+    through the retention scheduler after keepDays.
+    """
+    name = meta['name']
+    namespace = meta['namespace']
+    backup_config = spec.get('backup', {})
+    snapshot_config = backup_config.get('snapshot', {})
+
+    cron = croniter.croniter(backup_config.get('schedule', '0 2 * * *'), datetime.now())
+    due_time = cron.get_prev(datetime)
+    due = due_time.strftime("%Y-%m-%d %H:%M:%S")
+    patch.status['nextBackup'] = cron.get_next(datetime).strftime("%Y-%m-%d %H:%M:%S")
+
+    # The first check only records the schedule; later ones act on new slots
+    last = status.get('lastScheduledSnapshot')
+    if last is None or parse_timestamp(due) <= parse_timestamp(last):
+        patch.status['lastScheduledSnapshot'] = last or due
+        return
+
+    backup_name = f"{name}-snapshot-{due_time.strftime('%Y%m%d%H%M%S')}"
+    backup = {
+        'apiVersion': 'mysql.subat.cn/v1',
+        'kind': 'SimpleMySqlBackup',
+        'metadata': {
+            'name': backup_name,
+            'namespace': namespace,
+            'labels': format_labels(name, 'backup')
+        },
+        'spec': {
+            'mysqlRef': name,
+            'method': 'snapshot',
+            'retentionDays': snapshot_config.get('keepDays', DEFAULT_SNAPSHOT_KEEP_DAYS)
+        }
+    }
+    if snapshot_config.get('volumeSnapshotClassName'):
+        backup['spec']['volumeSnapshotClassName'] = snapshot_config['volumeSnapshotClassName']
+
+    logger.info(f"Scheduled snapshot backup of {name} due at {due}: creating {backup_name}")
+    try:
+        await k8s_call(
+            get_k8s_custom_api().create_namespaced_custom_object,
+            group="mysql.subat.cn",
+            version="v1",
+            namespace=namespace,
+            plural="simplemysqlbackups",
+            body=backup
+        )
+    except ApiException as e:
+        if e.status != 409:
+            raise
+    patch.status['lastScheduledSnapshot'] = due
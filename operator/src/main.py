@@ -14,6 +14,13 @@ logger = logging.getLogger('mysql-operator')
 # Import handlers
 from src.handlers.mysql import on_mysql_change, on_mysql_delete
 from src.handlers.backup import on_backup_create, on_backup_delete
+from src.handlers.jobs import start_backup_job_tracking
+from src.handlers.snapshots import track_backup_snapshot, schedule_snapshot_backups
+from src.handlers.retention import start_retention_scheduler, stop_retention_scheduler, track_backup_retention
+from src.handlers.scheduler import start_backup_scheduler, stop_backup_scheduler, track_backup_schedule
+from src.utils.cache import start_object_cache, stop_object_cache
+from src.utils.helpers import close_k8s_api_client, get_k8s_connection_stats, shutdown_k8s_executor
+from src.utils.metrics import start_metrics_server
 
 @kopf.on.startup()
 def configure(settings: kopf.OperatorSettings, **_):
@@ -35,6 +42,26 @@ def configure(settings: kopf.OperatorSettings, **_):
         except kubernetes.config.config_exception.ConfigException as e:
             logger.error(f"Error loading Kubernetes configuration: {e}")
             raise kopf.PermanentError("Could not configure Kubernetes client")
+    
+    # Start watching operator-managed objects so reconciles can skip reads
+    start_object_cache()
+    
+    # Expose reconcile, API and backup metrics on /metrics
+    start_metrics_server()
+
+@kopf.on.cleanup()
+def shutdown(**_):
+    logger.info("Stopping MySQL operator")
+    
+    stop_object_cache()
+    
+    # Wait for in-flight Kubernetes API calls to finish
+    shutdown_k8s_executor()
+    
+    stats = get_k8s_connection_stats()
+    logger.info(f"Kubernetes API: {stats['requests']} requests served over "
+                f"{stats['connections']} connections")
+    close_k8s_api_client()
 
 # Run the operator
 if __name__ == "__main__":
@@ -3,41 +3,32 @@ from typing import Dict, List, Any, Optional, Tuple
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from ..utils.helpers import get_k8s_batch_api, get_k8s_core_api
+from ..utils.helpers import apply_object, get_k8s_batch_api, get_k8s_core_api, k8s_call
 from ..utils.config import get_backup_image, get_image_pull_secret
 
+# Resources of the scheduled backup container unless spec.backup.resources is set
+DEFAULT_BACKUP_RESOURCES = {
+    "requests": {"cpu": "100m", "memory": "128Mi"},
+    "limits": {"cpu": "200m", "memory": "256Mi"}
+}
 
-def create_backup_cronjob(
-    name: str,
-    namespace: str,
-    schedule: str,
-    mysql_ref: str,
-    s3_config: Optional[Dict[str, Any]] = None,
-    labels: Optional[Dict[str, str]] = None,
-    owner_references: Optional[List[Any]] = None,
-    node_selector: Optional[Dict[str, str]] = None,
-) -> Tuple[client.V1CronJob, bool]:
+
+def get_backup_env(
+    s3_config: Dict[str, Any],
+    backup_config: Optional[Dict[str, Any]] = None
+) -> List[client.V1EnvVar]:
     """
-    Create a CronJob to backup MySQL instance on a schedule.
+    Build the environment of a backup container.
     
     Args:
-        name: MySQL instance name
-        namespace: Kubernetes namespace
-        schedule: Cron schedule expression (e.g. "0 2 * * *")
-        mysql_ref: Name of the MySQL instance
         s3_config: S3 configuration for backup storage
-        labels: Labels to add to the CronJob
-        owner_references: K8s owner references
-        node_selector: Node selector for the CronJob
+        backup_config: Backup options (spec.backup of a SimpleMySql or the
+            spec of a SimpleMySqlBackup)
     Returns:
-        The created/updated CronJob and a boolean indicating if it was newly created
+        Environment variables for backup.sh
     """
-    batch_api = get_k8s_batch_api()
-    
-    if s3_config is None:
-        s3_config = {}
+    backup_config = backup_config or {}
     
-   # Prepare environment variables
     env = [
         client.V1EnvVar(
             name="S3_BUCKET",
@@ -61,6 +52,192 @@ def create_backup_cronjob(
                 value=str(s3_config.get("keepDays"))
             )
         )
+    
+    # Grandfather-father-son retention on top of keepDays
+    for key, env_name in (("keepDaily", "S3_KEEP_DAILY"),
+                          ("keepWeekly", "S3_KEEP_WEEKLY"),
+                          ("keepMonthly", "S3_KEEP_MONTHLY")):
+        if key in s3_config:
+            env.append(
+                client.V1EnvVar(
+                    name=env_name,
+                    value=str(s3_config.get(key))
+                )
+            )
+    
+    # Multipart upload tuning
+    for key, env_name in (("partSizeMB", "S3_PART_SIZE_MB"),
+                          ("concurrency", "S3_CONCURRENCY"),
+                          ("maxRetries", "S3_MAX_RETRIES")):
+        if key in s3_config:
+            env.append(
+                client.V1EnvVar(
+                    name=env_name,
+                    value=str(s3_config.get(key))
+                )
+            )
+    
+    # Streaming and dedup modes upload the xbstream output without a local copy
+    env.append(
+        client.V1EnvVar(
+            name="BACKUP_MODE",
+            value=backup_config.get("mode", "staged")
+        )
+    )
+    
+    # Compression codec and level used for the backup object
+    compression = backup_config.get("compression", {})
+    env.append(
+        client.V1EnvVar(
+            name="COMPRESSION_CODEC",
+            value=compression.get("codec", "gzip")
+        )
+    )
+    if "level" in compression:
+        env.append(
+            client.V1EnvVar(
+                name="COMPRESSION_LEVEL",
+                value=str(compression.get("level"))
+            )
+        )
+    if "threads" in compression:
+        env.append(
+            client.V1EnvVar(
+                name="COMPRESSION_THREADS",
+                value=str(compression.get("threads"))
+            )
+        )
+    
+    # xtrabackup copy threads and the buffer pool size used by --prepare
+    for key, env_name in (("parallel", "XTRABACKUP_PARALLEL"),
+                          ("useMemory", "XTRABACKUP_USE_MEMORY")):
+        if key in backup_config:
+            env.append(
+                client.V1EnvVar(
+                    name=env_name,
+                    value=str(backup_config.get(key))
+                )
+            )
+    
+    # Limits that keep the backup from competing with MySQL for disk and network:
+    # xtrabackup --throttle, the upload bandwidth cap and the ionice class
+    throttle = backup_config.get("throttle", {})
+    for key, env_name in (("iops", "XTRABACKUP_THROTTLE"),
+                          ("uploadMBps", "S3_MAX_BANDWIDTH_MB"),
+                          ("ioClass", "IO_CLASS"),
+                          ("ioPriority", "IO_PRIORITY")):
+        if key in throttle:
+            env.append(
+                client.V1EnvVar(
+                    name=env_name,
+                    value=str(throttle.get(key))
+                )
+            )
+    
+    # Where the backup is prepared: in the backup Job, at restore, or by an
+    # offline prepare Job the operator starts once the backup is uploaded
+    if "prepare" in backup_config:
+        env.append(
+            client.V1EnvVar(
+                name="PREPARE_AT",
+                value=backup_config.get("prepare")
+            )
+        )
+    
+    # Verification jobs check an uploaded backup instead of taking one
+    if backup_config.get("action") == "verify":
+        env.append(
+            client.V1EnvVar(
+                name="BACKUP_ACTION",
+                value="verify"
+            )
+        )
+        if backup_config.get("backupId"):
+            env.append(
+                client.V1EnvVar(
+                    name="VERIFY_BACKUP_ID",
+                    value=str(backup_config.get("backupId"))
+                )
+            )
+    
+    # Incremental backups chain on the LSN of the previous backup
+    incremental = backup_config.get("incremental", {})
+    if incremental.get("enabled"):
+        env.extend([
+            client.V1EnvVar(
+                name="INCREMENTAL_ENABLED",
+                value="true"
+            ),
+            client.V1EnvVar(
+                name="FULL_EVERY_DAYS",
+                value=str(incremental.get("fullEveryDays", 7))
+            )
+        ])
+    
+    return env
+
+
+def get_backup_resources(
+    backup_config: Optional[Dict[str, Any]] = None,
+    default: Optional[Dict[str, Any]] = None
+) -> Optional[client.V1ResourceRequirements]:
+    """
+    Build the resource requirements of a backup container.
+    
+    Args:
+        backup_config: Backup options (spec.backup of a SimpleMySql or the
+            spec of a SimpleMySqlBackup)
+        default: Requests and limits used when the options set no resources
+    Returns:
+        The resource requirements, or None to leave the container unbounded
+    """
+    resources = (backup_config or {}).get("resources") or default
+    if not resources:
+        return None
+    return client.V1ResourceRequirements(
+        requests=resources.get("requests", {}),
+        limits=resources.get("limits", {})
+    )
+
+
+async def create_backup_cronjob(
+    name: str,
+    namespace: str,
+    schedule: str,
+    mysql_ref: str,
+    s3_config: Optional[Dict[str, Any]] = None,
+    labels: Optional[Dict[str, str]] = None,
+    owner_references: Optional[List[Any]] = None,
+    node_selector: Optional[Dict[str, str]] = None,
+    backup_config: Optional[Dict[str, Any]] = None,
+    suspend: bool = False,
+) -> Tuple[client.V1CronJob, str]:
+    """
+    Create a CronJob to backup MySQL instance on a schedule.
+    
+    Args:
+        name: MySQL instance name
+        namespace: Kubernetes namespace
+        schedule: Cron schedule expression (e.g. "0 2 * * *")
+        mysql_ref: Name of the MySQL instance
+        s3_config: S3 configuration for backup storage
+        labels: Labels to add to the CronJob
+        owner_references: K8s owner references
+        node_selector: Node selector for the CronJob
+        backup_config: Backup options from spec.backup (e.g. mode, resources)
+        suspend: Keep the CronJob from starting Jobs itself; the operator's
+            backup scheduler starts them from its template instead
+    Returns:
+        The CronJob and the apply result ("created", "configured" or "unchanged")
+    """
+    if s3_config is None:
+        s3_config = {}
+    
+    # Backup jobs report their result to the instance through this label
+    labels = {**(labels or {}), "mysql-ref": mysql_ref}
+    
+    # Prepare environment variables
+    env = get_backup_env(s3_config, backup_config)
 
     # Prepare image pull secrets
     k8s_image_pull_secrets = None
@@ -74,6 +251,12 @@ def create_backup_cronjob(
         client.V1Volume(
             name="mysql-data",
             persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=f'{mysql_ref}-data')
+        ),
+        # Scratch space for the staged backup, kept across container restarts
+        # so an interrupted upload resumes instead of redoing the backup
+        client.V1Volume(
+            name="backup-scratch",
+            empty_dir=client.V1EmptyDirVolumeSource()
         )
     ]
 
@@ -81,6 +264,10 @@ def create_backup_cronjob(
         client.V1VolumeMount(
             name="mysql-data",
             mount_path="/var/lib/mysql"
+        ),
+        client.V1VolumeMount(
+            name="backup-scratch",
+            mount_path="/app/backup"
         )
     ]
     
@@ -102,10 +289,7 @@ def create_backup_cronjob(
               )
             )
         ],
-        resources=client.V1ResourceRequirements(
-            requests={"cpu": "100m", "memory": "128Mi"},
-            limits={"cpu": "200m", "memory": "256Mi"}
-        ),
+        resources=get_backup_resources(backup_config, DEFAULT_BACKUP_RESOURCES),
         volume_mounts=volume_mounts
     )
     
@@ -138,7 +322,7 @@ def create_backup_cronjob(
         concurrency_policy="Forbid",
         successful_jobs_history_limit=3,
         failed_jobs_history_limit=1,
-        suspend=False
+        suspend=suspend
     )
     
     # Prepare the CronJob metadata
@@ -165,32 +349,13 @@ def create_backup_cronjob(
         spec=cronjob_spec
     )
     
-    # Try to get existing CronJob, create if not found
-    created = False
-    try:
-        batch_api.read_namespaced_cron_job(name=cronjob_name, namespace=namespace)
-        # If found, update
-        batch_api.replace_namespaced_cron_job(
-            name=cronjob_name,
-            namespace=namespace,
-            body=cronjob
-        )
-    except ApiException as e:
-        if e.status == 404:
-            # Not found, create
-            batch_api.create_namespaced_cron_job(
-                namespace=namespace,
-                body=cronjob
-            )
-            created = True
-        else:
-            # Re-raise any other exception
-            raise
+    # Create or update the CronJob in a single server-side apply
+    result = await apply_object(cronjob)
     
-    return cronjob, created
+    return cronjob, result
 
 
-def delete_backup_cronjob(name: str, namespace: str) -> None:
+async def delete_backup_cronjob(name: str, namespace: str) -> None:
     """
     Delete a MySQL backup CronJob.
     
@@ -202,7 +367,8 @@ def delete_backup_cronjob(name: str, namespace: str) -> None:
     cronjob_name = f"{name}-backup"
     
     try:
-        batch_api.delete_namespaced_cron_job(
+        await k8s_call(
+            batch_api.delete_namespaced_cron_job,
             name=cronjob_name,
             namespace=namespace,
             body=client.V1DeleteOptions(
@@ -212,4 +378,48 @@ def delete_backup_cronjob(name: str, namespace: str) -> None:
         )
     except ApiException as e:
         if e.status != 404:  # Ignore if already deleted
-            raise 
\ No newline at end of file
+            raise 
+
+
+async def start_cronjob_job(cronjob: client.V1CronJob, scheduled_time: float) -> Optional[client.V1Job]:
+    """
+    Start a Job from a backup CronJob's template, as the CronJob controller would.
+    
+    The Job is named after the CronJob and the scheduled minute the same way
+    the controller names them, and is owned by the CronJob, so its history
+    limits and garbage collection apply unchanged.
+    
+    Args:
+        cronjob: The backup CronJob
+        scheduled_time: Epoch seconds of the schedule slot the Job is for
+    Returns:
+        The created Job, or None if a Job for this slot already exists
+    """
+    template = cronjob.spec.job_template
+    job = client.V1Job(
+        api_version="batch/v1",
+        kind="Job",
+        metadata=client.V1ObjectMeta(
+            name=f"{cronjob.metadata.name}-{int(scheduled_time // 60)}",
+            namespace=cronjob.metadata.namespace,
+            labels=template.metadata.labels,
+            owner_references=[
+                client.V1OwnerReference(
+                    api_version="batch/v1",
+                    kind="CronJob",
+                    name=cronjob.metadata.name,
+                    uid=cronjob.metadata.uid,
+                    block_owner_deletion=True,
+                    controller=True
+                )
+            ]
+        ),
+        spec=template.spec
+    )
+    
+    try:
+        return await k8s_call(get_k8s_batch_api().create_namespaced_job, cronjob.metadata.namespace, job)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        return None
@@ -1,13 +1,13 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from src.utils.config import get_mysql_image, get_restore_image, get_image_pull_secret
+from src.utils.config import get_mysql_image, get_backup_image, get_restore_image, get_image_pull_secret
 
-from ..utils.helpers import get_k8s_apps_api, format_labels
+from ..utils.helpers import apply_object, format_labels
 
-def create_mysql_deployment(
+async def create_mysql_deployment(
     name: str,
     namespace: str,
     storage_claim_name: str,
@@ -19,11 +19,13 @@ def create_mysql_deployment(
     affinity: Optional[Dict[str, Any]] = None,
     tolerations: Optional[List[Dict[str, Any]]] = None,
     owner_references: Optional[List[Dict[str, Any]]] = None,
-    restore_from_backup: Optional[Dict[str, Any]] = None
-) -> client.V1Deployment:
-    """Create a MySQL deployment."""
-    apps_api = get_k8s_apps_api()
-    
+    restore_from_backup: Optional[Dict[str, Any]] = None,
+    backup_config: Optional[Dict[str, Any]] = None
+) -> Tuple[client.V1Deployment, str]:
+    """
+    Create a MySQL deployment.
+    Returns the deployment and the apply result ("created", "configured" or "unchanged").
+    """
     # Prepare volume mounts
     volume_mounts = [
         client.V1VolumeMount(
@@ -79,13 +81,66 @@ def create_mysql_deployment(
             limits=resources.get("limits", {})
         ) if resources else None
     )
+    containers = [container]
+    
+    # Binlog shipping sidecar for point-in-time recovery
+    backup_config = backup_config or {}
+    binlog_config = backup_config.get("binlog", {})
+    backup_s3 = backup_config.get("s3", {})
+    if backup_config.get("enabled", False) and binlog_config.get("enabled", False) and backup_s3.get("secretRef"):
+        containers.append(
+            client.V1Container(
+                name="binlog-shipper",
+                image=get_backup_image(),
+                image_pull_policy="IfNotPresent",
+                command=["/usr/local/bin/binlog-shipper.sh"],
+                volume_mounts=[
+                    client.V1VolumeMount(
+                        name="data",
+                        mount_path="/var/lib/mysql",
+                        read_only=True
+                    )
+                ],
+                env=[
+                    client.V1EnvVar(
+                        name="S3_BUCKET",
+                        value=backup_s3.get("bucket")
+                    ),
+                    client.V1EnvVar(
+                        name="S3_ENDPOINT",
+                        value=backup_s3.get("endpoint")
+                    ),
+                    client.V1EnvVar(
+                        name="S3_PREFIX",
+                        value=backup_s3.get("prefix", "default")
+                    ),
+                    client.V1EnvVar(
+                        name="BINLOG_SHIP_INTERVAL",
+                        value=str(binlog_config.get("intervalSeconds", 10))
+                    )
+                ],
+                env_from=[
+                    client.V1EnvFromSource(
+                        secret_ref=client.V1SecretEnvSource(
+                            name=backup_s3.get("secretRef")
+                        )
+                    )
+                ],
+                resources=client.V1ResourceRequirements(
+                    requests={"cpu": "10m", "memory": "32Mi"},
+                    limits={"cpu": "200m", "memory": "128Mi"}
+                )
+            )
+        )
     
     # Handle init container for restore if needed
     init_containers = []
-    if restore_from_backup:
+    # An instance restored from a VolumeSnapshot gets its data with the PVC
+    if restore_from_backup and not restore_from_backup.get("fromSnapshot"):
         s3_config = restore_from_backup.get("s3", {})
         s3_secret_ref = s3_config.get("secretRef")
         backup_id = restore_from_backup.get("backupId", "")
+        point_in_time = restore_from_backup.get("pointInTime", "")
         
         # Add volume for S3 credentials
         if s3_secret_ref:
@@ -121,9 +176,33 @@ def create_mysql_deployment(
                             name=s3_secret_ref
                         )
                     )
-                ]
+                ],
+                # Sized like MySQL, which needs no more than the pod already
+                # reserves; restore.sh gives --prepare half of the memory limit
+                resources=container.resources
             )
             
+            # Ranged download tuning
+            for key, env_name in (("partSizeMB", "S3_PART_SIZE_MB"),
+                                  ("concurrency", "S3_CONCURRENCY"),
+                                  ("maxRetries", "S3_MAX_RETRIES")):
+                if key in s3_config:
+                    restore_container.env.append(
+                        client.V1EnvVar(
+                            name=env_name,
+                            value=str(s3_config.get(key))
+                        )
+                    )
+            
+            # Explicit --use-memory for preparing unprepared backups
+            if restore_from_backup.get("useMemory"):
+                restore_container.env.append(
+                    client.V1EnvVar(
+                        name="XTRABACKUP_USE_MEMORY",
+                        value=str(restore_from_backup.get("useMemory"))
+                    )
+                )
+            
             # Add backup ID if specified
             if backup_id:
                 restore_container.env.append(
@@ -132,8 +211,35 @@ def create_mysql_deployment(
                         value=backup_id
                     )
                 )
+            
+            # Point-in-time recovery: the restore container downloads the binlogs,
+            # the mysql image replays them before mysqld starts
+            if point_in_time:
+                restore_container.env.append(
+                    client.V1EnvVar(
+                        name="POINT_IN_TIME",
+                        value=point_in_time
+                    )
+                )
                 
             init_containers.append(restore_container)
+            
+            if point_in_time:
+                init_containers.append(
+                    client.V1Container(
+                        name="pitr",
+                        image=get_mysql_image(),
+                        image_pull_policy="IfNotPresent",
+                        command=["/usr/local/bin/pitr.sh"],
+                        volume_mounts=[
+                            client.V1VolumeMount(
+                                name="data",
+                                mount_path="/var/lib/mysql"
+                            )
+                        ],
+                        resources=container.resources
+                    )
+                )
     
     # Create deployment spec
     spec = client.V1DeploymentSpec(
@@ -146,7 +252,7 @@ def create_mysql_deployment(
                 labels=labels
             ),
             spec=client.V1PodSpec(
-                containers=[container],
+                containers=containers,
                 init_containers=init_containers if init_containers else None,
                 volumes=volumes,
                 node_selector=node_selector,
@@ -175,16 +281,7 @@ def create_mysql_deployment(
         spec=spec
     )
     
-    try:
-        # Check if deployment already exists
-        existing_deployment = apps_api.read_namespaced_deployment(name, namespace)
-        # Update if it exists
-        apps_api.replace_namespaced_deployment(name, namespace, deployment)
-    except ApiException as e:
-        if e.status == 404:
-            # Create if it doesn't exist
-            apps_api.create_namespaced_deployment(namespace, deployment)
-        else:
-            raise
+    # Create or update the deployment in a single server-side apply
+    result = await apply_object(deployment)
     
-    return deployment 
\ No newline at end of file
+    return deployment, result 
\ No newline at end of file
@@ -4,11 +4,12 @@ import base64
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from ..utils.helpers import get_k8s_batch_api, format_labels, get_k8s_core_api
+from ..utils.helpers import get_k8s_batch_api, format_labels, get_k8s_core_api, k8s_call
 
 from src.utils.config import get_backup_image, get_image_pull_secret
+from src.resources.backup import get_backup_env, get_backup_resources
 
-def create_backup_job(
+async def create_backup_job(
     name: str,
     namespace: str,
     mysql_ref: str,
@@ -16,7 +17,8 @@ def create_backup_job(
     labels: Dict[str, str],
     node_selector: Optional[Dict[str, str]] = None,
     owner_references: Optional[List[Any]] = None,
-    ttl_seconds_after_finished: int = 30
+    ttl_seconds_after_finished: int = 30,
+    backup_config: Optional[Dict[str, Any]] = None
 ) -> client.V1Job:
     """Create a MySQL backup job.
     
@@ -29,6 +31,7 @@ def create_backup_job(
         node_selector: Node selector for the backup pod (should match MySQL's node selector)
         owner_references: Owner references for the job
         ttl_seconds_after_finished: Time in seconds after which the job will be deleted (default: 1 day)
+        backup_config: Backup options from the SimpleMySqlBackup spec (e.g. mode, resources)
         
     Returns:
         The created job
@@ -38,33 +41,16 @@ def create_backup_job(
     # Generate a unique backup ID with timestamp
     backup_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     job_name = f"{name}-{backup_id}"
+    
+    # Backup jobs report their result to the instance through this label;
+    # verification jobs only report to their SimpleMySqlBackup
+    if (backup_config or {}).get("action") != "verify":
+        labels = {**labels, "mysql-ref": mysql_ref}
 
 
-    # Prepare environment variables
-    env = [
-        client.V1EnvVar(
-            name="S3_BUCKET",
-            value=s3_config.get("bucket")
-        ),
-        client.V1EnvVar(
-            name="S3_ENDPOINT",
-            value=s3_config.get("endpoint")
-        ),
-        client.V1EnvVar(
-            name="S3_PREFIX",
-            value=s3_config.get("prefix", "default")
-        )
-    ]
-    
-    # Add keep days if provided
-    if "keepDays" in s3_config:
-        env.append(
-            client.V1EnvVar(
-                name="S3_KEEP_DAYS",
-                value=str(s3_config.get("keepDays"))
-            )
-        )
-  
+    # Prepare environment variables, naming the backup object after the job
+    env = get_backup_env(s3_config, backup_config)
+    env.append(client.V1EnvVar(name="BACKUP_ID", value=backup_id))
     
     # Prepare image pull secrets
     k8s_image_pull_secrets = None
@@ -78,6 +64,12 @@ def create_backup_job(
         client.V1Volume(
             name="mysql-data",
             persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=f'{mysql_ref}-data')
+        ),
+        # Scratch space for the staged backup, kept across container restarts
+        # so an interrupted upload resumes instead of redoing the backup
+        client.V1Volume(
+            name="backup-scratch",
+            empty_dir=client.V1EmptyDirVolumeSource()
         )
     ]
 
@@ -85,6 +77,10 @@ def create_backup_job(
         client.V1VolumeMount(
             name="mysql-data",
             mount_path="/var/lib/mysql"
+        ),
+        client.V1VolumeMount(
+            name="backup-scratch",
+            mount_path="/app/backup"
         )
     ]
     
@@ -122,11 +118,13 @@ def create_backup_job(
                                   )
                                 )
                             ],
+                            resources=get_backup_resources(backup_config),
                             volume_mounts=volume_mounts
                         )
                     ],
                     volumes=volumes,
-                    restart_policy="Never",
+                    # Restart the container in place so the upload can resume from the scratch volume
+                    restart_policy="OnFailure",
                     node_selector=node_selector,
                     image_pull_secrets=k8s_image_pull_secrets
                 )
@@ -137,6 +135,120 @@ def create_backup_job(
     )
     
     # Create the job
-    batch_api.create_namespaced_job(namespace, job)
+    await k8s_call(batch_api.create_namespaced_job, namespace, job)
+    
+    return job 
+
+
+async def create_prepare_job(backup_job: client.V1Job, backup_id: str) -> Optional[client.V1Job]:
+    """Create a Job that prepares an uploaded backup offline.
+    
+    The Job reuses the image, credentials, environment and resources of the
+    backup Job that took the backup, but does not mount the data PVC and
+    prefers a node other than the MySQL pod's, so the prepare neither holds
+    the volume nor competes with the instance's IO.
+    
+    Args:
+        backup_job: The finished backup Job
+        backup_id: ID of the backup to prepare
+        
+    Returns:
+        The created job, or None if it already exists
+    """
+    batch_api = get_k8s_batch_api()
+    
+    template = backup_job.spec.template.spec
+    backup_container = template.containers[0]
+    mysql_ref = (backup_job.metadata.labels or {}).get("mysql-ref")
+    
+    # Prepare jobs only report to the backup they prepare, not to the instance
+    labels = {k: v for k, v in (backup_job.metadata.labels or {}).items() if k != "mysql-ref"}
+    labels["backup-action"] = "prepare"
+    
+    env = [e for e in backup_container.env or [] if e.name not in ("BACKUP_ACTION", "BACKUP_ID")]
+    env.extend([
+        client.V1EnvVar(name="BACKUP_ACTION", value="prepare"),
+        client.V1EnvVar(name="PREPARE_BACKUP_ID", value=backup_id)
+    ])
+    
+    # Only the scratch volume; the data PVC is ReadWriteOnce and stays with MySQL
+    volumes = [v for v in template.volumes or [] if v.name != "mysql-data"]
+    volume_mounts = [m for m in backup_container.volume_mounts or [] if m.name != "mysql-data"]
+    
+    # Keep the prepare off the MySQL node when another node is available
+    affinity = None
+    if mysql_ref:
+        affinity = client.V1Affinity(
+            pod_anti_affinity=client.V1PodAntiAffinity(
+                preferred_during_scheduling_ignored_during_execution=[
+                    client.V1WeightedPodAffinityTerm(
+                        weight=100,
+                        pod_affinity_term=client.V1PodAffinityTerm(
+                            label_selector=client.V1LabelSelector(
+                                match_labels={"instance": mysql_ref, "component": "mysql"}
+                            ),
+                            topology_key="kubernetes.io/hostname"
+                        )
+                    )
+                ]
+            )
+        )
+    
+    # Owned by the backup's owner without being controlled by it, so a CronJob
+    # does not count it against its job history
+    owner_references = [
+        client.V1OwnerReference(
+            api_version=owner.api_version,
+            kind=owner.kind,
+            name=owner.name,
+            uid=owner.uid
+        )
+        for owner in backup_job.metadata.owner_references or []
+    ]
+    
+    job = client.V1Job(
+        api_version="batch/v1",
+        kind="Job",
+        metadata=client.V1ObjectMeta(
+            name=f"{backup_job.metadata.name[:55]}-prepare",
+            namespace=backup_job.metadata.namespace,
+            labels=labels,
+            owner_references=owner_references or None
+        ),
+        spec=client.V1JobSpec(
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(
+                    labels=labels
+                ),
+                spec=client.V1PodSpec(
+                    containers=[
+                        client.V1Container(
+                            name="prepare",
+                            image=backup_container.image,
+                            image_pull_policy=backup_container.image_pull_policy,
+                            env=env,
+                            env_from=backup_container.env_from,
+                            resources=backup_container.resources,
+                            volume_mounts=volume_mounts
+                        )
+                    ],
+                    volumes=volumes,
+                    restart_policy="OnFailure",
+                    node_selector=template.node_selector,
+                    affinity=affinity,
+                    image_pull_secrets=template.image_pull_secrets
+                )
+            ),
+            backoff_limit=3,
+            ttl_seconds_after_finished=backup_job.spec.ttl_seconds_after_finished or 86400
+        )
+    )
+    
+    try:
+        await k8s_call(batch_api.create_namespaced_job, backup_job.metadata.namespace, job)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        return None
     
-    return job 
\ No newline at end of file
+    return job
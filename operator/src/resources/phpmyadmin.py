@@ -3,8 +3,9 @@ from kubernetes import client
 from kubernetes.client.rest import ApiException
 
 from src.utils.config import get_phpmyadmin_image, get_image_pull_secret
+from src.utils.helpers import apply_object, get_k8s_apps_api, get_k8s_core_api, k8s_call
 
-def create_phpmyadmin_deployment(
+async def create_phpmyadmin_deployment(
     name: str,
     namespace: str,
     mysql_service_name: str,
@@ -28,7 +29,7 @@ def create_phpmyadmin_deployment(
         owner_references: List of owner references
     
     Returns:
-        The created/updated Deployment
+        The Deployment and the apply result ("created", "configured" or "unchanged")
     """
     
     if resources is None:
@@ -106,34 +107,12 @@ def create_phpmyadmin_deployment(
         spec=deployment_spec
     )
     
-    # Create or update the deployment
-    api_instance = client.AppsV1Api()
+    # Create or update the deployment in a single server-side apply
+    result = await apply_object(deployment)
     
-    try:
-        # Try to get the deployment
-        api_instance.read_namespaced_deployment(phpmyadmin_name, namespace)
-        # If it exists, update it
-        api_instance.patch_namespaced_deployment(
-            name=phpmyadmin_name,
-            namespace=namespace,
-            body=deployment
-        )
-        
-        return deployment, False
-    except ApiException as e:
-        if e.status == 404:
-            # If it doesn't exist, create it
-            api_instance.create_namespaced_deployment(
-                namespace=namespace,
-                body=deployment
-            )
-            
-            return deployment, True
-        else:
-            # If there's another error, raise it
-            raise e
+    return deployment, result
 
-def create_phpmyadmin_service(
+async def create_phpmyadmin_service(
     name: str,
     namespace: str,
     port: int = 8080,
@@ -151,7 +130,7 @@ def create_phpmyadmin_service(
         owner_references: List of owner references
     
     Returns:
-        The created/updated Service
+        The Service and the apply result ("created", "configured" or "unchanged")
     """
     
     phpmyadmin_name = f"{name}-phpmyadmin"
@@ -188,34 +167,12 @@ def create_phpmyadmin_service(
         )
     )
     
-    # Create or update the service
-    api_instance = client.CoreV1Api()
+    # Create or update the service in a single server-side apply
+    result = await apply_object(service)
     
-    try:
-        # Try to get the service
-        api_instance.read_namespaced_service(phpmyadmin_name, namespace)
-        # If it exists, update it
-        api_instance.patch_namespaced_service(
-            name=phpmyadmin_name,
-            namespace=namespace,
-            body=service
-        )
-        
-        return service, False
-    except ApiException as e:
-        if e.status == 404:
-            # If it doesn't exist, create it
-            api_instance.create_namespaced_service(
-                namespace=namespace,
-                body=service
-            )
-            
-            return service, True
-        else:
-            # If there's another error, raise it
-            raise e
+    return service, result
 
-def delete_phpmyadmin(name: str, namespace: str):
+async def delete_phpmyadmin(name: str, namespace: str):
     """
     Delete phpMyAdmin deployment and service.
     
@@ -226,9 +183,10 @@ def delete_phpmyadmin(name: str, namespace: str):
     phpmyadmin_name = f"{name}-phpmyadmin"
     
     # Delete deployment
-    apps_api = client.AppsV1Api()
+    apps_api = get_k8s_apps_api()
     try:
-        apps_api.delete_namespaced_deployment(
+        await k8s_call(
+            apps_api.delete_namespaced_deployment,
             name=phpmyadmin_name,
             namespace=namespace
         )
@@ -237,9 +195,10 @@ def delete_phpmyadmin(name: str, namespace: str):
             raise e
     
     # Delete service
-    core_api = client.CoreV1Api()
+    core_api = get_k8s_core_api()
     try:
-        core_api.delete_namespaced_service(
+        await k8s_call(
+            core_api.delete_namespaced_service,
             name=phpmyadmin_name,
             namespace=namespace
         )
@@ -1,19 +1,26 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from ..utils.helpers import get_k8s_core_api
+from ..utils.cache import get_cached_object
+from ..utils.helpers import get_k8s_core_api, k8s_call
 
-def create_mysql_pvc(
+async def create_mysql_pvc(
     name: str,
     namespace: str,
     storage_size: str,
     storage_class: Optional[str] = None,
     labels: Optional[Dict[str, str]] = None,
-    owner_references: Optional[List[Dict[str, Any]]] = None
-) -> client.V1PersistentVolumeClaim:
-    """Create a PVC for MySQL data."""
+    owner_references: Optional[List[Dict[str, Any]]] = None,
+    from_snapshot: Optional[str] = None
+) -> Tuple[client.V1PersistentVolumeClaim, str]:
+    """
+    Create a PVC for MySQL data.
+    With from_snapshot the PVC is provisioned from that VolumeSnapshot, so it
+    starts out with the snapshotted data directory.
+    Returns the PVC and the result ("created" or "unchanged").
+    """
     core_api = get_k8s_core_api()
     
     # Create the PVC
@@ -31,19 +38,26 @@ def create_mysql_pvc(
             resources=client.V1ResourceRequirements(
                 requests={"storage": storage_size}
             ),
-            storage_class_name=storage_class
+            storage_class_name=storage_class,
+            data_source=client.V1TypedLocalObjectReference(
+                api_group="snapshot.storage.k8s.io",
+                kind="VolumeSnapshot",
+                name=from_snapshot
+            ) if from_snapshot else None
         )
     )
     
+    # We don't update PVCs as they are immutable
+    _, existing_pvc = get_cached_object("PersistentVolumeClaim", namespace, f"{name}-data")
+    if existing_pvc is not None:
+        return pvc, "unchanged"
+    
     try:
-        # Check if PVC already exists
-        existing_pvc = core_api.read_namespaced_persistent_volume_claim(f"{name}-data", namespace)
-        # We don't update PVCs as they are immutable
+        # Create directly; a conflict means the PVC already exists
+        await k8s_call(core_api.create_namespaced_persistent_volume_claim, namespace, pvc)
     except ApiException as e:
-        if e.status == 404:
-            # Create if it doesn't exist
-            core_api.create_namespaced_persistent_volume_claim(namespace, pvc)
-        else:
+        if e.status != 409:
             raise
+        return pvc, "unchanged"
     
-    return pvc 
\ No newline at end of file
+    return pvc, "created" 
\ No newline at end of file
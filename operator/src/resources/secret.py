@@ -3,31 +3,34 @@ from typing import Dict, List, Any, Optional, Tuple
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from ..utils.helpers import get_k8s_core_api, generate_password, create_or_update_secret
+from ..utils.helpers import get_k8s_core_api, generate_password, create_or_update_secret, get_secret_data
 
-def create_mysql_secret(
+async def create_mysql_secret(
     name: str,
     namespace: str,
     db_name: str,
     password: Optional[str] = None,
     callback_url: Optional[str] = None,
+    labels: Optional[Dict[str, str]] = None,
     owner_references: Optional[List[Dict[str, Any]]] = None
-) -> Tuple[client.V1Secret, bool]:
+) -> Tuple[client.V1Secret, str]:
     """
     Create a secret for MySQL with credentials.
-    Returns the created secret and a boolean indicating if it was newly created.
+    Returns the secret and the apply result ("created", "configured" or "unchanged").
     
     Args:
         name: MySQL instance name
         namespace: Kubernetes namespace
         db_name: Database name
-        password: MySQL root password (auto-generated if None)
+        password: MySQL root password (reused from the existing secret or auto-generated if None)
         callback_url: URL to call after backup completion (from backup.callbackUrl)
+        labels: Labels to apply to the secret
         owner_references: K8s owner references for the secret
     """
-    # Generate password if not provided
+    # Keep the current password if not provided, so reconciles don't rotate it
     if password is None:
-        password = generate_password()
+        existing_data = await get_secret_data(f"{name}-credentials", namespace)
+        password = existing_data.get("MYSQL_PASSWORD") or generate_password()
     
     # Prepare secret data
     secret_data = {
@@ -41,9 +44,10 @@ def create_mysql_secret(
     }
     
     # Create or update the secret
-    return create_or_update_secret(
+    return await create_or_update_secret(
         name=f"{name}-credentials",
         namespace=namespace,
         data=secret_data,
+        labels=labels,
         owner_references=owner_references
     ) 
\ No newline at end of file
@@ -1,19 +1,20 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from ..utils.helpers import get_k8s_core_api, format_labels
+from ..utils.helpers import apply_object, format_labels
 
-def create_mysql_service(
+async def create_mysql_service(
     name: str,
     namespace: str,
     labels: Dict[str, str],
     owner_references: List[Dict[str, Any]] = None
-) -> client.V1Service:
-    """Create a MySQL service."""
-    core_api = get_k8s_core_api()
-    
+) -> Tuple[client.V1Service, str]:
+    """
+    Create a MySQL service.
+    Returns the service and the apply result ("created", "configured" or "unchanged").
+    """
     # Create the service
     service = client.V1Service(
         api_version="v1",
@@ -36,16 +37,7 @@ def create_mysql_service(
         )
     )
     
-    try:
-        # Check if service already exists
-        existing_service = core_api.read_namespaced_service(name, namespace)
-        # Update if it exists
-        core_api.replace_namespaced_service(name, namespace, service)
-    except ApiException as e:
-        if e.status == 404:
-            # Create if it doesn't exist
-            core_api.create_namespaced_service(namespace, service)
-        else:
-            raise
+    # Create or update the service in a single server-side apply
+    result = await apply_object(service)
     
-    return service 
\ No newline at end of file
+    return service, result 
\ No newline at end of file
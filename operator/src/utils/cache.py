@@ -0,0 +1,201 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+
+from src.utils.config import get_object_cache_enabled
+from src.utils.pagination import iter_list_pages
+
+logger = logging.getLogger('mysql-operator')
+
+# Label selecting every object created by the operator (see format_labels)
+MANAGED_LABEL_SELECTOR = "managed-by=mysql-operator"
+
+# Server-side timeout of a single watch request, after which it is resumed
+WATCH_TIMEOUT_SECONDS = 300
+
+# Delay before relisting after an unexpected watch failure
+RETRY_DELAY_SECONDS = 5
+
+# Kinds served to reconciles from the cache
+CACHED_KINDS = ["Secret", "Service", "PersistentVolumeClaim", "Deployment", "CronJob"]
+
+# Kinds watched only to notify listeners
+WATCHED_KINDS = ["Job"]
+
+# Callbacks receiving (event type, object) for every change of a kind
+_listeners: Dict[str, List[Callable[[str, Any], None]]] = {}
+
+
+class ObjectCache:
+    """
+    Watch-fed in-memory cache of the objects managed by the operator.
+
+    One background thread per kind lists and then watches the objects carrying
+    the managed-by label, so reconciles can look up their children without
+    reading from the API server. A kind only answers lookups once its initial
+    list has completed; until then callers fall back to the API. Listeners
+    registered with add_cache_listener() are called from the watch threads
+    for every listed or changed object.
+    """
+
+    def __init__(self, kinds: Iterable[str], label_selector: str = MANAGED_LABEL_SELECTOR):
+        self._kinds = list(kinds)
+        self._label_selector = label_selector
+        self._objects: Dict[Tuple[str, str, str], Any] = {}
+        self._synced = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        # Watches hold their connection open, so keep them off the shared pool
+        self._api_client = client.ApiClient(client.Configuration.get_default_copy())
+        core_api = client.CoreV1Api(self._api_client)
+        apps_api = client.AppsV1Api(self._api_client)
+        batch_api = client.BatchV1Api(self._api_client)
+
+        self._list_funcs: Dict[str, Callable] = {
+            "Secret": core_api.list_secret_for_all_namespaces,
+            "Service": core_api.list_service_for_all_namespaces,
+            "PersistentVolumeClaim": core_api.list_persistent_volume_claim_for_all_namespaces,
+            "Deployment": apps_api.list_deployment_for_all_namespaces,
+            "CronJob": batch_api.list_cron_job_for_all_namespaces,
+            "Job": batch_api.list_job_for_all_namespaces,
+        }
+
+    def start(self) -> None:
+        """Start one list/watch thread per cached kind."""
+        for kind in self._kinds:
+            thread = threading.Thread(
+                target=self._run,
+                args=(kind,),
+                name=f"cache-{kind.lower()}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop watching; threads exit once their current watch request returns."""
+        self._stop_event.set()
+        self._api_client.close()
+
+    def is_synced(self, kind: str) -> bool:
+        """Check whether the initial list of a kind has completed."""
+        with self._lock:
+            return kind in self._synced
+
+    def get(self, kind: str, namespace: str, name: str) -> Optional[Any]:
+        """Get a cached object, or None if it is not in the cache."""
+        with self._lock:
+            return self._objects.get((kind, namespace, name))
+
+    def _run(self, kind: str) -> None:
+        list_func = self._list_funcs[kind]
+        while not self._stop_event.is_set():
+            try:
+                resource_version = self._relist(kind, list_func)
+                self._watch(kind, list_func, resource_version)
+            except ApiException as e:
+                # 410 Gone means our resourceVersion expired, relist right away
+                if e.status != 410:
+                    logger.warning(f"Watch of {kind} objects failed: {e}")
+                    self._stop_event.wait(RETRY_DELAY_SECONDS)
+            except Exception as e:
+                logger.warning(f"Watch of {kind} objects failed: {e}")
+                self._stop_event.wait(RETRY_DELAY_SECONDS)
+
+    def _relist(self, kind: str, list_func: Callable) -> str:
+        objects = {}
+        resource_version = None
+        for page in iter_list_pages(list_func, label_selector=self._label_selector):
+            for obj in page.items:
+                objects[(kind, obj.metadata.namespace, obj.metadata.name)] = obj
+            resource_version = page.metadata.resource_version
+
+        with self._lock:
+            # Objects deleted while the watch was down get no DELETED event of their own
+            vanished = [obj for key, obj in self._objects.items() if key[0] == kind and key not in objects]
+            for key in [key for key in self._objects if key[0] == kind]:
+                del self._objects[key]
+            self._objects.update(objects)
+            self._synced.add(kind)
+
+        logger.debug(f"Cached {len(objects)} {kind} objects")
+        for obj in vanished:
+            self._notify(kind, 'DELETED', obj)
+        for obj in objects.values():
+            self._notify(kind, 'ADDED', obj)
+        return resource_version
+
+    def _watch(self, kind: str, list_func: Callable, resource_version: str) -> None:
+        while not self._stop_event.is_set():
+            watcher = watch.Watch()
+            for event in watcher.stream(
+                list_func,
+                label_selector=self._label_selector,
+                resource_version=resource_version,
+                timeout_seconds=WATCH_TIMEOUT_SECONDS
+            ):
+                obj = event['object']
+                key = (kind, obj.metadata.namespace, obj.metadata.name)
+                with self._lock:
+                    if event['type'] == 'DELETED':
+                        self._objects.pop(key, None)
+                    else:
+                        self._objects[key] = obj
+                self._notify(kind, event['type'], obj)
+
+                if self._stop_event.is_set():
+                    watcher.stop()
+
+            resource_version = watcher.resource_version or resource_version
+
+    def _notify(self, kind: str, event_type: str, obj: Any) -> None:
+        for listener in _listeners.get(kind, []):
+            try:
+                listener(event_type, obj)
+            except Exception as e:
+                logger.error(f"Listener for {kind} events failed: {e}")
+
+
+_object_cache: Optional[ObjectCache] = None
+
+def add_cache_listener(kind: str, listener: Callable[[str, Any], None]) -> None:
+    """
+    Register a callback for changes of a watched kind.
+    
+    The callback runs on the watch thread, so it must be quick and must not
+    touch the event loop directly (use loop.call_soon_threadsafe and friends).
+    """
+    _listeners.setdefault(kind, []).append(listener)
+
+def start_object_cache() -> None:
+    """Create and start the shared object cache."""
+    global _object_cache
+    if _object_cache is None:
+        # Listener-only kinds are always watched; lookups can be disabled
+        kinds = (CACHED_KINDS if get_object_cache_enabled() else []) + WATCHED_KINDS
+        _object_cache = ObjectCache(kinds)
+        _object_cache.start()
+
+def stop_object_cache() -> None:
+    """Stop the shared object cache."""
+    global _object_cache
+    if _object_cache is not None:
+        _object_cache.stop()
+        _object_cache = None
+
+def get_cached_object(kind: str, namespace: str, name: str) -> Tuple[bool, Optional[Any]]:
+    """
+    Look up an operator-managed object in the shared cache.
+
+    Returns:
+        Whether the cache could answer for this kind and the cached object
+        (None meaning it does not exist)
+    """
+    if _object_cache is None or not _object_cache.is_synced(kind):
+        return False, None
+    return True, _object_cache.get(kind, namespace, name)
@@ -5,6 +5,32 @@ REGISTRY = os.environ.get("REGISTRY", "harbor.subat.cn/subat-mysql-operator")
 VERSION = os.environ.get("VERSION", "8.0.35-1")
 IMAGE_PULL_SECRET = os.environ.get("IMAGE_PULL_SECRET", "")
 
+# Kubernetes API client configuration
+K8S_API_WORKERS = int(os.environ.get("K8S_API_WORKERS", "16"))
+K8S_POOL_MAXSIZE = int(os.environ.get("K8S_POOL_MAXSIZE", str(K8S_API_WORKERS)))
+K8S_CONNECT_TIMEOUT = float(os.environ.get("K8S_CONNECT_TIMEOUT", "5"))
+K8S_READ_TIMEOUT = float(os.environ.get("K8S_READ_TIMEOUT", "30"))
+K8S_TCP_KEEPALIVE = os.environ.get("K8S_TCP_KEEPALIVE", "true").lower() == "true"
+
+# Number of objects fetched per page when listing resources
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "500"))
+
+# Serve child lookups from a watch-fed cache instead of the API server
+OBJECT_CACHE_ENABLED = os.environ.get("OBJECT_CACHE_ENABLED", "true").lower() == "true"
+
+# Port of the Prometheus /metrics endpoint (0 disables it)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "8080"))
+
+# Who starts scheduled backups: "cronjob" leaves it to each instance's CronJob,
+# "operator" staggers them and caps how many run at once
+BACKUP_SCHEDULER = os.environ.get("BACKUP_SCHEDULER", "cronjob").lower()
+BACKUP_WINDOW_MINUTES = int(os.environ.get("BACKUP_WINDOW_MINUTES", "60"))
+BACKUP_MAX_CONCURRENT = int(os.environ.get("BACKUP_MAX_CONCURRENT", "10"))
+BACKUP_MAX_CONCURRENT_PER_NODE = int(os.environ.get("BACKUP_MAX_CONCURRENT_PER_NODE", "1"))
+
+# Field manager used for server-side apply of managed resources
+FIELD_MANAGER = "mysql-operator"
+
 # Image names
 MYSQL_IMAGE = "percona-server"
 PHPMYADMIN_IMAGE = "phpmyadmin"
@@ -30,3 +56,51 @@ def get_restore_image():
 def get_image_pull_secret():
     """Get the image pull secret."""
     return IMAGE_PULL_SECRET
+
+def get_k8s_api_workers():
+    """Get the number of worker threads used for blocking Kubernetes API calls."""
+    return K8S_API_WORKERS
+
+def get_k8s_pool_maxsize():
+    """Get the maximum number of pooled connections to the API server."""
+    return K8S_POOL_MAXSIZE
+
+def get_k8s_request_timeout():
+    """Get the (connect, read) timeout in seconds for Kubernetes API calls."""
+    return (K8S_CONNECT_TIMEOUT, K8S_READ_TIMEOUT)
+
+def get_k8s_tcp_keepalive():
+    """Get whether TCP keep-alive is enabled on API server connections."""
+    return K8S_TCP_KEEPALIVE
+
+def get_list_page_size():
+    """Get the number of objects fetched per page when listing resources."""
+    return LIST_PAGE_SIZE
+
+def get_object_cache_enabled():
+    """Get whether the watch-fed object cache is enabled."""
+    return OBJECT_CACHE_ENABLED
+
+def get_field_manager():
+    """Get the field manager name used for server-side apply."""
+    return FIELD_MANAGER
+
+def get_metrics_port():
+    """Get the port of the Prometheus metrics endpoint, 0 if disabled."""
+    return METRICS_PORT
+
+def get_backup_scheduler_mode():
+    """Get who starts scheduled backups, "cronjob" or "operator"."""
+    return BACKUP_SCHEDULER
+
+def get_backup_window_minutes():
+    """Get the default window scheduled backups are spread over by the operator scheduler."""
+    return BACKUP_WINDOW_MINUTES
+
+def get_backup_max_concurrent():
+    """Get the maximum number of backups running at once cluster-wide, 0 if unlimited."""
+    return BACKUP_MAX_CONCURRENT
+
+def get_backup_max_concurrent_per_node():
+    """Get the maximum number of backups running at once on a node, 0 if unlimited."""
+    return BACKUP_MAX_CONCURRENT_PER_NODE
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# A step is its list of dependencies and a coroutine function receiving the
+# outputs of the steps finished so far
+Step = Tuple[List[str], Callable[[Dict[str, Any]], Awaitable[Any]]]
+
+
+def _check_acyclic(steps: Dict[str, Step]) -> None:
+    """Raise ValueError on unknown dependencies or dependency cycles."""
+    visiting, done = set(), set()
+
+    def visit(name: str) -> None:
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through step '{name}'")
+        visiting.add(name)
+        for dependency in steps[name][0]:
+            if dependency not in steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dependency}'")
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in steps:
+        visit(name)
+
+
+async def run_dependency_graph(steps: Dict[str, Step]) -> Dict[str, Any]:
+    """
+    Run async steps concurrently, starting each one as soon as its dependencies finish.
+
+    Args:
+        steps: Mapping of step name to (dependencies, coroutine function)
+
+    Returns:
+        Mapping of step name to the value its coroutine returned
+
+    If a step fails, the steps still running are cancelled and the first
+    error is re-raised.
+    """
+    _check_acyclic(steps)
+
+    outputs: Dict[str, Any] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_step(name: str) -> None:
+        dependencies, func = steps[name]
+        if dependencies:
+            await asyncio.gather(*(tasks[dependency] for dependency in dependencies))
+        outputs[name] = await func(outputs)
+
+    # All tasks exist before any of them runs, so dependencies can be awaited
+    for name in steps:
+        tasks[name] = asyncio.ensure_future(run_step(name))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    return outputs
@@ -1,38 +1,280 @@
+import asyncio
 import base64
+import copy
+import datetime
+import functools
+import hashlib
+import json
 import os
 import random
 import string
 import secrets
-from typing import Dict, Any, Optional, Tuple
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, Tuple
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
+from urllib3.connection import HTTPConnection
+
+from src.utils.cache import get_cached_object
+from src.utils.config import (
+    get_field_manager, get_k8s_api_workers, get_k8s_pool_maxsize,
+    get_k8s_request_timeout, get_k8s_tcp_keepalive
+)
+from src.utils.metrics import API_CONNECTIONS, observe_api_call, observe_apply, register_queue
+
+# Process-wide ApiClient so every API group shares one connection pool
+_k8s_api_client: Optional[client.ApiClient] = None
+
+# Annotation recording the hash of the desired state an object was applied from
+DESIRED_HASH_ANNOTATION = "mysql.subat.cn/desired-hash"
+
+# Plural resource names for the kinds the operator applies
+RESOURCE_PLURALS = {
+    "Secret": "secrets",
+    "Service": "services",
+    "PersistentVolumeClaim": "persistentvolumeclaims",
+    "Deployment": "deployments",
+    "Job": "jobs",
+    "CronJob": "cronjobs",
+}
+_KINDS_BY_PLURAL = {plural: kind for kind, plural in RESOURCE_PLURALS.items()}
+
+# Bounded pool used to run the blocking kubernetes client off the event loop
+_k8s_executor: Optional[ThreadPoolExecutor] = None
+
+def get_k8s_executor() -> ThreadPoolExecutor:
+    """Get the shared executor for blocking Kubernetes API calls."""
+    global _k8s_executor
+    if _k8s_executor is None:
+        _k8s_executor = ThreadPoolExecutor(
+            max_workers=get_k8s_api_workers(),
+            thread_name_prefix="k8s-api"
+        )
+        # Calls submitted while every worker is busy wait in the executor queue
+        executor = _k8s_executor
+        register_queue("k8s_api", lambda: executor._work_queue.qsize())
+    return _k8s_executor
+
+def shutdown_k8s_executor() -> None:
+    """Shut down the shared executor, waiting for in-flight API calls."""
+    global _k8s_executor
+    if _k8s_executor is not None:
+        _k8s_executor.shutdown(wait=True)
+        _k8s_executor = None
+
+def get_k8s_api_client() -> client.ApiClient:
+    """
+    Get the shared Kubernetes ApiClient.
+    
+    The client is created lazily from the default configuration loaded at
+    startup, with the pool sized for the executor so concurrent calls reuse
+    keep-alive connections instead of opening new ones.
+    """
+    global _k8s_api_client
+    if _k8s_api_client is None:
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = get_k8s_pool_maxsize()
+        _k8s_api_client = client.ApiClient(configuration)
+        
+        if get_k8s_tcp_keepalive():
+            # Keep idle pooled connections alive through NATs and load balancers
+            pool_manager = _k8s_api_client.rest_client.pool_manager
+            pool_manager.connection_pool_kw["socket_options"] = (
+                HTTPConnection.default_socket_options
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+        API_CONNECTIONS.set_function(lambda: get_k8s_connection_stats()["connections"])
+    return _k8s_api_client
+
+def close_k8s_api_client() -> None:
+    """Close the shared ApiClient and its connection pool."""
+    global _k8s_api_client
+    if _k8s_api_client is not None:
+        _k8s_api_client.close()
+        _k8s_api_client = None
+
+def get_k8s_connection_stats() -> Dict[str, int]:
+    """Get the number of connections opened and requests served by the shared pool."""
+    stats = {"connections": 0, "requests": 0}
+    if _k8s_api_client is None:
+        return stats
+    
+    pools = _k8s_api_client.rest_client.pool_manager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is not None:
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+    return stats
+
+def _describe_api_call(func: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    """Derive the (verb, kind) metric labels of a Kubernetes API call."""
+    name = getattr(func, "__name__", "call")
+    if name == "call_api":
+        # Raw requests are made against an object path with an explicit method
+        plural = args[0].rstrip("/").split("/")[-2]
+        return args[1].lower(), _KINDS_BY_PLURAL.get(plural, plural)
+    
+    verb, _, resource = name.partition("_")
+    if "plural" in kwargs:
+        # Custom objects are addressed by their plural name
+        return verb, kwargs["plural"]
+    
+    # e.g. patch_namespaced_persistent_volume_claim_status -> PersistentVolumeClaim
+    resource = resource.replace("namespaced_", "").replace("_for_all_namespaces", "")
+    if resource.endswith("_status"):
+        resource = resource[:-len("_status")]
+    return verb, "".join(part.capitalize() for part in resource.split("_"))
+
+async def k8s_call(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking Kubernetes API call in the shared executor.
+    
+    The kubernetes client is synchronous, so every call made from an async
+    handler must go through here to keep the kopf event loop responsive.
+    A default request timeout is applied unless the caller passes one, and
+    the call's latency and outcome are recorded in the API metrics.
+    """
+    kwargs.setdefault("_request_timeout", get_k8s_request_timeout())
+    verb, kind = _describe_api_call(func, args, kwargs)
+    loop = asyncio.get_running_loop()
+    
+    start = time.monotonic()
+    error = None
+    try:
+        return await loop.run_in_executor(
+            get_k8s_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        observe_api_call(verb, kind, time.monotonic() - start, error)
+
+def _object_path(api_version: str, kind: str, namespace: str, name: str) -> str:
+    """Build the REST path of a namespaced object."""
+    prefix = "/apis" if "/" in api_version else "/api"
+    return f"{prefix}/{api_version}/namespaces/{namespace}/{RESOURCE_PLURALS[kind]}/{name}"
+
+def compute_desired_hash(body: Dict[str, Any]) -> str:
+    """Compute a stable hash of a rendered object, ignoring its own hash annotation."""
+    body = copy.deepcopy(body)
+    annotations = body.get("metadata", {}).get("annotations") or {}
+    annotations.pop(DESIRED_HASH_ANNOTATION, None)
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+def _contains(desired: Any, live: Any) -> bool:
+    """Check that every field set in a rendered object has the same value in the live one."""
+    if isinstance(desired, dict):
+        return isinstance(live, dict) and all(
+            key in live and _contains(value, live[key]) for key, value in desired.items()
+        )
+    if isinstance(desired, list):
+        return isinstance(live, list) and len(desired) == len(live) and all(
+            _contains(item, live_item) for item, live_item in zip(desired, live)
+        )
+    return desired == live
+
+def is_applied(body: Dict[str, Any], obj: Any) -> bool:
+    """
+    Check whether a live object is still as the rendered body would apply it.
+    
+    The desired-state hash tells whether the operator rendered the same object
+    as last time; comparing the rendered fields with the live ones also catches
+    out-of-band edits (kubectl edit, kubectl scale) that kept the annotation.
+    Fields the server defaults or others own are not compared.
+    """
+    live = get_k8s_api_client().sanitize_for_serialization(obj)
+    annotations = (live.get("metadata") or {}).get("annotations") or {}
+    if annotations.get(DESIRED_HASH_ANNOTATION) != body["metadata"]["annotations"][DESIRED_HASH_ANNOTATION]:
+        return False
+    return all(_contains(value, live.get(key)) for key, value in body.items() if key not in ("apiVersion", "kind"))
+
+async def apply_object(obj: Any) -> str:
+    """
+    Create or update a namespaced object with server-side apply.
+    
+    The rendered object is stamped with a hash of its desired state. When the
+    cached live object carries the same hash and still has every rendered
+    field, nothing is sent; otherwise the object is written in a single PATCH
+    owned by the operator's field manager, which the server turns into a
+    no-op when nothing changed. Without the cache the object is not read first.
+    
+    Args:
+        obj: Kubernetes model (or dict) with apiVersion, kind and metadata set
+    
+    Returns:
+        "created", "configured" or "unchanged"
+    """
+    api_client = get_k8s_api_client()
+    body = api_client.sanitize_for_serialization(obj)
+    metadata = body["metadata"]
+    
+    desired_hash = compute_desired_hash(body)
+    metadata.setdefault("annotations", {})[DESIRED_HASH_ANNOTATION] = desired_hash
+    
+    cached, existing = get_cached_object(body["kind"], metadata["namespace"], metadata["name"])
+    if cached and existing is not None and is_applied(body, existing):
+        observe_apply(body["kind"], "unchanged")
+        return "unchanged"
+    
+    # The charset parameter routes the pre-serialized body through the
+    # client unchanged on every supported kubernetes client version
+    _, status_code, _ = await k8s_call(
+        api_client.call_api,
+        _object_path(body["apiVersion"], body["kind"], metadata["namespace"], metadata["name"]),
+        "PATCH",
+        query_params=[("fieldManager", get_field_manager()), ("force", "true")],
+        header_params={
+            "Accept": "application/json",
+            "Content-Type": "application/apply-patch+yaml; charset=utf-8"
+        },
+        body=json.dumps(body),
+        response_type="object",
+        auth_settings=["BearerToken"],
+        _return_http_data_only=False
+    )
+    
+    result = "created" if status_code == 201 else "configured"
+    observe_apply(body["kind"], result)
+    return result
 
 def get_k8s_core_api() -> client.CoreV1Api:
     """Get Kubernetes Core API client."""
-    return client.CoreV1Api()
+    return client.CoreV1Api(get_k8s_api_client())
 
 def get_k8s_apps_api() -> client.AppsV1Api:
     """Get Kubernetes Apps API client."""
-    return client.AppsV1Api()
+    return client.AppsV1Api(get_k8s_api_client())
 
 def get_k8s_batch_api() -> client.BatchV1Api:
     """Get Kubernetes Batch API client for Jobs and CronJobs."""
-    return client.BatchV1Api()
+    return client.BatchV1Api(get_k8s_api_client())
+
+def get_k8s_custom_api() -> client.CustomObjectsApi:
+    """Get Kubernetes Custom Objects API client for SimpleMySql resources."""
+    return client.CustomObjectsApi(get_k8s_api_client())
 
 def generate_password(length: int = 16) -> str:
     """Generate a secure random password."""
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-def create_or_update_secret(
+async def create_or_update_secret(
     name: str,
     namespace: str,
     data: Dict[str, str],
+    labels: Optional[Dict[str, str]] = None,
     owner_references: Optional[list] = None
-) -> Tuple[client.V1Secret, bool]:
-    """Create or update a Kubernetes secret."""
-    core_api = get_k8s_core_api()
+) -> Tuple[client.V1Secret, str]:
+    """
+    Create or update a Kubernetes secret.
+    Returns the secret and the apply result ("created", "configured" or "unchanged").
+    """
     encoded_data = {k: base64.b64encode(v.encode()).decode() for k, v in data.items()}
     
     secret = client.V1Secret(
@@ -41,39 +283,45 @@ def create_or_update_secret(
         metadata=client.V1ObjectMeta(
             name=name,
             namespace=namespace,
+            labels=labels,
             owner_references=owner_references
         ),
         data=encoded_data
     )
     
-    created = False
-    try:
-        # Try to get existing secret
-        existing_secret = core_api.read_namespaced_secret(name, namespace)
-        # Update if exists
-        core_api.replace_namespaced_secret(name, namespace, secret)
-    except ApiException as e:
-        if e.status == 404:
-            # Create if doesn't exist
-            core_api.create_namespaced_secret(namespace, secret)
-            created = True
-        else:
-            raise
+    result = await apply_object(secret)
     
-    return secret, created
+    return secret, result
 
-def get_secret_data(secret_name: str, namespace: str) -> Dict[str, str]:
+async def get_secret_data(secret_name: str, namespace: str) -> Dict[str, str]:
     """Get decoded data from a Kubernetes secret."""
-    core_api = get_k8s_core_api()
+    # Secrets created by the operator are cached; user-provided ones are not
+    _, secret = get_cached_object("Secret", namespace, secret_name)
+    if secret is not None:
+        return {k: base64.b64decode(v).decode() for k, v in (secret.data or {}).items()}
     
+    core_api = get_k8s_core_api()
     try:
-        secret = core_api.read_namespaced_secret(secret_name, namespace)
+        secret = await k8s_call(core_api.read_namespaced_secret, secret_name, namespace)
         return {k: base64.b64decode(v).decode() for k, v in secret.data.items()}
     except ApiException as e:
         if e.status == 404:
             return {}
         raise
 
+def parse_timestamp(value: str) -> float:
+    """Parse an ISO 8601 timestamp from a status field into epoch seconds (UTC if naive)."""
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+def format_timestamp(value: datetime.datetime) -> str:
+    """Format a datetime as an ISO 8601 UTC timestamp for status fields."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
 def create_owner_reference(resource):
     """Create owner reference for dependent objects."""
     return client.V1OwnerReference(
@@ -0,0 +1,113 @@
+import functools
+import logging
+import time
+from typing import Callable, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from src.utils.config import get_metrics_port
+
+logger = logging.getLogger('mysql-operator')
+
+RECONCILE_DURATION = Histogram(
+    "mysql_operator_reconcile_duration_seconds",
+    "Time spent in a kopf handler",
+    ["handler"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+RECONCILE_ERRORS = Counter(
+    "mysql_operator_reconcile_errors_total",
+    "Handler invocations that raised an error",
+    ["handler"]
+)
+
+API_REQUESTS = Counter(
+    "mysql_operator_k8s_api_requests_total",
+    "Kubernetes API calls made by the operator",
+    ["verb", "kind"]
+)
+API_DURATION = Histogram(
+    "mysql_operator_k8s_api_request_duration_seconds",
+    "Latency of Kubernetes API calls, including time queued for a worker",
+    ["verb", "kind"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+API_ERRORS = Counter(
+    "mysql_operator_k8s_api_errors_total",
+    "Failed Kubernetes API calls by HTTP status code",
+    ["verb", "kind", "code"]
+)
+
+APPLY_RESULTS = Counter(
+    "mysql_operator_apply_results_total",
+    "Server-side applies of child objects by result",
+    ["kind", "result"]
+)
+
+QUEUE_DEPTH = Gauge(
+    "mysql_operator_queue_depth",
+    "Work waiting in the operator's internal queues",
+    ["queue"]
+)
+API_CONNECTIONS = Gauge(
+    "mysql_operator_k8s_api_connections",
+    "Connections opened by the shared Kubernetes API connection pool"
+)
+
+BACKUP_JOBS = Counter(
+    "mysql_operator_backup_jobs_total",
+    "Finished backup Jobs by outcome",
+    ["outcome"]
+)
+BACKUP_JOB_DURATION = Histogram(
+    "mysql_operator_backup_job_duration_seconds",
+    "Run time of finished backup Jobs",
+    ["outcome"],
+    buckets=(30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400)
+)
+
+
+def observe_reconcile(handler: str) -> Callable:
+    """Decorate an async kopf handler to record its duration and failures."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                RECONCILE_ERRORS.labels(handler).inc()
+                raise
+            finally:
+                RECONCILE_DURATION.labels(handler).observe(time.monotonic() - start)
+        return wrapper
+    return decorator
+
+def observe_api_call(verb: str, kind: str, duration: float, error: Optional[Exception] = None) -> None:
+    """Record one Kubernetes API call and, if it failed, its status code."""
+    API_REQUESTS.labels(verb, kind).inc()
+    API_DURATION.labels(verb, kind).observe(duration)
+    if error is not None:
+        # Errors without an HTTP response (timeouts, resets) have no status
+        API_ERRORS.labels(verb, kind, str(getattr(error, "status", None) or "none")).inc()
+
+def observe_apply(kind: str, result: str) -> None:
+    """Record the result of applying a child object."""
+    APPLY_RESULTS.labels(kind, result).inc()
+
+def observe_backup_job(outcome: str, duration_seconds: Optional[int]) -> None:
+    """Record the outcome and run time of a finished backup Job."""
+    BACKUP_JOBS.labels(outcome).inc()
+    if duration_seconds is not None:
+        BACKUP_JOB_DURATION.labels(outcome).observe(duration_seconds)
+
+def register_queue(queue: str, depth: Callable[[], float]) -> None:
+    """Expose the depth of an internal queue, read at scrape time."""
+    QUEUE_DEPTH.labels(queue).set_function(depth)
+
+def start_metrics_server() -> None:
+    """Serve /metrics on the configured port, unless disabled with port 0."""
+    port = get_metrics_port()
+    if port:
+        start_http_server(port)
+        logger.info(f"Serving Prometheus metrics on port {port}")
@@ -0,0 +1,44 @@
+from typing import Any, Callable, Iterator, Optional
+
+from src.utils.config import get_k8s_request_timeout, get_list_page_size
+
+
+def iter_list_pages(
+    list_func: Callable,
+    *args,
+    label_selector: Optional[str] = None,
+    limit: Optional[int] = None,
+    **kwargs
+) -> Iterator[Any]:
+    """
+    List resources page by page using limit/continue pagination.
+    
+    Works with both typed list functions (returning models) and the custom
+    objects API (returning dicts), so callers never hold more than one page
+    of the response in memory. Blocking; call it from a worker thread.
+    
+    Args:
+        list_func: Kubernetes list function, e.g. CoreV1Api.list_secret_for_all_namespaces
+        label_selector: Optional label selector to filter server-side
+        limit: Page size (defaults to LIST_PAGE_SIZE)
+    
+    Yields:
+        Each page of the list response
+    """
+    kwargs["limit"] = limit or get_list_page_size()
+    if label_selector:
+        kwargs["label_selector"] = label_selector
+    kwargs.setdefault("_request_timeout", get_k8s_request_timeout())
+    
+    while True:
+        page = list_func(*args, **kwargs)
+        yield page
+        
+        if isinstance(page, dict):
+            continue_token = (page.get("metadata") or {}).get("continue")
+        else:
+            continue_token = page.metadata._continue
+        if not continue_token:
+            return
+        kwargs["_continue"] = continue_token
+
@@ -0,0 +1,73 @@
+import asyncio
+import copy
+
+from kubernetes import client
+
+from src.utils import helpers
+from src.utils.helpers import apply_object
+
+
+def make_deployment(replicas=1, image="mysql:8.0"):
+    return client.V1Deployment(
+        api_version="apps/v1",
+        kind="Deployment",
+        metadata=client.V1ObjectMeta(name="db", namespace="default", labels={"app": "db"}),
+        spec=client.V1DeploymentSpec(
+            replicas=replicas,
+            selector=client.V1LabelSelector(match_labels={"app": "db"}),
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(labels={"app": "db"}),
+                spec=client.V1PodSpec(containers=[client.V1Container(name="mysql", image=image)])
+            )
+        )
+    )
+
+
+def applied(deployment):
+    """The live object after an apply: stamped, with server defaults and status."""
+    live = copy.deepcopy(deployment)
+    body = helpers.get_k8s_api_client().sanitize_for_serialization(deployment)
+    live.metadata.annotations = {helpers.DESIRED_HASH_ANNOTATION: helpers.compute_desired_hash(body)}
+    live.metadata.resource_version = "42"
+    live.spec.strategy = client.V1DeploymentStrategy(type="RollingUpdate")
+    live.spec.template.spec.containers[0].image_pull_policy = "IfNotPresent"
+    live.status = client.V1DeploymentStatus(replicas=1)
+    return live
+
+
+def run_apply(monkeypatch, deployment, cached):
+    calls = []
+
+    async def fake_call(func, *args, **kwargs):
+        calls.append(args[1])
+        return {}, 200, {}
+
+    monkeypatch.setattr(helpers, "get_cached_object", lambda kind, namespace, name: cached)
+    monkeypatch.setattr(helpers, "k8s_call", fake_call)
+    return asyncio.run(apply_object(deployment)), calls
+
+
+def test_unchanged_object_is_not_written(monkeypatch):
+    result, calls = run_apply(monkeypatch, make_deployment(), (True, applied(make_deployment())))
+    assert result == "unchanged"
+    assert calls == []
+
+
+def test_changed_object_is_patched(monkeypatch):
+    result, calls = run_apply(monkeypatch, make_deployment(image="mysql:8.4"), (True, applied(make_deployment())))
+    assert result == "configured"
+    assert calls == ["PATCH"]
+
+
+def test_out_of_band_edit_is_reverted(monkeypatch):
+    live = applied(make_deployment())
+    live.spec.replicas = 3  # kubectl scale keeps the annotation
+    result, calls = run_apply(monkeypatch, make_deployment(), (True, live))
+    assert result == "configured"
+    assert calls == ["PATCH"]
+
+
+def test_without_the_cache_the_object_is_patched_without_reading_it(monkeypatch):
+    result, calls = run_apply(monkeypatch, make_deployment(), (False, None))
+    assert result == "configured"
+    assert calls == ["PATCH"]
@@ -0,0 +1,42 @@
+from kubernetes import client
+
+from src.utils import cache
+from src.utils.cache import ObjectCache
+
+
+def make_job(name, namespace="default"):
+    return client.V1Job(metadata=client.V1ObjectMeta(name=name, namespace=namespace))
+
+
+def make_list(*objects, resource_version="1"):
+    return client.V1JobList(
+        items=list(objects),
+        metadata=client.V1ListMeta(resource_version=resource_version)
+    )
+
+
+def test_relist_reports_objects_deleted_while_the_watch_was_down(monkeypatch):
+    events = []
+    monkeypatch.setattr(cache, "_listeners", {"Job": [lambda event_type, obj: events.append((event_type, obj.metadata.name))]})
+    object_cache = ObjectCache(["Job"])
+
+    object_cache._relist("Job", lambda **_: make_list(make_job("a"), make_job("b")))
+    events.clear()
+    resource_version = object_cache._relist("Job", lambda **_: make_list(make_job("b"), make_job("c"), resource_version="7"))
+
+    assert resource_version == "7"
+    assert ("DELETED", "a") in events
+    assert ("ADDED", "b") in events and ("ADDED", "c") in events
+    assert object_cache.get("Job", "default", "a") is None
+    assert object_cache.get("Job", "default", "c") is not None
+
+
+def test_relist_keeps_other_kinds(monkeypatch):
+    monkeypatch.setattr(cache, "_listeners", {})
+    object_cache = ObjectCache(["Job", "CronJob"])
+    object_cache._objects[("CronJob", "default", "x-backup")] = object()
+
+    object_cache._relist("Job", lambda **_: make_list())
+
+    assert object_cache.get("CronJob", "default", "x-backup") is not None
+    assert object_cache.is_synced("Job")
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src.utils.dag import run_dependency_graph
+
+
+def test_steps_start_when_their_dependencies_finish():
+    events = []
+
+    def step(name, delay=0):
+        async def run(outputs):
+            events.append(f"start {name}")
+            await asyncio.sleep(delay)
+            events.append(f"end {name}")
+            return name.upper()
+        return run
+
+    outputs = asyncio.run(run_dependency_graph({
+        'secret': ([], step('secret')),
+        'slow': ([], step('slow', 0.05)),
+        'service': ([], step('service')),
+        'statefulset': (['secret', 'service'], step('statefulset')),
+    }))
+
+    assert outputs == {'secret': 'SECRET', 'slow': 'SLOW', 'service': 'SERVICE', 'statefulset': 'STATEFULSET'}
+    # Independent steps run together, and a dependent step does not wait for unrelated ones
+    assert events.index("start statefulset") > events.index("end secret")
+    assert events.index("start statefulset") > events.index("end service")
+    assert events.index("start statefulset") < events.index("end slow")
+
+
+def test_steps_see_the_outputs_of_their_dependencies():
+    async def password(outputs):
+        return "secret"
+
+    async def config(outputs):
+        return f"password={outputs['password']}"
+
+    outputs = asyncio.run(run_dependency_graph({
+        'config': (['password'], config),
+        'password': ([], password),
+    }))
+
+    assert outputs['config'] == "password=secret"
+
+
+def test_failure_cancels_running_steps():
+    cancelled = []
+
+    async def fail(outputs):
+        raise RuntimeError("apply failed")
+
+    async def slow(outputs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+
+    async def after(outputs):
+        cancelled.append('after ran')
+
+    with pytest.raises(RuntimeError, match="apply failed"):
+        asyncio.run(run_dependency_graph({
+            'fail': ([], fail),
+            'slow': ([], slow),
+            'after': (['fail'], after),
+        }))
+
+    assert cancelled == ['slow']
+
+
+@pytest.mark.parametrize("steps, message", [
+    ({'a': (['b'], None), 'b': (['a'], None)}, "cycle"),
+    ({'a': (['missing'], None)}, "unknown step 'missing'"),
+])
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(run_dependency_graph(steps))
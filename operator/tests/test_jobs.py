@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from kubernetes import client
+
+from src.handlers.jobs import get_job_result
+
+STARTED = datetime(2026, 1, 1, 2, 0, tzinfo=timezone.utc)
+
+
+def job(conditions, completion_time=None):
+    return client.V1Job(status=client.V1JobStatus(
+        start_time=STARTED,
+        completion_time=completion_time,
+        conditions=conditions
+    ))
+
+
+def test_running_job_has_no_result():
+    assert get_job_result(client.V1Job()) is None
+    assert get_job_result(job(None)) is None
+    # A Job that is only suspended, or whose condition is not yet true, is still running
+    assert get_job_result(job([
+        client.V1JobCondition(type="Suspended", status="True"),
+        client.V1JobCondition(type="Failed", status="False"),
+    ])) is None
+
+
+def test_completed_job():
+    finished = STARTED + timedelta(minutes=5)
+
+    result = get_job_result(job([client.V1JobCondition(type="Complete", status="True")], finished))
+
+    assert result == {
+        'phase': 'Succeeded',
+        'completionTime': "2026-01-01T02:05:00Z",
+        'durationSeconds': 300,
+        'failureReason': None
+    }
+
+
+def test_failed_job_uses_the_condition_time():
+    # Failed Jobs have no completion time
+    failed = client.V1JobCondition(
+        type="Failed",
+        status="True",
+        reason="BackoffLimitExceeded",
+        message="Job has reached the specified backoff limit",
+        last_transition_time=STARTED + timedelta(seconds=90)
+    )
+
+    result = get_job_result(job([failed]))
+
+    assert result == {
+        'phase': 'Failed',
+        'completionTime': "2026-01-01T02:01:30Z",
+        'durationSeconds': 90,
+        'failureReason': "BackoffLimitExceeded: Job has reached the specified backoff limit"
+    }
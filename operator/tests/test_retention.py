@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from src.handlers import retention
+from src.handlers.retention import RetentionScheduler
+
+
+def run_scheduler(setup, seconds=0.05):
+    """Run a scheduler for a moment and return the backups it expired, in order."""
+    expired = []
+
+    async def main():
+        scheduler = RetentionScheduler()
+
+        async def expire(namespace, name):
+            if name == 'broken':
+                raise RuntimeError("delete failed")
+            expired.append(name)
+
+        scheduler._expire = expire
+        setup(scheduler)
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return scheduler
+
+    return expired, asyncio.run(main())
+
+
+def test_due_backups_expire_in_due_order():
+    now = time.time()
+
+    def setup(scheduler):
+        scheduler.schedule('default', 'b', now - 10)
+        scheduler.schedule('default', 'c', now - 5)
+        scheduler.schedule('default', 'a', now - 20)
+        scheduler.schedule('default', 'later', now + 3600)
+
+    expired, scheduler = run_scheduler(setup)
+
+    assert expired == ['a', 'b', 'c']
+    assert len(scheduler) == 1
+
+
+def test_rescheduled_and_forgotten_backups_skip_stale_entries():
+    now = time.time()
+
+    def setup(scheduler):
+        scheduler.schedule('default', 'extended', now - 10)
+        scheduler.schedule('default', 'extended', now + 3600)
+        scheduler.schedule('default', 'deleted', now - 10)
+        scheduler.forget('default', 'deleted')
+        scheduler.schedule('default', 'shortened', now + 3600)
+        scheduler.schedule('default', 'shortened', now - 10)
+
+    expired, scheduler = run_scheduler(setup)
+
+    assert expired == ['shortened']
+    assert len(scheduler) == 1
+
+
+def test_backup_scheduled_while_sleeping_wakes_the_loop():
+    async def main():
+        expired = []
+        scheduler = RetentionScheduler()
+
+        async def expire(namespace, name):
+            expired.append(name)
+
+        scheduler._expire = expire
+        scheduler.schedule('default', 'later', time.time() + 3600)
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.01)
+        scheduler.schedule('default', 'now', time.time())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return expired
+
+    assert asyncio.run(main()) == ['now']
+
+
+def test_failed_deletion_is_retried_later(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(retention, 'RETRY_DELAY_SECONDS', 3600)
+
+    expired, scheduler = run_scheduler(lambda scheduler: scheduler.schedule('default', 'broken', now - 10))
+
+    assert expired == []
+    seq, due = scheduler._entries[('default', 'broken')]
+    assert due > now + 3000
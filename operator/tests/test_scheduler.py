@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from kubernetes import client
+
+from src.handlers import scheduler
+from src.handlers.scheduler import BackupScheduler, get_jitter
+
+
+def finished_job(name):
+    now = datetime.now()
+    return client.V1Job(
+        metadata=client.V1ObjectMeta(name=name, namespace="default"),
+        status=client.V1JobStatus(
+            start_time=now - timedelta(minutes=5),
+            completion_time=now,
+            conditions=[client.V1JobCondition(type="Complete", status="True")]
+        )
+    )
+
+
+def test_jitter_is_stable_and_within_the_window():
+    assert get_jitter("default", "db", 3600) == get_jitter("default", "db", 3600)
+    assert 0 <= get_jitter("default", "db", 3600) < 3600
+    assert get_jitter("default", "db", 0) == 0
+
+
+def test_jitter_spreads_instances():
+    offsets = {get_jitter("default", f"db-{i}", 3600) for i in range(50)}
+    assert len(offsets) > 40
+
+
+def test_next_slot_follows_the_last_started_slot(monkeypatch):
+    last = datetime(2026, 1, 1, 2, 0).timestamp()
+    monkeypatch.setattr(scheduler.time, "time", lambda: last + 3 * 86400)
+    entry = {'schedule': "0 2 * * *", 'window': 600, 'jitter': 30, 'last': last}
+
+    slot, due = BackupScheduler(0, 0)._next_slot(entry)
+
+    # Missed slots are caught up one at a time from the last one started
+    assert slot == datetime(2026, 1, 2, 2, 0).timestamp()
+    assert due == slot + 30
+
+
+def test_next_slot_without_history_looks_ahead(monkeypatch):
+    now = datetime(2026, 1, 1, 3, 0).timestamp()
+    monkeypatch.setattr(scheduler.time, "time", lambda: now)
+    entry = {'schedule': "0 2 * * *", 'window': 600, 'jitter': 30, 'last': None}
+
+    slot, due = BackupScheduler(0, 0)._next_slot(entry)
+
+    assert slot == datetime(2026, 1, 2, 2, 0).timestamp()
+    assert due > now
+
+
+def test_expected_start_counts_rounds_of_backups(monkeypatch):
+    monkeypatch.setattr(scheduler.time, "time", lambda: 0)
+    backup_scheduler = BackupScheduler(max_concurrent=2, max_per_node=1)
+    backup_scheduler._average_seconds = 100
+
+    assert backup_scheduler._expected_start(1, None, 0) == 100
+    assert backup_scheduler._expected_start(3, None, 0) == 200
+    # Two backups ahead on the same node take a round each
+    assert backup_scheduler._expected_start(1, "node-a", 2) == 300
+
+
+def test_update_of_a_queued_instance_keeps_its_slot():
+    backup_scheduler = BackupScheduler(1, 1)
+    backup_scheduler.update("default", "db", "0 2 * * *", 600, None)
+    key = ("default", "db")
+    queued = dict(backup_scheduler._entries[key])
+    backup_scheduler._queue.append(key)
+
+    backup_scheduler.update("default", "db", "0 3 * * *", 600, None)
+
+    entry = backup_scheduler._entries[key]
+    assert entry['schedule'] == "0 3 * * *"
+    assert all(entry[field] == queued[field] for field in ('slot', 'due', 'seq'))
+
+
+def test_already_started_job_that_finished_is_not_counted_as_running(monkeypatch):
+    cronjob = client.V1CronJob(metadata=client.V1ObjectMeta(name="db-backup", namespace="default"))
+    cached = {("CronJob", "db-backup"): cronjob}
+
+    async def already_started(cronjob, slot):
+        return None
+
+    monkeypatch.setattr(scheduler, "start_cronjob_job", already_started)
+    monkeypatch.setattr(scheduler, "get_cached_object",
+                        lambda kind, namespace, name: (True, cached.get((kind, name))))
+    entry = {'slot': 600.0}
+    backup_scheduler = BackupScheduler(1, 1)
+
+    cached[("Job", "db-backup-10")] = finished_job("db-backup-10")
+    assert asyncio.run(backup_scheduler._start(("default", "db"), entry)) == ("db-backup-10", False)
+
+    running = finished_job("db-backup-10")
+    running.status = client.V1JobStatus()
+    cached[("Job", "db-backup-10")] = running
+    assert asyncio.run(backup_scheduler._start(("default", "db"), entry)) == ("db-backup-10", True)
+
+    # Finished and already cleaned up
+    del cached[("Job", "db-backup-10")]
+    assert asyncio.run(backup_scheduler._start(("default", "db"), entry)) == ("db-backup-10", False)
@@ -0,0 +1,41 @@
+from src.resources.snapshot import get_snapshot_result
+
+
+def test_snapshot_in_progress_has_no_result():
+    assert get_snapshot_result(None) is None
+    assert get_snapshot_result({}) is None
+    assert get_snapshot_result({'readyToUse': False, 'creationTime': "2026-01-01T02:00:00Z"}) is None
+
+
+def test_ready_snapshot():
+    result = get_snapshot_result({
+        'readyToUse': True,
+        'creationTime': "2026-01-01T02:00:00Z",
+        'restoreSize': "10Gi"
+    })
+
+    assert result == {
+        'phase': 'Succeeded',
+        'creationTime': "2026-01-01T02:00:00Z",
+        'restoreSize': "10Gi",
+        'failureReason': None
+    }
+
+
+def test_snapshot_error():
+    result = get_snapshot_result({
+        'readyToUse': False,
+        'error': {'time': "2026-01-01T02:01:00Z", 'message': "Failed to check and update snapshot content"}
+    })
+
+    assert result == {
+        'phase': 'Failed',
+        'creationTime': "2026-01-01T02:01:00Z",
+        'restoreSize': None,
+        'failureReason': "Failed to check and update snapshot content"
+    }
+
+
+def test_error_without_message_is_still_in_progress():
+    # Only an error with a message marks the snapshot as failed
+    assert get_snapshot_result({'readyToUse': False, 'error': {'time': "2026-01-01T02:01:00Z"}}) is None